@@ -0,0 +1,302 @@
+import logging
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils.dateparse import parse_date
+
+from .checkpoints import data_version, rewrite_version
+from .exports import after_keys, keyset_pages
+from .models import Post
+from .topics import mask_for, topic_bits
+
+logger = logging.getLogger(__name__)
+
+# In-process columnar copy of the post metrics the aggregate dashboard
+# endpoints group by. Each post is one slot in a set of NumPy arrays (day as
+# days since 1970-01-01 UTC, party/state/legislator as dictionary codes,
+# topic_mask, counts and scores), so a filter is a boolean mask and a group-by
+# is a bincount over combined codes. Answers use the same day-granularity,
+# end-inclusive windows and row shapes as civicwatch.rollups, so the views
+# format them with the same code.
+#
+# Enabled with settings.CIVICWATCH_ANALYTICS_ENGINE. The first request starts
+# loading the frame in the background, as does the first request after the
+# data version changes; until the load finishes, requests fall back to the
+# rollup/ORM path, so nobody waits on the scan and a stale answer is never
+# cached under the new version. Bumps that only appended newer posts (see
+# checkpoints.REWRITE_VERSION) are caught up by reading the posts after the
+# frame's last (created_at, post_id); any other bump reloads everything.
+
+LOAD_BATCH_SIZE = 20000
+EPOCH = date(1970, 1, 1)
+FIELDS = (
+    "post_id", "created_at", "party", "state", "legislator_id", "topic_mask",
+    "like_count", "retweet_count", "count_misinfo", "civility_score",
+)
+KEYS = ("created_at", "post_id")
+COLUMNS = ("day", "party", "state", "legislator", "topic_mask", "likes", "retweets", "misinfo", "civility")
+
+
+def _codes(values, dictionary):
+    return np.fromiter((dictionary.setdefault(value, len(dictionary)) for value in values), dtype=np.int32, count=len(values))
+
+
+def _day(value):
+    if isinstance(value, str):
+        value = parse_date(value)
+    return (value - EPOCH).days
+
+
+class PostFrame:
+    def __init__(self, version, rewrite, bits, columns, dictionaries, last_key):
+        self.version = version
+        self.rewrite = rewrite
+        self.bits = bits
+        self.dictionaries = dictionaries
+        self.parties = list(dictionaries["party"])
+        self.states = list(dictionaries["state"])
+        self.last_key = last_key
+        for name, column in columns.items():
+            setattr(self, name, column)
+        self.size = len(self.day)
+
+    @classmethod
+    def load(cls, batch_size=LOAD_BATCH_SIZE):
+        """Frame over every post."""
+        return cls._read(None, batch_size)
+
+    def extend(self, batch_size=LOAD_BATCH_SIZE):
+        """
+        This frame plus the posts stored after its last key, or a full load
+        when something other than appends changed the data since it loaded.
+        """
+        return self._read(self, batch_size)
+
+    @classmethod
+    def _read(cls, base, batch_size):
+        # Read the versions first: a bump during the load triggers another refresh.
+        version, rewrite = data_version(), rewrite_version()
+        if base is not None and base.rewrite != rewrite:
+            base = None
+        bits = topic_bits()
+        posts = Post.objects.all()
+        if base is None:
+            dictionaries = {"party": {}, "state": {}, "legislator": {}}
+            chunks = {name: [] for name in COLUMNS}
+            last_key = None
+        else:
+            # Copies, so codes added here never leak into the frame being served.
+            dictionaries = {name: dict(codes) for name, codes in base.dictionaries.items()}
+            chunks = {name: [getattr(base, name)] for name in COLUMNS}
+            last_key = base.last_key
+            if last_key is not None:
+                posts = posts.filter(after_keys(KEYS, last_key))
+        parties, states, legislators = dictionaries["party"], dictionaries["state"], dictionaries["legislator"]
+        for rows in keyset_pages(posts, FIELDS, KEYS, batch_size):
+            _, created_at, party, state, legislator_id, topic_mask, likes, retweets, misinfo, civility = zip(*rows)
+            chunks["day"].append(np.fromiter(((moment.date() - EPOCH).days for moment in created_at), dtype=np.int32, count=len(rows)))
+            chunks["party"].append(_codes(party, parties))
+            chunks["state"].append(_codes(state, states))
+            chunks["legislator"].append(_codes(legislator_id, legislators))
+            chunks["topic_mask"].append(np.array(topic_mask, dtype=np.int64))
+            chunks["likes"].append(np.array(likes, dtype=np.int64))
+            chunks["retweets"].append(np.array(retweets, dtype=np.int64))
+            chunks["misinfo"].append(np.array(misinfo, dtype=np.int64))
+            chunks["civility"].append(np.array(civility, dtype=np.float64))
+            last_key = (created_at[-1], rows[-1][0])
+        columns = {
+            name: np.concatenate(parts) if parts else np.zeros(0, dtype=np.float64 if name == "civility" else np.int64)
+            for name, parts in chunks.items()
+        }
+        frame = cls(version, rewrite, bits, columns, dictionaries, last_key)
+        if base is None:
+            logger.info("Loaded %d posts into the analytics frame (data version %s)", frame.size, version)
+        else:
+            logger.info("Appended %d posts to the analytics frame (data version %s)", frame.size - base.size, version)
+        return frame
+
+    # 🔹 Filters
+
+    def select(self, start_date=None, end_date=None, topics=None):
+        """Boolean mask of posts in the (inclusive) day window carrying any of ``topics``."""
+        keep = np.ones(self.size, dtype=bool)
+        if start_date:
+            keep &= self.day >= _day(start_date)
+        if end_date:
+            keep &= self.day <= _day(end_date)
+        if topics:
+            keep &= (self.topic_mask & mask_for(topics, self.bits)) != 0
+        return keep
+
+    def topic_members(self, keep, topics=None):
+        """
+        ``(name, mask)`` per topic, counting a post once for every topic it
+        carries; untagged posts come back under ``None`` unless ``topics``
+        restricts the result to those topics.
+        """
+        names = [name for name in (topics or sorted(self.bits)) if name in self.bits]
+        members = [(name, keep & ((self.topic_mask & (1 << self.bits[name])) != 0)) for name in names]
+        if not topics:
+            members.append((None, keep & (self.topic_mask == 0)))
+        return members
+
+    # 🔹 Group-bys
+
+    @staticmethod
+    def _sums(keys, size, keep, *weights):
+        """Post count and weight sums per key code over the ``keep``-selected posts."""
+        keys = keys[keep]
+        counts = np.bincount(keys, minlength=size)
+        return [counts] + [np.bincount(keys, weights=weight[keep], minlength=size).astype(np.int64) for weight in weights]
+
+    def _party_order(self):
+        return sorted(range(len(self.parties)), key=lambda code: self.parties[code])
+
+    def trend_rows(self, start_date, end_date, topics, weekly):
+        keep = self.select(start_date, end_date, topics)
+        days = self.day[keep]
+        if weekly:
+            # Back to Monday; 1970-01-01 was a Thursday.
+            days = days - (days + 3) % 7
+        buckets, bucket_codes = np.unique(days, return_inverse=True)
+        n_parties = len(self.parties)
+        keys = bucket_codes * n_parties + self.party[keep]
+        counts = np.bincount(keys, minlength=len(buckets) * n_parties)
+        engagement = np.bincount(keys, weights=(self.likes + self.retweets)[keep], minlength=len(counts)).astype(np.int64)
+        for b, bucket in enumerate(buckets):
+            for party in self._party_order():
+                total = int(counts[b * n_parties + party])
+                if total:
+                    yield {
+                        "date": EPOCH + timedelta(days=int(bucket)),
+                        "party": self.parties[party],
+                        "total_posts": total,
+                        "avg_engagement_per_post": int(engagement[b * n_parties + party]) // total,
+                    }
+
+    def engagement_rows(self, start_date, end_date, topics):
+        keep = self.select(start_date, end_date, topics)
+        rows = []
+        for name, member in self.topic_members(keep, topics):
+            counts, likes, retweets = self._sums(self.party, len(self.parties), member, self.likes, self.retweets)
+            for party in np.flatnonzero(counts):
+                rows.append({
+                    "party": self.parties[party],
+                    "topics__name": name,
+                    "total_engagement": int(likes[party] + retweets[party]),
+                    "total_likes": int(likes[party]),
+                    "total_retweets": int(retweets[party]),
+                })
+        rows.sort(key=lambda row: (row["party"], row["topics__name"] or ""))
+        return rows
+
+    def engagement_total(self, start_date, end_date, topics):
+        keep = self.select(start_date, end_date, topics)
+        if not keep.any():
+            return None
+        return int(self.likes[keep].sum() + self.retweets[keep].sum())
+
+    def geo_rows(self, metric, start_date, end_date, topics):
+        """Return (base_data, topic_data) shaped like rollups.geo_rows."""
+        keep = self.select(start_date, end_date, topics)
+        n_parties = len(self.parties)
+        cells = self.state * n_parties + self.party
+        size = len(self.states) * n_parties
+
+        def totals(member):
+            counts, engagement = self._sums(cells, size, member, self.likes + self.retweets)
+            if metric == "legislators":
+                n_legislators = int(self.legislator.max()) + 1 if self.size else 1
+                pairs = np.unique(cells[member].astype(np.int64) * n_legislators + self.legislator[member])
+                return counts, np.bincount(pairs // n_legislators, minlength=size)
+            return counts, engagement if metric == "engagement" else counts
+
+        def rows(member, **extra):
+            counts, values = totals(member)
+            return [
+                {"state": self.states[cell // n_parties], "party": self.parties[cell % n_parties], **extra, "total": int(values[cell])}
+                for cell in np.flatnonzero(counts)
+            ]
+
+        base_data = rows(keep)
+        topic_data = []
+        for name, member in self.topic_members(keep, topics):
+            topic_data += rows(member, topics__name=name)
+        return base_data, topic_data
+
+    def accountability_rows(self, start_date, end_date, topics):
+        keep = self.select(start_date, end_date, topics)
+        civil = keep & (self.civility == 1)
+        misinfo = keep & (self.misinfo != 0)
+        n_parties = len(self.parties)
+        posts = np.bincount(self.party[keep], minlength=n_parties)
+        civil = np.bincount(self.party[civil], minlength=n_parties)
+        misinfo = np.bincount(self.party[misinfo], minlength=n_parties)
+        for party in self._party_order():
+            if posts[party]:
+                yield {
+                    "party": self.parties[party],
+                    "civil_count": int(civil[party]),
+                    "uncivil_count": int(posts[party] - civil[party]),
+                    "misinformative_count": int(misinfo[party]),
+                    "informative_count": int(posts[party] - misinfo[party]),
+                }
+
+
+# 🔹 Process-wide frame
+
+_lock = threading.Lock()
+_state = {"frame": None, "refreshing": False}
+
+
+def _refresh():
+    try:
+        with _lock:
+            frame = _state["frame"]
+        frame = frame.extend() if frame is not None else PostFrame.load()
+        with _lock:
+            _state["frame"] = frame
+    except Exception:
+        logger.exception("Analytics frame refresh failed")
+    finally:
+        with _lock:
+            _state["refreshing"] = False
+        connection.close()
+
+
+def current_frame():
+    """The loaded frame if the engine is enabled and up to date, else None."""
+    if not getattr(settings, "CIVICWATCH_ANALYTICS_ENGINE", False):
+        return None
+    from .response_cache import current_data_version
+
+    with _lock:
+        frame = _state["frame"]
+    if frame is not None and frame.version == current_data_version():
+        return frame
+    # Both the first load and reloads run in the background; requests use
+    # the rollup/ORM path until the frame is ready.
+    with _lock:
+        start = not _state["refreshing"]
+        _state["refreshing"] = True
+    if start:
+        threading.Thread(target=_refresh, name="analytics-refresh", daemon=True).start()
+    return None
+
+
+def load():
+    """Load the frame on the calling thread (warm-up, tests) and return it."""
+    frame = PostFrame.load()
+    with _lock:
+        _state["frame"] = frame
+    return frame
+
+
+def reset():
+    """Drop the loaded frame (tests, or after bulk changes that don't bump the data version)."""
+    with _lock:
+        _state["frame"] = None
+        _state["refreshing"] = False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CivicwatchConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "civicwatch"
+
+    def ready(self):
+        from . import topics  # noqa: F401  (registers the topic_mask signal handlers)
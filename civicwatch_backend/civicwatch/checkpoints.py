@@ -0,0 +1,44 @@
+from django.db import transaction
+
+from .models import PipelineCheckpoint
+
+
+def load_checkpoint(name, default=""):
+    checkpoint = PipelineCheckpoint.objects.filter(name=name).first()
+    return checkpoint.position if checkpoint else default
+
+
+def save_checkpoint(name, position):
+    PipelineCheckpoint.objects.update_or_create(name=name, defaults={"position": str(position)})
+
+
+def clear_checkpoint(name):
+    PipelineCheckpoint.objects.filter(name=name).delete()
+
+
+# The data version changes whenever posts or derived data are rewritten;
+# caches key on it so they invalidate across processes.
+DATA_VERSION = "data_version"
+# The last version whose bump changed more than appending posts that sort
+# after every existing (created_at, post_id); in-memory copies of the posts
+# catch up on appends and reload on anything else.
+REWRITE_VERSION = "data_rewrite_version"
+
+
+def data_version():
+    return int(load_checkpoint(DATA_VERSION, 0))
+
+
+def rewrite_version():
+    return int(load_checkpoint(REWRITE_VERSION, 0))
+
+
+def bump_data_version(appended=False):
+    """New data version; ``appended`` when the change only added posts after every existing one."""
+    with transaction.atomic():
+        checkpoint, _ = PipelineCheckpoint.objects.select_for_update().get_or_create(name=DATA_VERSION, defaults={"position": "0"})
+        checkpoint.position = str(int(checkpoint.position or 0) + 1)
+        checkpoint.save()
+        if not appended:
+            save_checkpoint(REWRITE_VERSION, checkpoint.position)
+    return int(checkpoint.position)
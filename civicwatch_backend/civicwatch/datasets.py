@@ -0,0 +1,292 @@
+import io
+import json
+import logging
+import os
+import zipfile
+from datetime import datetime, time, timedelta, timezone
+from itertools import groupby
+
+from django.db import transaction
+from django.utils.timezone import localdate
+
+from .checkpoints import load_checkpoint, save_checkpoint
+from .exports import EXPORT_BATCH_SIZE, _ChunkSink, keyset_pages, pa, post_topics, pq
+from .ingest import _apply_legislator_deltas, refresh_derived
+from .models import Legislator, LegislatorInteraction, Post, Topic
+from .spatial import pca_cells
+from .topics import mask_for, topic_bits
+
+logger = logging.getLogger(__name__)
+
+# Full-table Parquet dumps: one hive-style directory per table, dated tables
+# split into month=YYYY-MM partitions, e.g.
+#
+#   legislators/part-0.parquet
+#   posts/month=2020-01/part-0.parquet
+#   interactions/month=2020-01/part-0.parquet
+#
+# Every file is written one keyset page (= one row group) at a time, so an
+# export never holds more than a page in memory, and pandas/pyarrow can read a
+# table directory straight back with the month as a partition column.
+
+TABLES = {
+    # name: (model, date field used for partitioning/filtering, keyset order)
+    "legislators": (Legislator, None, ("legislator_id",)),
+    "posts": (Post, "created_at", ("created_at", "post_id")),
+    "interactions": (LegislatorInteraction, "date", ("date", "id")),
+}
+# Posts carry their topic names instead of topic_mask, whose bits are only
+# meaningful inside the instance that assigned them; pca_cell depends on the
+# instance's PCA extent. Both are recomputed on import.
+EXCLUDED_COLUMNS = {"posts": {"topic_mask", "pca_cell"}}
+
+
+def _arrow_type(field):
+    internal = (field.target_field if field.is_relation else field).get_internal_type()
+    if internal in ("CharField", "TextField", "URLField"):
+        return pa.string()
+    if internal == "FloatField":
+        return pa.float64()
+    if internal == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if internal.endswith(("IntegerField", "AutoField")):
+        return pa.int64()
+    raise ValueError(f"No Arrow type for {field.model.__name__}.{field.name} ({internal})")
+
+
+def table_columns(table):
+    model = TABLES[table][0]
+    excluded = EXCLUDED_COLUMNS.get(table, set())
+    return [field for field in model._meta.concrete_fields if field.attname not in excluded]
+
+
+def table_schema(table):
+    fields = [(field.attname, _arrow_type(field)) for field in table_columns(table)]
+    if table == "posts":
+        fields.append(("topics", pa.list_(pa.string())))
+    return pa.schema(fields)
+
+
+def table_queryset(table, start_date=None, end_date=None):
+    """Rows of ``table`` between two dates (inclusive); undated tables are never filtered."""
+    model, date_field, _ = TABLES[table]
+    queryset = model.objects.all()
+    if date_field and start_date:
+        queryset = queryset.filter(**{f"{date_field}__gte": datetime.combine(start_date, time.min, timezone.utc)})
+    if date_field and end_date:
+        queryset = queryset.filter(**{f"{date_field}__lt": datetime.combine(end_date + timedelta(days=1), time.min, timezone.utc)})
+    return queryset
+
+
+def partition_batches(table, queryset=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield ``(partition path, RecordBatch)`` in table order. A keyset page that
+    straddles a month boundary is split, so each batch belongs to one partition.
+    """
+    _, date_field, keys = TABLES[table]
+    queryset = table_queryset(table) if queryset is None else queryset
+    schema = table_schema(table)
+    names = [field.attname for field in table_columns(table)]
+    date_position = names.index(date_field) if date_field else None
+
+    for rows in keyset_pages(queryset, names, keys, batch_size):
+        if date_position is None:
+            groups = [(f"{table}/part-0.parquet", rows)]
+        else:
+            groups = groupby(rows, key=lambda row: f"{table}/month={row[date_position].astimezone(timezone.utc):%Y-%m}/part-0.parquet")
+        topics = post_topics([row[0] for row in rows]) if table == "posts" else None
+        for path, group in groups:
+            columns = [list(column) for column in zip(*group)]
+            if topics is not None:
+                columns.append([topics.get(post_id, []) for post_id in columns[0]])
+            yield path, pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+            )
+
+
+def write_partitions(parts, open_file):
+    """
+    Write ``(path, batch)`` pairs into one Parquet file per path, opening each
+    through ``open_file(path)``. Yields the row count after every batch so
+    callers streaming the output can flush between batches.
+    """
+    current = writer = handle = None
+
+    def close():
+        writer.close()
+        if not handle.closed:
+            handle.close()
+
+    for path, batch in parts:
+        if path != current:
+            if writer is not None:
+                close()
+            current, handle = path, open_file(path)
+            writer = pq.ParquetWriter(handle, batch.schema, compression="zstd")
+        writer.write_batch(batch)
+        yield batch.num_rows
+    if writer is not None:
+        close()
+
+
+def export_dataset(directory, tables=TABLES, start_date=None, end_date=None, batch_size=EXPORT_BATCH_SIZE):
+    """Write ``tables`` under ``directory``; returns ``{table: rows written}``."""
+    def open_file(path):
+        path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, "wb")
+
+    counts = {}
+    for table in tables:
+        queryset = table_queryset(table, start_date, end_date)
+        counts[table] = sum(write_partitions(partition_batches(table, queryset, batch_size), open_file))
+        logger.info("Exported %d %s", counts[table], table)
+    return counts
+
+
+def zip_stream(tables=TABLES, start_date=None, end_date=None):
+    """
+    The same layout as ``export_dataset`` as a zip archive, produced batch by
+    batch. Parquet pages are already compressed, so entries are stored as is.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for table in tables:
+            queryset = table_queryset(table, start_date, end_date)
+            for _ in write_partitions(partition_batches(table, queryset), lambda path: archive.open(path, "w")):
+                yield sink.drain()
+    yield sink.drain()
+
+
+# 🔹 Import
+
+class ImportStats:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.dates = set()
+
+    def __str__(self):
+        return f"read={self.read} inserted={self.inserted} duplicates={self.duplicates} skipped={self.skipped}"
+
+
+def _dataset_files(path, table):
+    """Yield readable Parquet files of ``table`` from a dump directory or zip archive, oldest partition first."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if name.startswith(f"{table}/") and name.endswith(".parquet"):
+                    # ParquetFile needs to seek; one partition at a time fits in memory.
+                    yield io.BytesIO(archive.read(name))
+        return
+    root = os.path.join(path, table)
+    for folder, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            if name.endswith(".parquet"):
+                yield os.path.join(folder, name)
+
+
+def _load_legislators(rows, stats, state):
+    existing = set(Legislator.objects.filter(legislator_id__in=[row["legislator_id"] for row in rows]).values_list("legislator_id", flat=True))
+    new = [Legislator(**row) for row in rows if row["legislator_id"] not in existing]
+    Legislator.objects.bulk_create(new, ignore_conflicts=True)
+    state["imported_legislators"].update(legislator.legislator_id for legislator in new)
+    stats.duplicates += len(rows) - len(new)
+    stats.inserted += len(new)
+
+
+def _load_posts(rows, stats, state):
+    existing = set(Post.objects.filter(post_id__in=[row["post_id"] for row in rows]).values_list("post_id", flat=True))
+    known_legislators = state["known_legislators"]
+    posts, topics = [], []
+    bits = topic_bits()
+    for row in rows:
+        names = row.pop("topics") or []
+        if row["post_id"] in existing:
+            stats.duplicates += 1
+            continue
+        if row["legislator_id"] not in known_legislators:
+            stats.skipped += 1
+            continue
+        post = Post(**row)
+        # bulk_create skips the Topic signals, so the mask is set here.
+        post.topic_mask = mask_for(names, bits, create=True)
+        posts.append(post)
+        topics += [Topic(post_id=post.post_id, name=name) for name in names]
+
+    for post, cell in zip(posts, pca_cells([post.pca_x for post in posts], [post.pca_y for post in posts])):
+        post.pca_cell = cell
+    Post.objects.bulk_create(posts, batch_size=1000, ignore_conflicts=True)
+    Topic.objects.bulk_create(topics, batch_size=1000)
+    # Legislators imported alongside their posts already carry their totals.
+    _apply_legislator_deltas([post for post in posts if post.legislator_id not in state["imported_legislators"]])
+    stats.inserted += len(posts)
+    stats.dates.update(localdate(post.created_at) for post in posts)
+
+
+def _interaction_key(row):
+    return (row["post_id"], row["source_legislator_id"], row["target_legislator_id"], row["interaction_type"])
+
+
+def _load_interactions(rows, stats, state):
+    # Ids are the source instance's; rows are matched on what they describe
+    # and get fresh ids here.
+    posts = set(Post.objects.filter(post_id__in=[row["post_id"] for row in rows]).values_list("post_id", flat=True))
+    seen = set(
+        LegislatorInteraction.objects.filter(post_id__in=posts)
+        .values_list("post_id", "source_legislator_id", "target_legislator_id", "interaction_type")
+    )
+    known_legislators = state["known_legislators"]
+    interactions = []
+    for row in rows:
+        key = _interaction_key(row)
+        if key in seen:
+            stats.duplicates += 1
+        elif (row["post_id"] not in posts or row["source_legislator_id"] not in known_legislators
+              or row["target_legislator_id"] not in known_legislators):
+            stats.skipped += 1
+        else:
+            seen.add(key)
+            interactions.append(LegislatorInteraction(**{field: value for field, value in row.items() if field != "id"}))
+    LegislatorInteraction.objects.bulk_create(interactions, batch_size=1000)
+    stats.inserted += len(interactions)
+
+
+LOADERS = {"legislators": _load_legislators, "posts": _load_posts, "interactions": _load_interactions}
+
+
+def import_dataset(path, tables=TABLES, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Load a dump written by ``export_dataset``/``zip_stream`` (directory or
+    .zip). Tables load in dependency order, one record batch per transaction;
+    rows already present are left alone, so an interrupted import can simply
+    be run again. Returns ``{table: ImportStats}``.
+    """
+    # Legislators created from the dump already carry totals covering the
+    # dump's posts; the ids are checkpointed with each batch so that a rerun,
+    # or a later run loading just the posts, doesn't count those posts again.
+    checkpoint = f"import_parquet:{os.path.abspath(path)}"
+    state = {"imported_legislators": set(json.loads(load_checkpoint(checkpoint, "[]"))), "known_legislators": None}
+    results = {}
+    for table in TABLES:
+        if table not in tables:
+            continue
+        stats = results[table] = ImportStats()
+        state["known_legislators"] = set(Legislator.objects.values_list("legislator_id", flat=True))
+        for source in _dataset_files(path, table):
+            for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+                rows = batch.to_pylist()
+                stats.read += len(rows)
+                # The batch's days are collected on their own, then merged.
+                inserted, touched, stats.dates = stats.inserted, stats.dates, set()
+                with transaction.atomic():
+                    LOADERS[table](rows, stats, state)
+                    if stats.inserted > inserted:
+                        refresh_derived(stats.dates)
+                    if table == "legislators":
+                        save_checkpoint(checkpoint, json.dumps(sorted(state["imported_legislators"])))
+                stats.dates |= touched
+        logger.info("Imported %s: %s", table, stats)
+    return results
@@ -0,0 +1,219 @@
+import json
+import multiprocessing
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384
+
+
+def embeddings_dir():
+    return getattr(settings, "CIVICWATCH_EMBEDDINGS_DIR", os.path.join(settings.BASE_DIR, "data", "embeddings"))
+
+
+class EmbeddingStore:
+    """
+    Append-only store of post embeddings on disk.
+
+    ``vectors.bin`` holds fixed-width rows (float16 by default) read back through a
+    memory map, ``post_ids.txt`` holds one post_id per row, and ``meta.json``
+    records the committed row count. Rows past that count are leftovers from an
+    interrupted append and are discarded on the next write.
+    """
+
+    def __init__(self, path=None, dim=EMBEDDING_DIM, dtype="float16"):
+        self.path = path or embeddings_dir()
+        os.makedirs(self.path, exist_ok=True)
+        meta = self._read_meta()
+        self.dim = meta.get("dim", dim)
+        self.dtype = np.dtype(meta.get("dtype", dtype))
+        self.count = meta.get("count", 0)
+        self._ids = None
+        self._index = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._file("meta.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype.name, "count": self.count}, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = []
+            if self.count:
+                with open(self._file("post_ids.txt")) as f:
+                    for line in f:
+                        if len(self._ids) == self.count:
+                            break
+                        self._ids.append(line.rstrip("\n"))
+        return self._ids
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {post_id: row for row, post_id in enumerate(self.ids)}
+        return self._index
+
+    @property
+    def vectors(self):
+        if not self.count:
+            return np.empty((0, self.dim), dtype=self.dtype)
+        return np.memmap(self._file("vectors.bin"), dtype=self.dtype, mode="r", shape=(self.count, self.dim))
+
+    def __contains__(self, post_id):
+        return post_id in self.index
+
+    def get(self, post_ids):
+        rows = [self.index[post_id] for post_id in post_ids]
+        return np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def append(self, post_ids, vectors):
+        vectors = np.asarray(vectors, dtype=self.dtype).reshape(-1, self.dim)
+        ids = self.ids
+        row_bytes = self.dim * self.dtype.itemsize
+        with open(self._file("vectors.bin"), "ab") as f:
+            f.truncate(self.count * row_bytes)
+            f.write(vectors.tobytes())
+        with open(self._file("post_ids.txt"), "w" if not self.count else "a") as f:
+            if self.count:
+                # Drop any ids written by an interrupted append.
+                f.seek(0)
+                f.truncate(sum(len(post_id.encode()) + 1 for post_id in ids))
+            f.writelines(f"{post_id}\n" for post_id in post_ids)
+        for post_id in post_ids:
+            self.index[post_id] = len(ids)
+            ids.append(post_id)
+        self.count = len(ids)
+        self._write_meta()
+
+    def iter_chunks(self, chunk_size=50000):
+        vectors = self.vectors
+        for start in range(0, self.count, chunk_size):
+            yield self.ids[start:start + chunk_size], np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+
+
+class Projection:
+    """A fitted, versioned 2-D PCA frame: ``(x - mean) @ components.T``."""
+
+    def __init__(self, mean, components, version, fitted_on=0, created_at=None):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)
+        self.version = version
+        self.fitted_on = fitted_on
+        self.created_at = created_at or datetime.now(timezone.utc).isoformat()
+
+    def transform(self, vectors):
+        return (np.asarray(vectors, dtype=np.float32) - self.mean) @ self.components.T
+
+    def save(self, path=None):
+        path = path or embeddings_dir()
+        os.makedirs(path, exist_ok=True)
+        np.savez(os.path.join(path, f"pca_v{self.version}.npz"), mean=self.mean, components=self.components)
+        tmp = os.path.join(path, "pca_current.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"version": self.version, "fitted_on": self.fitted_on, "created_at": self.created_at}, f)
+        os.replace(tmp, os.path.join(path, "pca_current.json"))
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or embeddings_dir()
+        try:
+            with open(os.path.join(path, "pca_current.json")) as f:
+                info = json.load(f)
+        except FileNotFoundError:
+            return None
+        arrays = np.load(os.path.join(path, f"pca_v{info['version']}.npz"))
+        return cls(arrays["mean"], arrays["components"], **info)
+
+    @classmethod
+    def fit(cls, chunks, version, batch_size=10000):
+        """Fit on an iterable of embedding arrays without holding them all in memory."""
+        from sklearn.decomposition import IncrementalPCA
+
+        ipca = IncrementalPCA(n_components=2, batch_size=batch_size)
+        fitted_on = 0
+        carry = None
+        for chunk in chunks:
+            # partial_fit needs at least n_components rows per call
+            chunk = chunk if carry is None else np.vstack([carry, chunk])
+            if len(chunk) < 2:
+                carry = chunk
+                continue
+            ipca.partial_fit(chunk)
+            fitted_on += len(chunk)
+            carry = None
+        if not fitted_on:
+            return None
+        return cls(ipca.mean_, ipca.components_, version, fitted_on=fitted_on)
+
+
+# 🔹 Multi-process encoding
+
+_worker_model = None
+
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    try:
+        import torch
+        # Split the cores between workers instead of letting each grab all of them.
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_batch(task):
+    rows, texts = task
+    return rows, _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+
+def length_bucketed_batches(texts, batch_size):
+    """Row indices grouped into batches of similar length, so each batch pads little."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+class EmbeddingPool:
+    """Encodes texts on ``workers`` processes, each holding its own model."""
+
+    def __init__(self, model_name, workers, batch_size=64):
+        threads = max(1, (os.cpu_count() or workers) // workers)
+        context = multiprocessing.get_context("spawn")
+        self.pool = context.Pool(workers, initializer=_init_worker, initargs=(model_name, threads))
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        tasks = [(rows, [texts[i] for i in rows]) for rows in length_bucketed_batches(texts, self.batch_size)]
+        for rows, batch in self.pool.imap_unordered(_encode_batch, tasks):
+            vectors[rows] = batch
+        return vectors
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
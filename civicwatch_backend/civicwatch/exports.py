@@ -0,0 +1,211 @@
+import csv
+import zlib
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import Topic
+
+# Rows fetched per keyset page; each page is one bounded query plus one topic
+# query, so memory stays flat however many posts are exported.
+EXPORT_BATCH_SIZE = 2000
+
+CSV_HEADER = [
+    'Post ID', 'Legislator Name', 'Created At', 'Text',
+    'State', 'Chamber', 'Party', 'Retweet Count', 'Like Count',
+    'Misinfo Count', 'Civility Score', 'Interaction Score', 'Overperforming Score',
+    'Topics'
+]
+EXPORT_FIELDS = [
+    "post_id", "name", "created_at", "text", "state", "chamber", "party",
+    "retweet_count", "like_count", "count_misinfo",
+    "civility_score", "interaction_score", "overperforming_score",
+]
+
+
+def after_keys(keys, last):
+    """
+    Condition for rows ordered after ``last`` on ``keys``: (k1, k2, ...) > last,
+    spelled out for databases without row comparisons.
+    """
+    after = Q()
+    for i, key in enumerate(keys):
+        after |= Q(**{k: v for k, v in zip(keys[:i], last[:i])}, **{f"{key}__gt": last[i]})
+    return after
+
+
+def keyset_pages(queryset, fields, keys, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield pages of ``queryset.values_list(*fields)`` ordered by ``keys`` (which
+    must end in a unique field and be among ``fields``). Each page continues
+    after the last key seen rather than using OFFSET, so late pages cost the
+    same as the first.
+    """
+    fields = list(fields)
+    positions = [fields.index(key) for key in keys]
+    ordered = queryset.order_by(*keys).values_list(*fields)
+    last = None
+    while True:
+        page = ordered
+        if last is not None:
+            page = page.filter(after_keys(keys, last))
+        rows = list(page[:batch_size])
+        if not rows:
+            return
+        yield rows
+        last = [rows[-1][position] for position in positions]
+        if len(rows) < batch_size:
+            return
+
+
+def post_topics(post_ids):
+    topics = defaultdict(list)
+    for post_id, name in Topic.objects.filter(post_id__in=post_ids).values_list("post_id", "name"):
+        topics[post_id].append(name)
+    return topics
+
+
+def iter_post_batches(queryset, fields=EXPORT_FIELDS, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield ``(rows, topics)`` pages of posts in (created_at, post_id) order;
+    ``topics`` maps each post_id in the page to its topic names.
+    """
+    post_id = list(fields).index("post_id")
+    for rows in keyset_pages(queryset, fields, ("created_at", "post_id"), batch_size):
+        yield rows, post_topics([row[post_id] for row in rows])
+
+
+def stream_for(request, chunks):
+    """
+    Iterator to hand StreamingHttpResponse. Under ASGI, Django buffers a sync
+    iterator completely before sending it, so there the chunks are pulled one
+    at a time from a worker thread through an async generator instead.
+    """
+    from django.core.handlers.asgi import ASGIRequest
+
+    return _pull_async(chunks) if isinstance(request, ASGIRequest) else chunks
+
+
+async def _pull_async(chunks):
+    from asgiref.sync import sync_to_async
+
+    iterator = iter(chunks)
+    done = object()
+    step = sync_to_async(next)
+    while (chunk := await step(iterator, done)) is not done:
+        yield chunk
+
+
+class _Echo:
+    """File-like object whose write() hands back what it was given."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Yield the export CSV in chunks of one page each."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for rows, topics in iter_post_batches(queryset, batch_size=batch_size):
+        lines = []
+        for row in rows:
+            row = list(row)
+            row[2] = row[2].strftime('%Y-%m-%d %H:%M:%S')
+            lines.append(writer.writerow(row + [', '.join(topics.get(row[0], []))]))
+        yield ''.join(lines)
+
+
+def gzip_stream(chunks):
+    """Compress a stream of str/bytes chunks into a gzip member as it goes."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# 🔹 Arrow / Parquet (optional pyarrow dependency)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+
+def arrow_available():
+    return pa is not None
+
+
+def _post_schema():
+    return pa.schema([
+        ("post_id", pa.string()),
+        ("name", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("text", pa.string()),
+        ("state", pa.string()),
+        ("chamber", pa.string()),
+        ("party", pa.string()),
+        ("retweet_count", pa.int64()),
+        ("like_count", pa.int64()),
+        ("count_misinfo", pa.int64()),
+        ("civility_score", pa.float64()),
+        ("interaction_score", pa.float64()),
+        ("overperforming_score", pa.float64()),
+        ("topics", pa.list_(pa.string())),
+    ])
+
+
+def arrow_batches(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """One Arrow RecordBatch per keyset page of the export."""
+    schema = _post_schema()
+    for rows, topics in iter_post_batches(queryset, batch_size=batch_size):
+        columns = [list(column) for column in zip(*rows)]
+        columns.append([topics.get(post_id, []) for post_id in columns[0]])
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+        )
+
+
+class _ChunkSink:
+    """Writable sink the Arrow writers flush into; drained after every batch."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _stream_with(writer_factory, queryset, batch_size):
+    sink = _ChunkSink()
+    writer = writer_factory(sink, _post_schema())
+    for batch in arrow_batches(queryset, batch_size):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_stream(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Parquet file bytes, one row group per page, produced as pages are read."""
+    return _stream_with(lambda sink, schema: pq.ParquetWriter(sink, schema, compression="zstd"), queryset, batch_size)
+
+
+def arrow_stream(queryset, batch_size=EXPORT_BATCH_SIZE):
+    """Arrow IPC stream bytes, one record batch per page."""
+    return _stream_with(lambda sink, schema: pa.ipc.new_stream(sink, schema), queryset, batch_size)
@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+# Runs independent queries of one endpoint side by side, so its latency is the
+# slowest query instead of the sum. Django connections are per thread, so each
+# pool thread talks to the database over its own connection (kept or closed
+# per CONN_MAX_AGE like request connections).
+
+_lock = threading.Lock()
+_pool = {"executor": None, "workers": 0}
+
+
+def query_workers():
+    return getattr(settings, "CIVICWATCH_QUERY_WORKERS", 4)
+
+
+def _executor(workers):
+    with _lock:
+        if _pool["executor"] is None or _pool["workers"] != workers:
+            if _pool["executor"] is not None:
+                _pool["executor"].shutdown(wait=False)
+            _pool["executor"] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="civicwatch-query")
+            _pool["workers"] = workers
+        return _pool["executor"]
+
+
+def _shares_data():
+    # Other connections can't see this one's uncommitted writes (tests, ATOMIC_REQUESTS)
+    # or a private in-memory SQLite database.
+    if connection.in_atomic_block:
+        return False
+    return not (connection.vendor == "sqlite" and connection.is_in_memory_db())
+
+
+def _run(call):
+    try:
+        return call()
+    finally:
+        close_old_connections()
+
+
+def run_parallel(*calls):
+    """
+    Evaluate independent zero-argument callables concurrently and return their
+    results in order. Callables must materialize their querysets (``list(...)``,
+    ``.aggregate()``), since lazy querysets would run later on the caller's
+    thread. Falls back to running them in turn when parallelism is off or
+    unsafe.
+    """
+    workers = query_workers()
+    if workers <= 1 or len(calls) < 2 or not _shares_data():
+        return [call() for call in calls]
+    executor = _executor(workers)
+    futures = [executor.submit(_run, call) for call in calls[1:]]
+    # The first query runs on the request thread while the others are in flight.
+    first = calls[0]()
+    return [first] + [future.result() for future in futures]
@@ -0,0 +1,256 @@
+import csv
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import localdate
+
+from . import rollups
+from .checkpoints import bump_data_version, save_checkpoint
+from .models import Legislator, LegislatorInteraction, Post, Topic
+from .topics import mask_for, topic_bits
+
+logger = logging.getLogger(__name__)
+
+# Substrings that tag a post with a topic (matches the dashboard's topic list).
+TOPIC_KEYWORDS = ["abortion", "blacklivesmatter", "capitol", "climate", "covid", "gun", "immigra", "rights"]
+
+INT_FIELDS = ["retweet_count", "like_count", "count_misinfo"]
+FLOAT_FIELDS = [
+    "civility_score", "interaction_score", "overperforming_score",
+    "toxicity", "severe_toxicity", "obscene", "threat", "insult", "identity_attack",
+]
+# Post scores averaged into the legislator's <field>_tw.
+SCORE_FIELDS = ["civility_score", "interaction_score", "overperforming_score"]
+# Record keys holding the legislator id(s) a post interacts with.
+INTERACTION_FIELDS = {"mentions": "mention", "reply_to": "reply", "retweet_of": "share"}
+
+
+def derive_topics(text):
+    text = (text or "").lower()
+    return [keyword for keyword in TOPIC_KEYWORDS if keyword in text]
+
+
+# 🔹 Readers
+
+def read_records(path, fmt=None):
+    """Yield one dict per tweet from an NDJSON or CSV dump without loading the whole file."""
+    fmt = fmt or ("csv" if str(path).endswith(".csv") else "ndjson")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def _split_list(value):
+    if value in (None, ""):
+        return []
+    if isinstance(value, list):
+        return value
+    return [item.strip() for item in str(value).replace(";", ",").split(",") if item.strip()]
+
+
+def _number(value, cast):
+    if value in (None, ""):
+        return None
+    return cast(float(value)) if cast is int else cast(value)
+
+
+def _parse_created_at(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        # Twitter API v1 format, e.g. "Wed Oct 10 20:19:24 +0000 2018"
+        parsed = datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+# 🔹 Loading
+
+class IngestStats:
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.dates = set()
+
+    def __str__(self):
+        return f"read={self.read} inserted={self.inserted} duplicates={self.duplicates} skipped={self.skipped}"
+
+
+def _record_id(record):
+    post_id = record.get("post_id", record.get("id"))
+    if post_id in (None, ""):
+        raise KeyError("post_id")
+    return str(post_id)
+
+
+def _build_post(record, legislator):
+    post = Post(
+        post_id=_record_id(record),
+        legislator_id=legislator.legislator_id,
+        name=record.get("name") or legislator.name,
+        created_at=_parse_created_at(record["created_at"]),
+        text=record.get("text") or "",
+        attachment=record.get("attachment") or None,
+        state=record.get("state") or legislator.state,
+        chamber=record.get("chamber") or legislator.chamber,
+        party=record.get("party") or legislator.party,
+    )
+    for field in INT_FIELDS:
+        setattr(post, field, _number(record.get(field), int) or 0)
+    for field in FLOAT_FIELDS:
+        setattr(post, field, _number(record.get(field), float))
+    return post
+
+
+def _apply_legislator_deltas(new_posts):
+    deltas = defaultdict(lambda: defaultdict(float))
+    for post in new_posts:
+        d = deltas[post.legislator_id]
+        d["posts"] += 1
+        d["likes"] += post.like_count
+        d["retweets"] += post.retweet_count
+        d["misinfo"] += post.count_misinfo
+        for field in SCORE_FIELDS:
+            value = getattr(post, field)
+            if value is not None:
+                d[f"{field}_sum"] += value
+                d[f"{field}_n"] += 1
+
+    legislators = list(Legislator.objects.select_for_update().filter(legislator_id__in=deltas))
+    for leg in legislators:
+        d = deltas[leg.legislator_id]
+        # Score means are over the posts that have a score: fold the chunk's
+        # sum into the stored mean, weighted by the scored-post counts.
+        for field in SCORE_FIELDS:
+            added = int(d[f"{field}_n"])
+            if added:
+                count = getattr(leg, f"{field}_count_tw")
+                mean = getattr(leg, f"{field}_tw")
+                setattr(leg, f"{field}_tw", (mean * count + d[f"{field}_sum"]) / (count + added))
+                setattr(leg, f"{field}_count_tw", count + added)
+        leg.total_posts_tw += int(d["posts"])
+        leg.total_likes_tw += int(d["likes"])
+        leg.total_retweets_tw += int(d["retweets"])
+        leg.total_misinfo_count_tw += int(d["misinfo"])
+        leg.total_interactions_tw += int(d["likes"] + d["retweets"])
+    Legislator.objects.bulk_update(legislators, [
+        "total_posts_tw", "total_likes_tw", "total_retweets_tw", "total_misinfo_count_tw",
+        "total_interactions_tw", *(f"{field}_tw" for field in SCORE_FIELDS), *(f"{field}_count_tw" for field in SCORE_FIELDS),
+    ])
+
+
+def ingest_chunk(records, legislators, stats):
+    """Insert one chunk of records; returns the posts that were new."""
+    candidates = {}
+    for record in records:
+        stats.read += 1
+        try:
+            legislator = legislators.get(int(record["legislator_id"]))
+            if legislator is None:
+                raise KeyError(f"unknown legislator {record['legislator_id']}")
+            post = _build_post(record, legislator)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning("Skipping record %d: %s", stats.read, e)
+            stats.skipped += 1
+            continue
+        candidates[post.post_id] = (post, record)
+
+    existing = set(Post.objects.filter(post_id__in=candidates).values_list("post_id", flat=True))
+    new = [(post, record) for post_id, (post, record) in candidates.items() if post_id not in existing]
+    stats.duplicates += len(candidates) - len(new)
+    if not new:
+        return []
+
+    topics = []
+    interactions = []
+    bits = topic_bits()
+    for post, record in new:
+        names = _split_list(record.get("topics")) or derive_topics(post.text)
+        topics += [Topic(post_id=post.post_id, name=name) for name in names]
+        # bulk_create skips the Topic signals, so the mask is set here.
+        post.topic_mask = mask_for(names, bits, create=True)
+        for field, interaction_type in INTERACTION_FIELDS.items():
+            for value in _split_list(record.get(field)):
+                try:
+                    target = _number(value, int)
+                except (TypeError, ValueError):
+                    logger.warning("Skipping %s value %r of post %s: not a legislator id", field, value, post.post_id)
+                    continue
+                if target in legislators:
+                    interactions.append(LegislatorInteraction(
+                        date=post.created_at, post_id=post.post_id, source_legislator_id=post.legislator_id,
+                        target_legislator_id=target, interaction_type=interaction_type,
+                    ))
+
+    new_posts = [post for post, _ in new]
+    Post.objects.bulk_create(new_posts, batch_size=1000, ignore_conflicts=True)
+    Topic.objects.bulk_create(topics, batch_size=1000)
+    LegislatorInteraction.objects.bulk_create(interactions, batch_size=1000)
+    _apply_legislator_deltas(new_posts)
+
+    stats.inserted += len(new_posts)
+    stats.dates.update(localdate(post.created_at) for post in new_posts)
+    return new_posts
+
+
+def refresh_derived(dates, appended=False):
+    """
+    Rebuild the rollup days in ``dates`` (when a rollup is built) and bump
+    the data version. Called inside each load transaction, so whatever a
+    crashed load committed is already reflected in the rollup and caches.
+    """
+    if dates and rollups.rollup_coverage() is not None:
+        rollups.refresh_rollup_dates(dates)
+    bump_data_version(appended=appended)
+
+
+def last_post_key():
+    """(created_at, post_id) of the post that sorts last, or None."""
+    return Post.objects.order_by("-created_at", "-post_id").values_list("created_at", "post_id").first()
+
+
+def ingest_records(records, checkpoint_name, start_at=0, chunk_size=5000):
+    """
+    Load records in chunks of ``chunk_size``. Each chunk, its rollup refresh and its
+    checkpoint commit in one transaction, so a crashed load restarts at the first
+    uncommitted record with everything before it already reflected.
+    """
+    legislators = {leg.legislator_id: leg for leg in Legislator.objects.all()}
+    stats = IngestStats()
+    position = 0
+    chunk = []
+
+    def flush():
+        with transaction.atomic():
+            last = last_post_key()
+            new_posts = ingest_chunk(chunk, legislators, stats)
+            if new_posts:
+                # Posts newer than everything stored (the usual, chronological
+                # feed) only need appending to in-memory copies.
+                appended = last is None or min((post.created_at, post.post_id) for post in new_posts) > last
+                refresh_derived({localdate(post.created_at) for post in new_posts}, appended)
+            save_checkpoint(checkpoint_name, position)
+        logger.info("Ingested through record %d (%s)", position, stats)
+        chunk.clear()
+
+    for record in records:
+        position += 1
+        if position <= start_at:
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return stats
@@ -0,0 +1,79 @@
+import inspect
+import time
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.urls import Resolver404, resolve
+
+from civicwatch import serialization
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_URLS = [
+    '/api/posts/post_semantic_similarity/',
+    '/api/posts/post_semantic_similarity/?format=rows',
+    '/api/chord/chord_interactions/',
+    '/api/flow/bipartite/',
+    '/api/legislators/legislator_posts_by_month_top_50/',
+]
+
+_captured = []
+
+
+def capture(data):
+    """JSON backend that keeps the payload instead of encoding it."""
+    _captured.append(data)
+    return b'null'
+
+
+class Command(BaseCommand):
+    help = 'Compares the JSON backends on live API payloads: encode throughput and whole-request time per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='*', default=DEFAULT_URLS, help='API URLs (with query string) to benchmark')
+        parser.add_argument('--backends', nargs='+', default=None, help='Backends to compare (default: stdlib, and orjson if installed)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the fastest is reported')
+
+    def handle(self, *args, **options):
+        backends = options['backends'] or ['stdlib'] + (['orjson'] if serialization.orjson is not None else [])
+        self.repeat = max(options['repeat'], 1)
+        self.factory = RequestFactory()
+
+        self.stdout.write(f"{'backend':<8} {'bytes':>12} {'encode ms':>10} {'MB/s':>8} {'request ms':>11}  url")
+        for url in options['urls']:
+            with override_settings(CIVICWATCH_JSON_BACKEND=f'{__name__}.capture'):
+                self.call(url)
+            data = _captured.pop()
+            for backend in backends:
+                dumps = serialization.encoder(backend)
+                encode, body = self.best(lambda: dumps(data))
+                with override_settings(CIVICWATCH_JSON_BACKEND=backend):
+                    request, _ = self.best(lambda: self.call(url))
+                self.stdout.write(
+                    f"{backend:<8} {len(body):>12,} {encode * 1000:>10.1f} {len(body) / encode / 1e6:>8.1f} {request * 1000:>11.1f}  {url}"
+                )
+
+    def call(self, url):
+        try:
+            match = resolve(urlsplit(url).path)
+        except Resolver404:
+            raise CommandError(f"No view for {url}")
+        # Around the response cache, so every run does the full work.
+        view = getattr(match.func, '__wrapped__', match.func)
+        if inspect.iscoroutinefunction(view):
+            view = async_to_sync(view)
+        response = view(self.factory.get(url), *match.args, **match.kwargs)
+        if response.status_code != 200:
+            raise CommandError(f"{url} returned {response.status_code}")
+        return response
+
+    def best(self, run):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
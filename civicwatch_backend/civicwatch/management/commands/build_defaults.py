@@ -0,0 +1,154 @@
+import json
+import os
+import tempfile
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from civicwatch import views
+from civicwatch.checkpoints import bump_data_version
+from civicwatch.models import Legislator, LegislatorInteraction, Topic
+from civicwatch.serialization import dumps
+from civicwatch.static_payloads import DATA_DIR
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MANIFEST_FILE = 'defaults_manifest.json'
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the precomputed default*.json payloads served by the default_* endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=DATA_DIR, help='Directory to write the payloads to')
+
+    def handle(self, *args, **options):
+        # The views serve these files for the DEFAULT_START..DEFAULT_END
+        # window only, so that is the window they are built for. The rollup
+        # is left as it is: it answers here where it covers the window, and
+        # the posts are queried otherwise.
+        start, end = parse_date(views.DEFAULT_START), parse_date(views.DEFAULT_END)
+        self.start, self.end = start.isoformat(), end.isoformat()
+        self.output_dir = options['output_dir']
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.factory = RequestFactory()
+
+        window = {'start_date': self.start, 'end_date': self.end}
+        files = {}
+        files['defaultOverviewTab.json'] = self.view_body(views.overview_metrics, window)
+        files['defaultOverviewTrendline.json'] = self.view_body(views.trend_data, window)
+        files['defaultEngagementTab.json'] = self.view_body(views.engagement_metrics, window)
+        files['defaultAccountability.json'] = self.view_body(views.post_statistics, window)
+        files['defaultBipartite.json'] = self.dump(self.bipartite(window, start, end))
+        for metric, filename in views.METRIC_FILE_MAP.items():
+            files[filename] = views.geo_activity_from_db(metric, self.start, self.end, []).content
+        files['defaultInteractionNetwork.json'] = self.dump(self.interaction_network())
+
+        for filename, body in files.items():
+            self.write(filename, body)
+            logging.info(f"Wrote {filename} ({len(body)} bytes)")
+
+        # Only now that every file is in place: a request between the bump and
+        # the last rename would cache an old file under the new version.
+        version = bump_data_version()
+        self.write(MANIFEST_FILE, self.dump({
+            'start_date': self.start,
+            'end_date': self.end,
+            'data_version': version,
+            'built_at': timezone.now().isoformat(),
+            'files': sorted(files),
+        }))
+        logging.info(f"Built {len(files)} default payloads at data version {version}")
+
+    def view_body(self, view, params):
+        # Call the view itself, not the cached wrapper, so nothing stale is reused.
+        view = getattr(view, '__wrapped__', view)
+        response = view(self.factory.get('/', params))
+        if response.status_code != 200:
+            raise CommandError(f"{view.__name__} returned {response.status_code}")
+        return response.content
+
+    def dump(self, data):
+        return dumps(data)
+
+    def write(self, filename, body):
+        # Write beside the target and rename over it, so readers never see a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=f'.{filename}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, os.path.join(self.output_dir, filename))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def bipartite(self, window, start, end):
+        # The flow chart expects D/R keys and every day of the window, zero-filled.
+        rows = json.loads(self.view_body(views.bipartite_flow_data, window))
+        topics = sorted(set(Topic.objects.exclude(name__isnull=True).values_list('name', flat=True)))
+        empty = {'posts': 0, 'legislators': 0, 'likes': 0, 'shares': 0}
+        by_date = {row.pop('date'): row for row in rows}
+
+        payload = []
+        day = start
+        while day <= end:
+            row = by_date.get(day.isoformat(), {})
+            entry = {'date': day.isoformat()}
+            for topic in topics:
+                cells = row.get(topic, {})
+                entry[topic] = {'D': dict(empty), 'R': dict(empty)}
+                for party, cell in cells.items():
+                    key = (party or '')[:1]
+                    if key in entry[topic]:
+                        entry[topic][key] = cell
+            payload.append(entry)
+            day += timedelta(days=1)
+        return payload
+
+    def interaction_network(self):
+        # Interactions aggregated per (source, target, day), with the union of
+        # their post topics and texts; legislators are listed once as nodes.
+        interactions = LegislatorInteraction.objects.filter(
+            date__date__range=(self.start, self.end)
+        ).values_list('source_legislator_id', 'target_legislator_id', 'date', 'post_id', 'post__text')
+
+        post_topics = defaultdict(set)
+        for post_id, name in Topic.objects.filter(
+            post__legislatorinteraction__date__date__range=(self.start, self.end)
+        ).values_list('post_id', 'name').distinct():
+            post_topics[post_id].add(name)
+
+        links = {}
+        for source_id, target_id, when, post_id, text in interactions.iterator(chunk_size=5000):
+            key = (source_id, target_id, when.date())
+            link = links.get(key)
+            if link is None:
+                link = links[key] = {'value': 0, 'topics': set(), 'texts': []}
+            link['value'] += 1
+            link['topics'] |= post_topics.get(post_id, set())
+            link['texts'].append(text)
+
+        legislator_ids = {source_id for source_id, _, _ in links} | {target_id for _, target_id, _ in links}
+        nodes = [
+            {'legislator_id': leg.legislator_id, 'name': leg.name, 'state': leg.state, 'party': leg.party}
+            for leg in Legislator.objects.filter(legislator_id__in=legislator_ids).order_by('legislator_id')
+        ]
+        return {
+            'nodes': nodes,
+            'links': [
+                {
+                    'source_legislator_id': source_id,
+                    'target_legislator_id': target_id,
+                    'date': day,
+                    'value': link['value'],
+                    'topics': sorted(link['topics']),
+                    'texts': link['texts'],
+                }
+                for (source_id, target_id, day), link in sorted(links.items())
+            ],
+        }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from civicwatch.checkpoints import bump_data_version
+from civicwatch.spatial import pca_extent, refresh_pca_cells
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the quadtree cell of every post from its PCA coordinates (after changing CIVICWATCH_PCA_EXTENT)'
+
+    def handle(self, *args, **options):
+        logging.info(f"Tiling PCA extent {pca_extent()}")
+        updated = refresh_pca_cells()
+        logging.info(f"Updated {updated} posts")
+        if updated:
+            bump_data_version()
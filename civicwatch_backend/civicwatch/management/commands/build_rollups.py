@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from civicwatch import rollups
+from civicwatch.checkpoints import bump_data_version
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Builds the daily post rollup used by the dashboard endpoints (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--full', action='store_true', help='Rebuild every day that has posts')
+
+    def handle(self, *args, **options):
+        first_post, last_post = rollups.post_date_bounds()
+        if first_post is None:
+            logging.info("No posts to roll up")
+            return
+
+        if options['full']:
+            start, end = first_post, last_post
+        else:
+            # Resume from the last rolled-up day: it may have been built while still filling up.
+            start = parse_date(options['start']) if options['start'] else (rollups.rollup_watermark() or first_post)
+            end = parse_date(options['end']) if options['end'] else last_post
+
+        if start is None or end is None:
+            raise CommandError("Dates must be formatted as YYYY-MM-DD")
+        if start > end:
+            logging.info("Rollup is up to date")
+            return
+
+        logging.info(f"Rebuilding rollup for {start} .. {end} ({(end - start + timedelta(days=1)).days} days)")
+        written = rollups.rebuild_rollups(start, end)
+        bump_data_version()
+        logging.info(f"Wrote {written} rollup cells")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from civicwatch.checkpoints import bump_data_version
+from civicwatch.embeddings import EmbeddingStore
+from civicwatch.vector_index import build_index
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Builds the IVF nearest-neighbour index over stored post embeddings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nlist', type=int, help='Number of clusters (default 4*sqrt(N))')
+        parser.add_argument('--sample', type=int, default=100000, help='Embeddings sampled to train the clusters')
+
+    def handle(self, *args, **options):
+        store = EmbeddingStore()
+        logging.info(f"Indexing {len(store)} embeddings")
+        count = build_index(store, nlist=options['nlist'], sample_size=options['sample'])
+        logging.info(f"Indexed {count} embeddings")
+        # similar_posts responses cached from the old index are invalidated with the version.
+        bump_data_version()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from civicwatch import datasets, exports
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Exports legislators, posts and interactions as Parquet partitioned by month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Output directory (one sub-directory per table)')
+        parser.add_argument('--tables', default=','.join(datasets.TABLES), help='Comma-separated subset of: ' + ', '.join(datasets.TABLES))
+        parser.add_argument('--start', help='First day of posts/interactions to export (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day of posts/interactions to export (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=exports.EXPORT_BATCH_SIZE, help='Rows per record batch')
+
+    def handle(self, *args, **options):
+        if not exports.arrow_available():
+            raise CommandError("Parquet export needs the pyarrow package")
+
+        tables = [table.strip() for table in options['tables'].split(',') if table.strip()]
+        unknown = [table for table in tables if table not in datasets.TABLES]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+        if (options['start'] and start is None) or (options['end'] and end is None):
+            raise CommandError("Dates must be formatted as YYYY-MM-DD")
+
+        counts = datasets.export_dataset(options['directory'], tables, start, end, options['batch_size'])
+        logging.info(f"Export finished: {counts}")
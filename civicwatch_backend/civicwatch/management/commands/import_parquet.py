@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from civicwatch import datasets, exports
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Loads a Parquet dump written by export_parquet (directory or the API zip)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dump directory or .zip archive')
+        parser.add_argument('--tables', default=','.join(datasets.TABLES), help='Comma-separated subset of: ' + ', '.join(datasets.TABLES))
+        parser.add_argument('--batch-size', type=int, default=exports.EXPORT_BATCH_SIZE, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        if not exports.arrow_available():
+            raise CommandError("Parquet import needs the pyarrow package")
+        if not os.path.exists(options['path']):
+            raise CommandError(f"Not found: {options['path']}")
+
+        tables = [table.strip() for table in options['tables'].split(',') if table.strip()]
+        unknown = [table for table in tables if table not in datasets.TABLES]
+        if unknown:
+            raise CommandError(f"Unknown tables: {', '.join(unknown)}")
+
+        # Each committed batch refreshes the rollup days it touched and bumps the data version.
+        datasets.import_dataset(options['path'], tables, options['batch_size'])
@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from civicwatch.checkpoints import clear_checkpoint, load_checkpoint
+from civicwatch.ingest import ingest_records, read_records
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class Command(BaseCommand):
+    help = 'Loads posts, topics and interactions from NDJSON/CSV tweet dumps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='NDJSON (.ndjson/.jsonl) or CSV files')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='Override format detection')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Records per transaction')
+        parser.add_argument('--restart', action='store_true', help='Ignore saved checkpoints and start from the top')
+
+    def handle(self, *args, **options):
+        for path in options['paths']:
+            if not os.path.exists(path):
+                raise CommandError(f"File not found: {path}")
+
+            checkpoint_name = f"ingest:{os.path.abspath(path)}"
+            if options['restart']:
+                clear_checkpoint(checkpoint_name)
+            start_at = int(load_checkpoint(checkpoint_name, 0))
+            if start_at:
+                logging.info(f"Resuming {path} after record {start_at}")
+
+            stats = ingest_records(
+                read_records(path, options['format']),
+                checkpoint_name,
+                start_at=start_at,
+                chunk_size=options['chunk_size'],
+            )
+            logging.info(f"Finished {path}: {stats}")
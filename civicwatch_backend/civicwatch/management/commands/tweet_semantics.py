@@ -1,54 +1,196 @@
-import numpy as np 
-import pandas as pd
+import json
+import time
+
 from django.core.management.base import BaseCommand
-from sentence_transformers import SentenceTransformer
-from sklearn.decomposition import PCA
+from django.db import transaction
+from civicwatch.checkpoints import bump_data_version, clear_checkpoint, load_checkpoint, save_checkpoint
+from civicwatch.embeddings import MODEL_NAME, EmbeddingPool, EmbeddingStore, Projection
 from civicwatch.models import Post
+from civicwatch.spatial import pca_cells
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-MODEL_NAME = 'all-MiniLM-L6-v2'
 BATCH_SIZE = 64
+CHUNK_SIZE = 2048
+CHECKPOINT_NAME = 'tweet_semantics'
 
 class Command(BaseCommand):
     help = 'Generates sentence embeddings and PCA coordinates for tweets'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--stream', action='store_true',
+                            help='Encode and write back in chunks with bounded memory, resuming from the last checkpoint')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Posts per chunk in --stream mode')
+        parser.add_argument('--restart', action='store_true', help='Discard the saved checkpoint')
+        parser.add_argument('--refit', action='store_true',
+                            help='Fit a new PCA version on every stored embedding and reproject all posts')
+        parser.add_argument('--dtype', choices=['float16', 'float32'], default='float16',
+                            help='Precision of a newly created embedding store')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Encode on this many processes, each with its own model')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Texts per encode batch')
+
     def handle(self, *args, **options):
         logging.info("Starting tweet processing")
 
-        posts_to_process = Post.objects.filter(pca_x__isnull=True)
-        post_text = [post.text for post in posts_to_process]
-        post_ids = [post.post_id for post in posts_to_process]
+        self.store = EmbeddingStore(dtype=options['dtype'])
+        self.projection = Projection.load()
+        self.model = None
+        self.pool = None
+        self.batch_size = options['batch_size']
+        self.workers = options['workers']
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        self.updated = 0
 
-        if not post_text:
-            logging.info("No new tweets to process")
-            return
+        try:
+            if options['stream']:
+                self.handle_stream(options['chunk_size'], options['restart'])
+            else:
+                pending = list(Post.objects.filter(pca_x__isnull=True).values_list('post_id', 'text'))
+                if pending:
+                    logging.info(f"Found {len(pending)} tweets to process.")
+                    self.process_chunk(pending)
+                else:
+                    logging.info("No new tweets to process")
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+
+        if self.encoded:
+            logging.info(f"Encoded {self.encoded} tweets at {self.encoded / self.encode_seconds:.1f} tweets/sec "
+                         f"({self.workers} worker{'s' if self.workers > 1 else ''})")
+
+        if options['refit']:
+            self.refit()
+
+        if self.updated:
+            bump_data_version()
+        logging.info("finito")
+
+    def handle_stream(self, chunk_size, restart):
+        if restart:
+            clear_checkpoint(CHECKPOINT_NAME)
+        state = json.loads(load_checkpoint(CHECKPOINT_NAME) or '{}')
+        last_post_id = state.get('last_post_id', '')
+        pending = Post.objects.filter(pca_x__isnull=True).order_by('post_id')
+
+        if self.projection is None:
+            # No frame yet: embed every pending tweet first, so that PCA v1 is
+            # fitted on all of them rather than on whichever chunk comes first.
+            self.encode_stream(pending, chunk_size, state.get('encoded_through', ''))
+            self.projection = Projection.fit((vectors for _, vectors in self.store.iter_chunks()), version=1)
+            if self.projection is None:
+                clear_checkpoint(CHECKPOINT_NAME)
+                logging.info("No tweets to process")
+                return
+            self.projection.save()
+            logging.info(f"Fitted PCA v1 on {self.projection.fitted_on} tweets")
 
-        logging.info(f"Found {len(post_text)} tweets to process.")
+        if last_post_id:
+            logging.info(f"Resuming after post {last_post_id}")
+        processed = 0
 
-        model = SentenceTransformer(MODEL_NAME)
+        while True:
+            # Keyset pagination: each chunk is a fresh bounded query, so nothing
+            # accumulates across chunks and rows written back don't shift the window.
+            chunk = list(pending.filter(post_id__gt=last_post_id).values_list('post_id', 'text')[:chunk_size])
+            if not chunk:
+                break
 
-        embeddings = model.encode(post_text, show_progress_bar=True, batch_size=BATCH_SIZE)
-        logging.info(f"Generated {embeddings.shape[0]} embeddings with dimension {embeddings.shape[1]}.")
+            last_post_id = chunk[-1][0]
+            self.process_chunk(chunk, checkpoint={'last_post_id': last_post_id})
 
-        logging.info("Applying PCA...")
-        pca = PCA(n_components=2)
-        pca_results = pca.fit_transform(embeddings)
-        logging.info("PCA transformation complete.")
+            processed += len(chunk)
+            logging.info(f"Updated {processed} tweets (through post {last_post_id})")
 
-        logging.info("Updating database...")
+        clear_checkpoint(CHECKPOINT_NAME)
+        logging.info(f"Processed {processed} tweets")
 
-        updates = []
+    def encode_stream(self, pending, chunk_size, encoded_through):
+        if encoded_through:
+            logging.info(f"Resuming encoding after post {encoded_through}")
+        while True:
+            chunk = list(pending.filter(post_id__gt=encoded_through).values_list('post_id', 'text')[:chunk_size])
+            if not chunk:
+                break
+            encoded_through = chunk[-1][0]
+            self.embed(chunk)
+            save_checkpoint(CHECKPOINT_NAME, json.dumps({'encoded_through': encoded_through}))
+            logging.info(f"Embedded tweets through post {encoded_through}")
 
-        for i, post_id in enumerate(post_ids):
-            post = posts_to_process[i]
-            post.pca_x = pca_results[i, 0]
-            post.pca_y = pca_results[i, 1]
-            updates.append(post)
-        
-        if updates:
-            Post.objects.bulk_update(updates, ['pca_x', 'pca_y'])
-            logging.info(f"Updated batch of{len(updates)} posts")
+    def encode(self, texts):
+        started = time.perf_counter()
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = EmbeddingPool(MODEL_NAME, self.workers, batch_size=self.batch_size)
+            embeddings = self.pool.encode(texts)
+        else:
+            if self.model is None:
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(MODEL_NAME)
+            # encode() already length-sorts within a call
+            embeddings = self.model.encode(texts, batch_size=self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        self.encoded += len(texts)
+        self.encode_seconds += elapsed
+        logging.info(f"Encoded {len(texts)} tweets in {elapsed:.1f}s ({len(texts) / elapsed:.1f} tweets/sec)")
+        return embeddings
+
+    def embed(self, chunk):
+        # Reuse stored embeddings; only tweets the store hasn't seen are encoded.
+        new = [(post_id, text) for post_id, text in chunk if post_id not in self.store]
+        if new:
+            embeddings = self.encode([text for _, text in new])
+            self.store.append([post_id for post_id, _ in new], embeddings)
+            logging.info(f"Generated {len(new)} embeddings with dimension {embeddings.shape[1]}.")
+
+    def process_chunk(self, chunk, checkpoint=None):
+        self.embed(chunk)
+        post_ids = [post_id for post_id, _ in chunk]
+        embeddings = self.store.get(post_ids)
+
+        # Without a saved frame, the first data seen defines version 1;
+        # afterwards new tweets are only projected, never refit.
+        if self.projection is None:
+            if len(post_ids) < 2:
+                logging.info("Not enough tweets to fit PCA yet")
+                return
+            self.projection = Projection.fit([embeddings], version=1)
+            self.projection.save()
+            logging.info(f"Fitted PCA v1 on {len(post_ids)} tweets")
+
+        coords = self.projection.transform(embeddings)
+        with transaction.atomic():
+            self.write_coords(post_ids, coords)
+            if checkpoint is not None:
+                save_checkpoint(CHECKPOINT_NAME, json.dumps(checkpoint))
+
+    def write_coords(self, post_ids, coords):
+        self.updated += len(post_ids)
+        cells = pca_cells(coords[:, 0], coords[:, 1])
+        Post.objects.bulk_update(
+            [Post(post_id=post_id, pca_x=float(x), pca_y=float(y), pca_cell=cell)
+             for post_id, (x, y), cell in zip(post_ids, coords, cells)],
+            ['pca_x', 'pca_y', 'pca_cell'],
+            batch_size=1000,
+        )
+
+    def refit(self):
+        version = self.projection.version + 1 if self.projection else 1
+        logging.info(f"Refitting PCA v{version} on {len(self.store)} stored embeddings")
+        projection = Projection.fit((vectors for _, vectors in self.store.iter_chunks()), version=version)
+        if projection is None:
+            logging.info("No stored embeddings to fit")
+            return
+        projection.save()
+        self.projection = projection
 
-        logging.info("finito")
\ No newline at end of file
+        reprojected = 0
+        for post_ids, vectors in self.store.iter_chunks():
+            with transaction.atomic():
+                self.write_coords(post_ids, projection.transform(vectors))
+            reprojected += len(post_ids)
+            logging.info(f"Reprojected {reprojected} tweets into PCA v{version}")
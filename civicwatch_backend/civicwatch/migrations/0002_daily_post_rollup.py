@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPostRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('party', models.CharField(max_length=50)),
+                ('state', models.CharField(max_length=50)),
+                ('topic', models.CharField(blank=True, max_length=255)),
+                ('post_count', models.IntegerField(default=0)),
+                ('like_sum', models.BigIntegerField(default=0)),
+                ('retweet_sum', models.BigIntegerField(default=0)),
+                ('misinfo_sum', models.BigIntegerField(default=0)),
+                ('misinfo_post_count', models.IntegerField(default=0)),
+                ('civility_sum', models.FloatField(default=0)),
+                ('civility_count', models.IntegerField(default=0)),
+                ('civil_count', models.IntegerField(default=0)),
+                ('low_civility_count', models.IntegerField(default=0)),
+                ('interaction_score_sum', models.FloatField(default=0)),
+                ('interaction_score_count', models.IntegerField(default=0)),
+                ('legislator_ids', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['topic', 'date'], name='rollup_topic_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date', 'party', 'state', 'topic'), name='unique_daily_rollup_cell')],
+            },
+        ),
+    ]
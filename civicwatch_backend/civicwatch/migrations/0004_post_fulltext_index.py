@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:53
+
+from django.db import migrations
+
+from civicwatch.migrations._fulltext import install_fulltext, uninstall_fulltext
+
+
+def forwards(apps, schema_editor):
+    install_fulltext(schema_editor)
+
+
+def backwards(apps, schema_editor):
+    uninstall_fulltext(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0003_pipeline_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
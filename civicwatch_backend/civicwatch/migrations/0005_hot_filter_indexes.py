@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0004_post_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='legislatorinteraction',
+            index=models.Index(fields=['date', 'interaction_type'], name='interaction_date_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='legislatorinteraction',
+            index=models.Index(fields=['source_legislator', 'date'], name='interaction_source_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='legislatorinteraction',
+            index=models.Index(fields=['target_legislator', 'date'], name='interaction_target_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['created_at', 'party'], name='post_created_party_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['legislator', 'created_at'], name='post_legislator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['state', 'party'], name='post_state_party_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topic',
+            index=models.Index(fields=['name', 'post'], name='topic_name_post_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+from civicwatch.migrations._fulltext import install_fulltext
+
+
+def reinstall_fulltext_triggers(apps, schema_editor):
+    # Adding or removing the column rebuilds civicwatch_post on SQLite, dropping its triggers.
+    install_fulltext(schema_editor, rebuild=False)
+
+
+def backfill_topic_masks(apps, schema_editor):
+    Post = apps.get_model('civicwatch', 'Post')
+    Topic = apps.get_model('civicwatch', 'Topic')
+    TopicLabel = apps.get_model('civicwatch', 'TopicLabel')
+
+    names = sorted(set(Topic.objects.values_list('name', flat=True)))
+    if len(names) > 63:
+        raise ValueError(f"{len(names)} distinct topics; topic_mask holds at most 63")
+    for bit, name in enumerate(names):
+        TopicLabel.objects.create(name=name, bit=bit)
+        Post.objects.filter(post_id__in=Topic.objects.filter(name=name).values('post_id')).update(
+            topic_mask=F('topic_mask').bitor(1 << bit)
+        )
+
+
+def clear_rollups(apps, schema_editor):
+    # Existing all-topics cells aren't split by topic_mask. Views fall back to
+    # the posts table until `manage.py build_rollups --full` is run again.
+    apps.get_model('civicwatch', 'DailyPostRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0005_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TopicLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('bit', models.PositiveSmallIntegerField(unique=True)),
+            ],
+        ),
+        # Unapplying the AddField rebuilds the table too; restore triggers after it.
+        migrations.RunPython(migrations.RunPython.noop, reinstall_fulltext_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='topic_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(reinstall_fulltext_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_topic_masks, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='dailypostrollup',
+            name='unique_daily_rollup_cell',
+        ),
+        migrations.AddField(
+            model_name='dailypostrollup',
+            name='topic_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypostrollup',
+            constraint=models.UniqueConstraint(fields=('date', 'party', 'state', 'topic', 'topic_mask'), name='unique_daily_rollup_cell'),
+        ),
+        migrations.RunPython(clear_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+from civicwatch.migrations._fulltext import install_fulltext
+
+# Frozen copy of the quadtree cell code from civicwatch.spatial as of this
+# migration: the Morton code of the post's cell on a 2**16 grid over the
+# PCA extent, points outside the extent clamped into the border cells.
+MAX_LEVEL = 16
+BATCH_SIZE = 5000
+
+
+def _spread(v):
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+def _cell(x, y, extent):
+    x0, x1, y0, y1 = extent
+    side = 1 << MAX_LEVEL
+    ix = min(max(math.floor((x - x0) / (x1 - x0) * side), 0), side - 1)
+    iy = min(max(math.floor((y - y0) / (y1 - y0) * side), 0), side - 1)
+    return _spread(ix) | (_spread(iy) << 1)
+
+
+def reinstall_fulltext_triggers(apps, schema_editor):
+    # Adding or removing the column rebuilds civicwatch_post on SQLite, dropping its triggers.
+    install_fulltext(schema_editor, rebuild=False)
+
+
+def backfill_pca_cells(apps, schema_editor):
+    Post = apps.get_model('civicwatch', 'Post')
+    extent = tuple(getattr(settings, 'CIVICWATCH_PCA_EXTENT', (-1.0, 1.0, -1.0, 1.0)))
+    posts = Post.objects.filter(pca_x__isnull=False, pca_y__isnull=False).order_by('post_id')
+    last = None
+    # Keyset pages on post_id, so only one page is held in memory.
+    while True:
+        page = posts if last is None else posts.filter(post_id__gt=last)
+        rows = list(page.values_list('post_id', 'pca_x', 'pca_y')[:BATCH_SIZE])
+        if not rows:
+            return
+        Post.objects.bulk_update(
+            [Post(post_id=post_id, pca_cell=_cell(x, y, extent)) for post_id, x, y in rows],
+            ['pca_cell'], batch_size=1000,
+        )
+        last = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0006_topic_labels_and_mask'),
+    ]
+
+    operations = [
+        # Unapplying the AddField rebuilds the table too; restore triggers after it.
+        migrations.RunPython(migrations.RunPython.noop, reinstall_fulltext_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='pca_cell',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        # The single-column pca_x index can't answer 2-D viewports; pca_cell replaces it.
+        migrations.AlterField(
+            model_name='post',
+            name='pca_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(reinstall_fulltext_triggers, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pca_cell', 'party'], name='post_pca_cell_party_idx'),
+        ),
+        migrations.RunPython(backfill_pca_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+import json
+
+from django.db import migrations
+from django.db.models import Max, Min
+
+# The rollup is only used for windows inside its recorded coverage. Rollups
+# built before coverage was recorded are taken to cover the days between
+# their first and last cells; a bound at or past the first/last post is open.
+COVERAGE = "rollup_coverage"
+
+
+def record_coverage(apps, schema_editor):
+    DailyPostRollup = apps.get_model('civicwatch', 'DailyPostRollup')
+    Post = apps.get_model('civicwatch', 'Post')
+    PipelineCheckpoint = apps.get_model('civicwatch', 'PipelineCheckpoint')
+
+    cells = DailyPostRollup.objects.aggregate(first=Min('date'), last=Max('date'))
+    if cells['first'] is None or PipelineCheckpoint.objects.filter(name=COVERAGE).exists():
+        return
+    posts = Post.objects.aggregate(first=Min('created_at'), last=Max('created_at'))
+    start = None if posts['first'] is None or cells['first'] <= posts['first'].date() else cells['first']
+    end = None if posts['last'] is None or cells['last'] >= posts['last'].date() else cells['last']
+    PipelineCheckpoint.objects.create(name=COVERAGE, position=json.dumps({
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+    }))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0007_pca_quadtree_cells'),
+    ]
+
+    operations = [
+        migrations.RunPython(record_coverage, migrations.RunPython.noop),
+    ]
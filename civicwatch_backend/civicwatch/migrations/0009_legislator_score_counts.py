@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+from django.db import migrations, models
+from django.db.models import Count
+
+SCORE_FIELDS = ['civility_score', 'interaction_score', 'overperforming_score']
+
+
+def backfill_counts(apps, schema_editor):
+    # The stored means are taken over the posts with a score; count those.
+    Legislator = apps.get_model('civicwatch', 'Legislator')
+    Post = apps.get_model('civicwatch', 'Post')
+    counts = Post.objects.values('legislator_id').annotate(**{f'{field}_count_tw': Count(field) for field in SCORE_FIELDS})
+    legislators = []
+    for row in counts:
+        legislator = Legislator(legislator_id=row.pop('legislator_id'))
+        for name, value in row.items():
+            setattr(legislator, name, value)
+        legislators.append(legislator)
+    Legislator.objects.bulk_update(legislators, [f'{field}_count_tw' for field in SCORE_FIELDS], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civicwatch', '0008_rollup_coverage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='legislator',
+            name='civility_score_count_tw',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='legislator',
+            name='interaction_score_count_tw',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='legislator',
+            name='overperforming_score_count_tw',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Frozen copy of the keyword index SQL from civicwatch.search, for the
+# migrations that create it or restore it after a table rebuild (0004, 0006,
+# 0007). Don't edit it to follow later changes to civicwatch.search; a change
+# to the index belongs in a new migration. The leading underscore keeps the
+# migration loader from treating this module as a migration.
+
+FTS_TABLE = "civicwatch_post_fts"
+POST_TABLE = "civicwatch_post"
+
+SQLITE_FTS_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(post_id UNINDEXED, text, tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {POST_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(post_id, text) VALUES (new.post_id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {POST_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE post_id = old.post_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text, post_id ON {POST_TABLE} BEGIN
+        DELETE FROM {FTS_TABLE} WHERE post_id = old.post_id;
+        INSERT INTO {FTS_TABLE}(post_id, text) VALUES (new.post_id, new.text);
+    END""",
+]
+POSTGRES_TRGM_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS {POST_TABLE}_text_trgm ON {POST_TABLE} USING gin (UPPER(text) gin_trgm_ops)",
+]
+
+
+def install_fulltext(schema_editor, rebuild=True):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for sql in SQLITE_FTS_SQL:
+            schema_editor.execute(sql)
+        if rebuild:
+            schema_editor.execute(f"DELETE FROM {FTS_TABLE}")
+            schema_editor.execute(f"INSERT INTO {FTS_TABLE}(post_id, text) SELECT post_id, text FROM {POST_TABLE}")
+    elif vendor == "postgresql":
+        for sql in POSTGRES_TRGM_SQL:
+            schema_editor.execute(sql)
+
+
+def uninstall_fulltext(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {POST_TABLE}_text_trgm")
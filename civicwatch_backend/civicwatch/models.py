@@ -15,6 +15,10 @@ class Legislator(models.Model):
     interaction_score_tw = models.FloatField(default=0)
     overperforming_score_tw = models.FloatField(default=0)
     civility_score_tw = models.FloatField(default=0)
+    # Posts with each score, so the means above can be updated incrementally.
+    interaction_score_count_tw = models.IntegerField(default=0)
+    overperforming_score_count_tw = models.IntegerField(default=0)
+    civility_score_count_tw = models.IntegerField(default=0)
     
     def __str__(self):
         return f"{self.name} ({self.party}, {self.state})"
@@ -36,7 +40,7 @@ class Post(models.Model):
     civility_score = models.FloatField(null=True, blank=True)
     interaction_score = models.FloatField(null=True, blank=True)
     overperforming_score = models.FloatField(null=True, blank=True)
-    pca_x = models.FloatField(null=True, blank=True, db_index=True)
+    pca_x = models.FloatField(null=True, blank=True)
     pca_y = models.FloatField(null=True, blank=True)
 
     toxicity        = models.FloatField(null=True, blank=True)
@@ -45,7 +49,22 @@ class Post(models.Model):
     threat          = models.FloatField(null=True, blank=True)
     insult          = models.FloatField(null=True, blank=True)
     identity_attack = models.FloatField(null=True, blank=True)
-    
+    # OR of TopicLabel bits for this post's topics; see civicwatch.topics.
+    topic_mask = models.BigIntegerField(default=0)
+    # Morton code of the (pca_x, pca_y) quadtree cell; see civicwatch.spatial.
+    pca_cell = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        # Composite indexes for the dashboard filters: date ranges (optionally
+        # per party), a legislator's timeline, state/party breakdowns, and
+        # scatter viewports (quadtree cell ranges, binned per party).
+        indexes = [
+            models.Index(fields=["created_at", "party"], name="post_created_party_idx"),
+            models.Index(fields=["legislator", "created_at"], name="post_legislator_created_idx"),
+            models.Index(fields=["state", "party"], name="post_state_party_idx"),
+            models.Index(fields=["pca_cell", "party"], name="post_pca_cell_party_idx"),
+        ]
+
     def __str__(self):
         return f"{self.legislator.name} - {self.created_at}"
 
@@ -57,6 +76,13 @@ class LegislatorInteraction(models.Model):
     target_legislator = models.ForeignKey(Legislator, on_delete=models.CASCADE, related_name="received_interactions")
     interaction_type = models.CharField(max_length=20, choices=[('mention', 'Mention'), ('reply', 'Reply'), ('share', 'Share')])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date", "interaction_type"], name="interaction_date_type_idx"),
+            models.Index(fields=["source_legislator", "date"], name="interaction_source_date_idx"),
+            models.Index(fields=["target_legislator", "date"], name="interaction_target_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.source_legislator.name} → {self.target_legislator.name} ({self.interaction_type})"
 
@@ -66,6 +92,68 @@ class Topic(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="topics", null=True, blank=True) 
     name = models.CharField(max_length=255)
 
+    class Meta:
+        # Topic filters look up by name and join back to the post.
+        indexes = [
+            models.Index(fields=["name", "post"], name="topic_name_post_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
+# Dictionary of topic names, each owning one bit of Post.topic_mask.
+class TopicLabel(models.Model):
+    name = models.CharField(max_length=255, unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True)
+
+    def __str__(self):
+        return f"{self.name} (bit {self.bit})"
+
+
+# Daily rollup of posts keyed by (date, party, state, topic).
+# Rows with topic == ALL_TOPICS count every post once and are further split by
+# the posts' topic_mask, so topic filters need no double counting; rows with a
+# topic name mirror the Post -> Topic join, and topic == "" holds posts without topics.
+class DailyPostRollup(models.Model):
+    ALL_TOPICS = "*"
+
+    date = models.DateField()
+    party = models.CharField(max_length=50)
+    state = models.CharField(max_length=50)
+    topic = models.CharField(max_length=255, blank=True)
+    topic_mask = models.BigIntegerField(default=0)
+    post_count = models.IntegerField(default=0)
+    like_sum = models.BigIntegerField(default=0)
+    retweet_sum = models.BigIntegerField(default=0)
+    misinfo_sum = models.BigIntegerField(default=0)
+    misinfo_post_count = models.IntegerField(default=0)
+    civility_sum = models.FloatField(default=0)
+    civility_count = models.IntegerField(default=0)
+    civil_count = models.IntegerField(default=0)
+    low_civility_count = models.IntegerField(default=0)
+    interaction_score_sum = models.FloatField(default=0)
+    interaction_score_count = models.IntegerField(default=0)
+    # Sorted, comma-separated legislator ids seen in this cell. Congress has a
+    # few hundred members, so the exact set is smaller than a probabilistic sketch
+    # and can be unioned across any date range.
+    legislator_ids = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["date", "party", "state", "topic", "topic_mask"], name="unique_daily_rollup_cell"),
+        ]
+        indexes = [
+            models.Index(fields=["topic", "date"], name="rollup_topic_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.party} {self.state} {self.topic}: {self.post_count}"
+
+# Resume position for long-running batch jobs (ingest, embeddings, ...)
+class PipelineCheckpoint(models.Model):
+    name = models.CharField(max_length=255, primary_key=True)
+    position = models.TextField(blank=True, default="")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
@@ -0,0 +1,141 @@
+import functools
+import hashlib
+import inspect
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.dateparse import parse_date
+
+from .checkpoints import data_version
+
+# Parameters whose value order/case doesn't change the result.
+LIST_PARAMS = {"topics"}
+DATE_PARAMS = {"start_date", "end_date"}
+CASELESS_PARAMS = {"keyword", "legislator"}
+
+_version = {"value": None, "checked": 0.0}
+
+
+def _version_is_stale():
+    ttl = getattr(settings, "CIVICWATCH_DATA_VERSION_TTL", 2)
+    return _version["value"] is None or time.monotonic() - _version["checked"] > ttl
+
+
+def _store_version(value):
+    _version["value"] = value
+    _version["checked"] = time.monotonic()
+    return value
+
+
+def current_data_version():
+    # Re-read at most once per CIVICWATCH_DATA_VERSION_TTL seconds per process.
+    if _version_is_stale():
+        _store_version(data_version())
+    return _version["value"]
+
+
+async def acurrent_data_version():
+    """current_data_version() for async code; only a re-read leaves the event loop."""
+    if _version_is_stale():
+        _store_version(await sync_to_async(data_version)())
+    return _version["value"]
+
+
+def normalize_params(query_dict):
+    """Canonical, order-independent form of the query string."""
+    params = []
+    for name in sorted(query_dict):
+        value = query_dict.get(name, "").strip()
+        if not value:
+            continue
+        if name in LIST_PARAMS:
+            value = ",".join(sorted({item.strip() for item in value.split(",") if item.strip()}))
+        elif name in DATE_PARAMS:
+            parsed = parse_date(value)
+            value = parsed.isoformat() if parsed else value
+        elif name in CASELESS_PARAMS:
+            value = value.lower()
+        params.append(f"{name}={value}")
+    return "&".join(params)
+
+
+def cache_key(view_name, request, args=(), kwargs=None, version=None):
+    raw = "|".join([normalize_params(request.GET), repr(args), repr(sorted((kwargs or {}).items()))])
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    version = current_data_version() if version is None else version
+    return f"api:{view_name}:v{version}:{digest}"
+
+
+def _cache():
+    return caches[getattr(settings, "CIVICWATCH_API_CACHE_ALIAS", "api")]
+
+
+def _caching(request):
+    return request.method == "GET" and getattr(settings, "CIVICWATCH_API_CACHE", True)
+
+
+def _hit_response(hit):
+    content_type, body = hit
+    response = HttpResponse(body, content_type=content_type)
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def _cacheable(response):
+    # Entries keep only the body and content type, so anything that differs
+    # per request header (pre-compressed static payloads) is left uncached.
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.has_header("Content-Encoding")
+        and not response.has_header("Vary")
+        and len(response.content) <= getattr(settings, "CIVICWATCH_API_CACHE_MAX_BYTES", 20 * 1024 * 1024)
+    )
+
+
+def cached_api_view(view):
+    """
+    Serve repeat GETs of a JSON view from the API cache (settings.CACHES["api"]).
+    Entries are keyed by the normalized filters and the data version, so
+    ingest and recompute jobs invalidate them by bumping the version.
+    Works for both sync and async views.
+    """
+    if inspect.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not _caching(request):
+                return await view(request, *args, **kwargs)
+
+            key = cache_key(view.__name__, request, args, kwargs, version=await acurrent_data_version())
+            hit = await _cache().aget(key)
+            if hit is not None:
+                return _hit_response(hit)
+
+            response = await view(request, *args, **kwargs)
+            if _cacheable(response):
+                await _cache().aset(key, (response["Content-Type"], response.content))
+            response["X-Cache"] = "MISS"
+            return response
+
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _caching(request):
+            return view(request, *args, **kwargs)
+
+        key = cache_key(view.__name__, request, args, kwargs)
+        hit = _cache().get(key)
+        if hit is not None:
+            return _hit_response(hit)
+
+        response = view(request, *args, **kwargs)
+        if _cacheable(response):
+            _cache().set(key, (response["Content-Type"], response.content))
+        response["X-Cache"] = "MISS"
+        return response
+
+    return wrapper
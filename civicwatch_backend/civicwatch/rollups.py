@@ -0,0 +1,346 @@
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F, Max, Min
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils.dateparse import parse_date
+
+from .checkpoints import load_checkpoint, save_checkpoint
+from .fanout import run_parallel
+from .models import DailyPostRollup, Post
+from .topics import has_any_topic
+
+logger = logging.getLogger(__name__)
+
+ALL_TOPICS = DailyPostRollup.ALL_TOPICS
+
+# Days rebuilt per transaction; bounds memory when backfilling years of posts.
+BUILD_CHUNK_DAYS = 31
+
+
+def encode_ids(ids):
+    return ",".join(str(i) for i in sorted(ids))
+
+
+def decode_ids(value):
+    return {int(i) for i in value.split(",")} if value else set()
+
+
+# 🔹 Building
+
+def _cell_aggregates():
+    return dict(
+        post_count=Count("post_id"),
+        like_sum=Sum("like_count"),
+        retweet_sum=Sum("retweet_count"),
+        misinfo_sum=Sum("count_misinfo"),
+        misinfo_post_count=Count("post_id", filter=~Q(count_misinfo=0)),
+        civility_sum=Sum("civility_score"),
+        civility_count=Count("civility_score"),
+        civil_count=Count("post_id", filter=Q(civility_score=1)),
+        low_civility_count=Count("post_id", filter=Q(civility_score__lt=1)),
+        interaction_score_sum=Sum("interaction_score"),
+        interaction_score_count=Count("interaction_score"),
+    )
+
+
+def _build_chunk(start, end):
+    posts = Post.objects.filter(created_at__date__gte=start, created_at__date__lte=end).annotate(day=TruncDate("created_at"))
+    cells = {}
+    fields = list(_cell_aggregates())
+
+    totals = posts.values("day", "party", "state", "topic_mask").annotate(**_cell_aggregates())
+    by_topic = posts.values("day", "party", "state", "topics__name").annotate(**_cell_aggregates())
+    for row in totals:
+        key = (row["day"], row["party"], row["state"], ALL_TOPICS, row["topic_mask"])
+        cells[key] = DailyPostRollup(
+            date=row["day"], party=row["party"], state=row["state"], topic=ALL_TOPICS, topic_mask=row["topic_mask"],
+            **{field: row[field] or 0 for field in fields},
+        )
+    for row in by_topic:
+        key = (row["day"], row["party"], row["state"], row["topics__name"] or "", 0)
+        cells[key] = DailyPostRollup(
+            date=row["day"], party=row["party"], state=row["state"], topic=key[3],
+            **{field: row[field] or 0 for field in fields},
+        )
+
+    legislators = defaultdict(set)
+    for row in posts.values_list("day", "party", "state", "topic_mask", "legislator_id").distinct():
+        legislators[row[:3] + (ALL_TOPICS, row[3])].add(row[4])
+    for row in posts.values_list("day", "party", "state", "topics__name", "legislator_id").distinct():
+        legislators[row[:3] + (row[3] or "", 0)].add(row[4])
+    for key, ids in legislators.items():
+        if key in cells:
+            cells[key].legislator_ids = encode_ids(ids)
+
+    with transaction.atomic():
+        DailyPostRollup.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyPostRollup.objects.bulk_create(cells.values(), batch_size=1000)
+    return len(cells)
+
+
+def rebuild_rollups(start, end):
+    """Rebuild every rollup cell between two dates (inclusive)."""
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=BUILD_CHUNK_DAYS - 1), end)
+        written += _build_chunk(chunk_start, chunk_end)
+        _extend_coverage(start, chunk_end)
+        logger.info("Rolled up posts %s..%s (%d cells so far)", chunk_start, chunk_end, written)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def refresh_rollup_dates(dates):
+    """Rebuild only the given days, grouping consecutive days into ranges."""
+    dates = sorted(set(dates))
+    written = 0
+    i = 0
+    while i < len(dates):
+        j = i
+        while j + 1 < len(dates) and dates[j + 1] - dates[j] == timedelta(days=1):
+            j += 1
+        written += rebuild_rollups(dates[i], dates[j])
+        i = j + 1
+    return written
+
+
+# 🔹 Coverage
+#
+# The days the rollup answers for, as {"start": ..., "end": ...} in a
+# checkpoint. A null bound is open: the build reached the first (or last)
+# post, and later ingests refresh the days they touch. Windows reaching
+# outside the covered range are answered from the posts instead.
+
+COVERAGE = "rollup_coverage"
+
+
+def rollup_coverage():
+    """(start, end) of the covered days, None for an open bound; None if nothing is built."""
+    value = load_checkpoint(COVERAGE)
+    if not value:
+        return None
+    coverage = json.loads(value)
+    return tuple(parse_date(coverage[bound]) if coverage[bound] else None for bound in ("start", "end"))
+
+
+def _extend_coverage(start, end):
+    first_post, last_post = post_date_bounds()
+    new_start = None if first_post is None or start <= first_post else start
+    new_end = None if last_post is None or end >= last_post else end
+
+    coverage = rollup_coverage()
+    if coverage is not None:
+        old_start, old_end = coverage
+        # A range that doesn't touch the covered one leaves a gap between them.
+        if (old_end is not None and new_start is not None and new_start > old_end + timedelta(days=1)) or (
+            new_end is not None and old_start is not None and new_end < old_start - timedelta(days=1)
+        ):
+            return
+        new_start = None if None in (old_start, new_start) else min(old_start, new_start)
+        new_end = None if None in (old_end, new_end) else max(old_end, new_end)
+
+    save_checkpoint(COVERAGE, json.dumps({
+        "start": new_start.isoformat() if new_start else None,
+        "end": new_end.isoformat() if new_end else None,
+    }))
+
+
+def covers(start_date=None, end_date=None):
+    """Whether the rollup has every day of the window (either bound may be open)."""
+    coverage = rollup_coverage()
+    if coverage is None:
+        return False
+    covered_start, covered_end = coverage
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    if covered_start is not None and (start_date is None or start_date < covered_start):
+        return False
+    if covered_end is not None and (end_date is None or end_date > covered_end):
+        return False
+    return True
+
+
+def _as_date(value):
+    return parse_date(value) if isinstance(value, str) else value
+
+
+def post_date_bounds():
+    bounds = Post.objects.aggregate(first=Min("created_at"), last=Max("created_at"))
+    if bounds["first"] is None:
+        return None, None
+    return bounds["first"].date(), bounds["last"].date()
+
+
+def rollup_watermark():
+    """Last day present in the rollup; that day may have been built while still partial."""
+    return DailyPostRollup.objects.aggregate(last=Max("date"))["last"]
+
+
+# 🔹 Query layer
+
+def rollups_enabled(request=None, start_date=None, end_date=None):
+    """Whether a window (whole days, either bound open) can be answered from the rollup."""
+    # Keyword and legislator filters need the raw posts.
+    if not getattr(settings, "CIVICWATCH_USE_ROLLUPS", True):
+        return False
+    if request is not None and (request.GET.get("keyword") or request.GET.get("legislator")):
+        return False
+    return covers(start_date, end_date)
+
+
+def rollup_cells(start_date=None, end_date=None, topics=None, per_topic=False):
+    """
+    Rollup rows for a date window. Every post is counted once, restricted to
+    posts carrying any of ``topics`` when given; with ``per_topic`` a post is
+    counted once per topic it carries (only ``topics``, when given).
+    """
+    cells = DailyPostRollup.objects.all()
+    if start_date:
+        cells = cells.filter(date__gte=start_date)
+    if end_date:
+        cells = cells.filter(date__lte=end_date)
+    if per_topic:
+        cells = cells.filter(topic__in=topics) if topics else cells.exclude(topic=ALL_TOPICS)
+    else:
+        cells = cells.filter(topic=ALL_TOPICS)
+        if topics:
+            cells = cells.filter(has_any_topic(topics))
+    return cells
+
+
+def _topic_name(topic):
+    return topic or None
+
+
+def trend_rows(start_date, end_date, topics, weekly):
+    trunc = TruncWeek("date") if weekly else F("date")
+    rows = (
+        rollup_cells(start_date, end_date, topics)
+        .annotate(bucket=trunc)
+        .values("bucket", "party")
+        .annotate(total_posts=Sum("post_count"), likes=Sum("like_sum"), retweets=Sum("retweet_sum"))
+        .order_by("bucket", "party")
+    )
+    for row in rows:
+        total = row["total_posts"] or 0
+        yield {
+            "date": row["bucket"],
+            "party": row["party"],
+            "total_posts": total,
+            "avg_engagement_per_post": (row["likes"] + row["retweets"]) // total if total else 0,
+        }
+
+
+def engagement_rows(start_date, end_date, topics):
+    rows = (
+        rollup_cells(start_date, end_date, topics, per_topic=True)
+        .values("party", "topic")
+        .annotate(total_likes=Sum("like_sum"), total_retweets=Sum("retweet_sum"))
+        .order_by("party", "topic")
+    )
+    for row in rows:
+        yield {
+            "party": row["party"],
+            "topics__name": _topic_name(row["topic"]),
+            "total_engagement": row["total_likes"] + row["total_retweets"],
+            "total_likes": row["total_likes"],
+            "total_retweets": row["total_retweets"],
+        }
+
+
+def engagement_total(start_date, end_date, topics):
+    totals = rollup_cells(start_date, end_date, topics).aggregate(likes=Sum("like_sum"), retweets=Sum("retweet_sum"))
+    if totals["likes"] is None:
+        return None
+    return totals["likes"] + totals["retweets"]
+
+
+def bipartite_rows(start_date, end_date):
+    """(date, topic, party) cells with post/like/share sums and distinct legislators."""
+    cells = {}
+    rows = rollup_cells(start_date, end_date, per_topic=True).values_list(
+        "date", "topic", "party", "post_count", "like_sum", "retweet_sum", "legislator_ids"
+    )
+    for day, topic, party, posts, likes, shares, ids in rows.iterator():
+        key = (day, _topic_name(topic), party)
+        cell = cells.setdefault(key, {"posts": 0, "legislators": set(), "likes": 0, "shares": 0})
+        cell["posts"] += posts
+        cell["likes"] += likes
+        cell["shares"] += shares
+        cell["legislators"] |= decode_ids(ids)
+    for key, cell in cells.items():
+        cell["legislators"] = len(cell["legislators"])
+    return cells
+
+
+def post_statistics_rows(start_date, end_date):
+    rows = (
+        rollup_cells(start_date, end_date, per_topic=True).exclude(topic="")
+        .values("date", "party", "topic")
+        .annotate(
+            posts=Sum("post_count"),
+            misinfo=Sum("misinfo_sum"),
+            civility=Sum("civility_sum"),
+            civility_n=Sum("civility_count"),
+        )
+    )
+    for row in rows:
+        yield {
+            "date": row["date"],
+            "party": row["party"],
+            "topics__name": row["topic"],
+            "avg_misinfo": row["misinfo"] / row["posts"] if row["posts"] else None,
+            "avg_civility": row["civility"] / row["civility_n"] if row["civility_n"] else None,
+        }
+
+
+def geo_rows(metric, start_date, end_date, topics):
+    """Return (base_data, topic_data) shaped like the ORM queries in geo_activity_topics."""
+    def collect(cells, keys):
+        out = {}
+        for row in cells.values_list(*keys, "post_count", "like_sum", "retweet_sum", "legislator_ids").iterator():
+            key = row[:len(keys)]
+            posts, likes, retweets, ids = row[len(keys):]
+            if metric == "legislators":
+                out.setdefault(key, set()).update(decode_ids(ids))
+            elif metric == "engagement":
+                out[key] = out.get(key, 0) + likes + retweets
+            else:
+                out[key] = out.get(key, 0) + posts
+        return out
+
+    base, by_topic = run_parallel(
+        lambda: collect(rollup_cells(start_date, end_date, topics), ("state", "party")),
+        lambda: collect(rollup_cells(start_date, end_date, topics, per_topic=True), ("state", "party", "topic")),
+    )
+
+    def total(value):
+        return len(value) if isinstance(value, set) else value
+
+    base_data = [{"state": s, "party": p, "total": total(v)} for (s, p), v in base.items()]
+    topic_data = [
+        {"state": s, "party": p, "topics__name": _topic_name(t), "total": total(v)}
+        for (s, p, t), v in by_topic.items()
+    ]
+    return base_data, topic_data
+
+
+def accountability_rows(start_date, end_date, topics):
+    rows = (
+        rollup_cells(start_date, end_date, topics)
+        .values("party")
+        .annotate(posts=Sum("post_count"), civil=Sum("civil_count"), misinfo=Sum("misinfo_post_count"))
+    )
+    for row in rows:
+        yield {
+            "party": row["party"],
+            "civil_count": row["civil"],
+            "uncivil_count": row["posts"] - row["civil"],
+            "misinformative_count": row["misinfo"],
+            "informative_count": row["posts"] - row["misinfo"],
+        }
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+# SQLite: an FTS5 table with the trigram tokenizer mirrors Post.text, so MATCH
+# behaves like a case-insensitive substring search (the same as icontains) but
+# is answered from the index. Triggers on civicwatch_post keep it in sync.
+# Postgres: a pg_trgm GIN index on UPPER(text) serves Django's icontains SQL
+# directly, so queries stay as they are. Migrations create both (the SQL is
+# frozen in migrations/_fulltext.py).
+FTS_TABLE = "civicwatch_post_fts"
+POST_TABLE = "civicwatch_post"
+MIN_TRIGRAM_LENGTH = 3
+
+
+def _fts_match(keyword):
+    # A double-quoted FTS5 string is matched literally; quotes inside are doubled.
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def text_contains(keyword, field="text"):
+    """
+    Filter condition equivalent to ``Q(text__icontains=keyword)`` that uses the
+    keyword index when one is available. ``field`` lets callers reach Post text
+    through a relation with the plain lookup when the index can't be used.
+    """
+    if (
+        connection.vendor == "sqlite"
+        and field == "text"
+        and len(keyword) >= MIN_TRIGRAM_LENGTH
+        and getattr(settings, "CIVICWATCH_FULLTEXT", True)
+    ):
+        return RawSQL(
+            f'"{POST_TABLE}"."post_id" IN (SELECT post_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            [_fts_match(keyword)],
+            output_field=BooleanField(),
+        )
+    return Q(**{f"{field}__icontains": keyword})
@@ -0,0 +1,171 @@
+import math
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, Q
+
+from .models import Post
+
+# Quadtree over the PCA plane. The extent is split into 2**MAX_LEVEL cells per
+# side and Post.pca_cell holds the Morton (Z-order) code of the post's cell,
+# so every quadtree tile at any coarser level is one contiguous range of codes
+# and a tile's code at level L is ``pca_cell >> 2 * (MAX_LEVEL - L)``. A
+# viewport becomes a handful of range scans on the pca_cell index, and binning
+# is a GROUP BY on the shifted code. Points outside the extent are clamped
+# into the border cells.
+MAX_LEVEL = 16
+DEFAULT_EXTENT = (-1.0, 1.0, -1.0, 1.0)
+# Bins per viewport side is 2**BIN_DETAIL.
+BIN_DETAIL = 6
+# A viewport's range cover descends to tiles about 1/2**COVER_DETAIL of the
+# box's size, which bounds the number of ranges; the exact pca_x/pca_y filter
+# removes what the cover over-selects.
+COVER_DETAIL = 3
+POINT_LIMIT = 5000
+
+
+def pca_extent():
+    """``(x0, x1, y0, y1)`` of the tiled part of the PCA plane."""
+    return tuple(getattr(settings, "CIVICWATCH_PCA_EXTENT", DEFAULT_EXTENT))
+
+
+def _spread(v):
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    return (v | (v << 1)) & 0x55555555
+
+
+def _compact(v):
+    v &= 0x55555555
+    v = (v | (v >> 1)) & 0x33333333
+    v = (v | (v >> 2)) & 0x0F0F0F0F
+    v = (v | (v >> 4)) & 0x00FF00FF
+    return (v | (v >> 8)) & 0x0000FFFF
+
+
+def pca_cells(xs, ys, extent=None):
+    """Morton codes for coordinate sequences; ``None`` where a coordinate is missing."""
+    x0, x1, y0, y1 = extent or pca_extent()
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    side = 1 << MAX_LEVEL
+    missing = np.isnan(xs) | np.isnan(ys)
+    ix = np.clip(np.floor((np.nan_to_num(xs) - x0) / (x1 - x0) * side), 0, side - 1).astype(np.int64)
+    iy = np.clip(np.floor((np.nan_to_num(ys) - y0) / (y1 - y0) * side), 0, side - 1).astype(np.int64)
+    codes = _spread(ix) | (_spread(iy) << 1)
+    return [None if gap else int(code) for code, gap in zip(codes, missing)]
+
+
+def tile_bounds(code, level, extent=None):
+    """``(x0, x1, y0, y1)`` of the tile with Morton ``code`` at ``level``."""
+    x0, x1, y0, y1 = extent or pca_extent()
+    width = (x1 - x0) / (1 << level)
+    height = (y1 - y0) / (1 << level)
+    ix, iy = _compact(code), _compact(code >> 1)
+    return (x0 + ix * width, x0 + (ix + 1) * width, y0 + iy * height, y0 + (iy + 1) * height)
+
+
+def clamp_to_extent(bbox, extent=None):
+    """
+    ``bbox`` pulled inside the extent. Points beyond the extent sit in its
+    border cells, so that is where a box reaching past the edge finds them.
+    """
+    ex0, ex1, ey0, ey1 = extent or pca_extent()
+    x0, x1, y0, y1 = bbox
+    return (min(max(x0, ex0), ex1), min(max(x1, ex0), ex1), min(max(y0, ey0), ey1), min(max(y1, ey0), ey1))
+
+
+def covering_ranges(bbox, depth, extent=None):
+    """
+    Inclusive ``(low, high)`` pca_cell ranges whose tiles cover ``bbox``,
+    descending the quadtree no deeper than ``depth``. Tiles wholly inside the
+    box stop early and adjacent ranges are merged, so the count stays small.
+    """
+    extent = extent or pca_extent()
+    bx0, bx1, by0, by1 = clamp_to_extent(bbox, extent)
+    ranges = []
+
+    def visit(code, level):
+        x0, x1, y0, y1 = tile_bounds(code, level, extent)
+        if x0 > bx1 or x1 < bx0 or y0 > by1 or y1 < by0:
+            return
+        inside = bx0 <= x0 and x1 <= bx1 and by0 <= y0 and y1 <= by1
+        if inside or level == depth:
+            shift = 2 * (MAX_LEVEL - level)
+            low, high = code << shift, ((code + 1) << shift) - 1
+            if ranges and ranges[-1][1] + 1 == low:
+                ranges[-1] = (ranges[-1][0], high)
+            else:
+                ranges.append((low, high))
+            return
+        for child in range(4):
+            visit(code * 4 + child, level + 1)
+
+    visit(0, 0)
+    return ranges
+
+
+def cover_depth(bbox, extent=None):
+    """Quadtree level whose tiles are about 1/2**COVER_DETAIL of ``bbox``'s longer side."""
+    extent = extent or pca_extent()
+    ex0, ex1, ey0, ey1 = extent
+    x0, x1, y0, y1 = clamp_to_extent(bbox, extent)
+    fraction = max((x1 - x0) / (ex1 - ex0), (y1 - y0) / (ey1 - ey0), 2.0 ** -MAX_LEVEL)
+    return max(0, min(MAX_LEVEL, int(math.floor(-math.log2(fraction))) + COVER_DETAIL))
+
+
+def in_viewport(queryset, bbox):
+    """Posts of ``queryset`` whose PCA point lies in ``bbox``."""
+    x0, x1, y0, y1 = bbox
+    cover = Q()
+    for low, high in covering_ranges(bbox, cover_depth(bbox)):
+        cover |= Q(pca_cell__range=(low, high))
+    if not cover:
+        return queryset.none()
+    return queryset.filter(cover).filter(pca_x__gte=x0, pca_x__lte=x1, pca_y__gte=y0, pca_y__lte=y1)
+
+
+def viewport(queryset, bbox, zoom, point_limit=POINT_LIMIT):
+    """
+    Contents of a scatter viewport: the individual points if there are at most
+    ``point_limit`` of them, otherwise per-party counts on a grid of quadtree
+    tiles ``BIN_DETAIL`` levels below ``zoom``.
+    """
+    posts = in_viewport(queryset, bbox)
+    points = list(posts.order_by().values("post_id", "pca_x", "pca_y", "party")[:point_limit + 1])
+    if len(points) <= point_limit:
+        return {"mode": "points", "zoom": zoom, "points": points}
+
+    level = min(zoom + BIN_DETAIL, MAX_LEVEL)
+    rows = (
+        posts.annotate(tile=F("pca_cell").bitrightshift(2 * (MAX_LEVEL - level)))
+        .values("tile", "party")
+        .annotate(n=Count("pk"))
+        .order_by("tile")
+    )
+    bins = {}
+    for row in rows:
+        tile = bins.get(row["tile"])
+        if tile is None:
+            x0, x1, y0, y1 = tile_bounds(row["tile"], level)
+            tile = bins[row["tile"]] = {"tile": row["tile"], "x0": x0, "x1": x1, "y0": y0, "y1": y1, "total": 0, "counts": {}}
+        tile["counts"][row["party"]] = row["n"]
+        tile["total"] += row["n"]
+    return {"mode": "bins", "zoom": zoom, "level": level, "bins": list(bins.values())}
+
+
+def refresh_pca_cells(post_ids=None, batch_size=5000):
+    """Recompute Post.pca_cell (all posts, or just ``post_ids``), e.g. after changing the extent."""
+    from .exports import keyset_pages
+
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(post_id__in=post_ids)
+    updated = 0
+    for rows in keyset_pages(posts, ("post_id", "pca_x", "pca_y"), ("post_id",), batch_size):
+        post_ids, xs, ys = zip(*rows)
+        Post.objects.bulk_update(
+            [Post(post_id=post_id, pca_cell=cell) for post_id, cell in zip(post_ids, pca_cells(xs, ys))],
+            ["pca_cell"], batch_size=1000,
+        )
+        updated += len(rows)
+    return updated
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_DIR = os.path.join(settings.BASE_DIR, "static", "data")
+
+
+class StaticPayload:
+    """
+    A JSON file held in memory as ready-to-send bytes, with gzip and (when the
+    brotli package is installed) brotli variants compressed once at load time.
+    Reloaded when the file's mtime or size changes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.stamp = None
+        self._data = None
+        self.reload_if_changed()
+
+    def reload_if_changed(self):
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return
+        with open(self.path, "rb") as f:
+            body = f.read()
+        self.body = body
+        self.encodings = {"gzip": gzip.compress(body, 9)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(body)
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        self.last_modified = stat.st_mtime
+        self._data = None
+        self.stamp = stamp
+
+    @property
+    def data(self):
+        """Parsed JSON, for callers that need to filter the payload."""
+        if self._data is None:
+            self._data = json.loads(self.body)
+        return self._data
+
+
+_payloads = {}
+_lock = threading.Lock()
+
+
+def get_payload(filename):
+    """Raises FileNotFoundError when the file doesn't exist."""
+    path = os.path.join(DATA_DIR, filename)
+    with _lock:
+        payload = _payloads.get(path)
+        if payload is None:
+            payload = _payloads[path] = StaticPayload(path)
+        else:
+            payload.reload_if_changed()
+    return payload
+
+
+def accepted_encodings(header):
+    """``{coding: q}`` from an Accept-Encoding header; malformed q-values count as 0."""
+    accepted = {}
+    for item in header.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+def _accepted_encoding(request, payload):
+    accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    for encoding in ("br", "gzip"):
+        if encoding in payload.encodings and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+async def aget_payload(filename):
+    """get_payload() with the stat/read done off the event loop."""
+    return await sync_to_async(get_payload, thread_sensitive=False)(filename)
+
+
+def static_json_response(request, filename):
+    """
+    Serve a precomputed JSON file: 304 when the client's ETag/Last-Modified is
+    current, otherwise the pre-compressed variant the client accepts.
+    """
+    return payload_response(request, get_payload(filename))
+
+
+async def astatic_json_response(request, filename):
+    """static_json_response() for async views."""
+    return payload_response(request, await aget_payload(filename))
+
+
+def payload_response(request, payload):
+    encoding = _accepted_encoding(request, payload)
+    # Each representation gets its own ETag, as the bytes differ per encoding.
+    etag = payload.etag if encoding is None else f'{payload.etag[:-1]}-{encoding}"'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(payload.last_modified))
+    if not_modified is not None:
+        patch_vary_headers(not_modified, ["Accept-Encoding"])
+        return not_modified
+
+    response = HttpResponse(payload.encodings[encoding] if encoding else payload.body, content_type="application/json")
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(payload.last_modified)
+    response["Cache-Control"] = "public, no-cache"
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
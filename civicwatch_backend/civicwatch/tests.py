@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import importlib.util
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+import numpy as np
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import analytics, exports, serialization
+from .models import Legislator, LegislatorInteraction, Post, Topic
+
+
+def create_sample_data():
+    legislators = [
+        Legislator.objects.create(
+            legislator_id=i + 1, name=f"Legislator {i + 1}", state=["CA", "TX", "NY"][i % 3],
+            chamber="House", party=["Democratic", "Republican"][i % 2],
+        )
+        for i in range(6)
+    ]
+    start = datetime(2020, 1, 1, 12, tzinfo=timezone.utc)
+    topics = ["gun", "climate", "covid"]
+    for i in range(60):
+        legislator = legislators[i % len(legislators)]
+        post = Post.objects.create(
+            post_id=str(1000 + i), legislator=legislator, name=legislator.name,
+            created_at=start + timedelta(days=7 * i), text=f"post {i} about {topics[i % 3]}",
+            state=legislator.state, chamber=legislator.chamber, party=legislator.party,
+            retweet_count=i, like_count=2 * i, count_misinfo=i % 2,
+            civility_score=(i % 3) / 2, interaction_score=0.5,
+        )
+        Topic.objects.create(post=post, name=topics[i % 3])
+        LegislatorInteraction.objects.create(
+            date=post.created_at, post=post, source_legislator=legislator,
+            target_legislator=legislators[(i + 1) % len(legislators)], interaction_type="mention",
+        )
+
+
+# A full scan of one of these tables is what the composite indexes exist to avoid.
+HOT_TABLE_SCAN = re.compile(r"^SCAN (civicwatch_post|civicwatch_topic|civicwatch_legislatorinteraction)\b")
+
+DASHBOARD_QUERIES = [
+    "/api/overview_metrics/?start_date=2020-03-01&end_date=2020-05-31",
+    "/api/trend_data/?start_date=2020-03-01&end_date=2020-05-31&topics=gun,climate",
+    "/api/engagement_metrics/?start_date=2020-03-01&end_date=2020-05-31&topics=gun",
+    "/api/flow/bipartite/?start_date=2020-03-01&end_date=2020-05-31",
+    "/api/geo/activity/topics/?metric=posts&start_date=2020-03-01&end_date=2020-05-31&topics=gun",
+    "/api/geo/activity/topics/?metric=legislators&start_date=2020-03-01&end_date=2020-05-31",
+    "/api/accountability_interface/?start_date=2020-03-01&end_date=2020-05-31&topics=gun",
+    "/api/chord/chord_interactions/?start_date=2020-03-01&end_date=2020-05-31",
+    "/api/legislators/scatter/?start_date=2020-03-01&end_date=2020-05-31",
+    "/api/posts/semantic_viewport/?x0=-0.5&x1=0.25&y0=0&y1=0.5&zoom=1&start_date=2020-03-01&end_date=2020-05-31",
+]
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite-specific")
+@override_settings(CIVICWATCH_API_CACHE=False, CIVICWATCH_USE_ROLLUPS=False)
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_dashboard_queries_use_indexes(self):
+        for url in DASHBOARD_QUERIES:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+                selects = [query["sql"] for query in ctx.captured_queries if query["sql"].startswith("SELECT")]
+                self.assertTrue(selects)
+                for sql in selects:
+                    scans = [step for step in self.query_plan(sql) if HOT_TABLE_SCAN.match(step)]
+                    self.assertEqual(scans, [], sql)
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class OverviewMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def test_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/overview_metrics/")
+        metrics = response.json()["summaryMetrics"]
+        self.assertEqual(metrics["Democratic"]["totalPosts"], 30)
+        self.assertEqual(metrics["Democratic"]["numberLegislators"], 3)
+        self.assertEqual(metrics["Republican"]["numMisinfoPosts"], 30)
+        self.assertEqual(metrics["Republican"]["numUncivilPosts"], 20)
+
+    def test_topic_filter_adds_only_the_label_lookup(self):
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/overview_metrics/?start_date=2020-01-01&end_date=2020-12-31&topics=gun")
+        metrics = response.json()["summaryMetrics"]
+        self.assertEqual(metrics["Democratic"]["totalPosts"] + metrics["Republican"]["totalPosts"], 18)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "the FTS5 keyword index is SQLite-specific")
+class KeywordSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+        legislator = Legislator.objects.get(legislator_id=1)
+        for post_id, text in [("2000", "Gun CONTROL now"), ("2001", 'He said "go"'), ("2002", "ab"), ("2003", "")]:
+            Post.objects.create(
+                post_id=post_id, legislator=legislator, name=legislator.name, text=text,
+                created_at=datetime(2020, 1, 1, tzinfo=timezone.utc), state="CA", chamber="House", party="Democratic",
+            )
+
+    def search(self, keyword):
+        from .search import text_contains
+
+        return sorted(Post.objects.filter(text_contains(keyword)).values_list("post_id", flat=True))
+
+    def test_matches_icontains(self):
+        for keyword in ["gun", "GUN control", "about cli", "post 1", '"go"', "ab", "Ab", "g", "5", "nothing here"]:
+            with self.subTest(keyword=keyword):
+                expected = sorted(Post.objects.filter(text__icontains=keyword).values_list("post_id", flat=True))
+                self.assertEqual(self.search(keyword), expected)
+
+    def test_index_follows_post_changes(self):
+        # Migrations 0006 and 0007 rebuild civicwatch_post; the sync triggers must survive that.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'civicwatch_post'")
+            self.assertEqual(sorted(row[0] for row in cursor.fetchall()), ["civicwatch_post_fts_ad", "civicwatch_post_fts_ai", "civicwatch_post_fts_au"])
+
+        legislator = Legislator.objects.get(legislator_id=2)
+        post = Post.objects.create(
+            post_id="3000", legislator=legislator, name=legislator.name, text="Filibuster reform",
+            created_at=datetime(2020, 1, 1, tzinfo=timezone.utc), state="TX", chamber="House", party="Republican",
+        )
+        self.assertEqual(self.search("filibuster"), ["3000"])
+
+        post.text = "Budget reconciliation"
+        post.save()
+        self.assertEqual(self.search("filibuster"), [])
+        self.assertEqual(self.search("reconcil"), ["3000"])
+
+        post.delete()
+        self.assertEqual(self.search("reconcil"), [])
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class PostStatisticsTests(TestCase):
+    def test_span_is_capped(self):
+        response = self.client.get("/api/posts/statistics/?start_date=0001-01-01&end_date=9999-12-31")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/posts/statistics/?start_date=2020-01-01&end_date=2020-01-31")
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CIVICWATCH_API_CACHE=False, CIVICWATCH_PCA_EXTENT=(-1.0, 1.0, -1.0, 1.0))
+class SemanticViewportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from .spatial import refresh_pca_cells
+
+        create_sample_data()
+        # Three posts beyond the right edge of the extent, the rest inside it.
+        Post.objects.update(pca_x=0.1, pca_y=0.1)
+        Post.objects.filter(post_id__in=["1000", "1001", "1002"]).update(pca_x=1.5, pca_y=0.2)
+        refresh_pca_cells()
+
+    def test_non_finite_bounds_are_rejected(self):
+        for query in ("x0=nan", "x1=inf", "y0=-inf&y1=inf"):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f"/api/posts/semantic_viewport/?{query}").status_code, 400)
+
+    def test_box_beyond_the_extent(self):
+        data = self.client.get("/api/posts/semantic_viewport/?x0=1.2&x1=2&y0=0&y1=0.5&zoom=3").json()
+        self.assertEqual(sorted(point["post_id"] for point in data["points"]), ["1000", "1001", "1002"])
+
+
+class IngestTests(TestCase):
+    def setUp(self):
+        Legislator.objects.create(legislator_id=1, name="A", state="CA", chamber="House", party="Democratic")
+        Legislator.objects.create(legislator_id=2, name="B", state="TX", chamber="House", party="Republican")
+
+    def record(self, post_id, **fields):
+        return {"post_id": post_id, "legislator_id": "1", "created_at": "2020-01-01T12:00:00Z", "text": "gun", **fields}
+
+    def test_bad_interaction_target_skips_only_that_value(self):
+        from .ingest import ingest_records
+
+        stats = ingest_records([self.record("1", mentions="2;bogus"), self.record("2")], "test")
+        self.assertEqual(stats.inserted, 2)
+        self.assertEqual(list(LegislatorInteraction.objects.values_list("post_id", "target_legislator_id")), [("1", 2)])
+
+    def test_score_means_ignore_missing_scores(self):
+        from django.db.models import Avg
+
+        from .ingest import ingest_records
+
+        ingest_records([self.record("1", civility_score="1.0"), self.record("2")], "test", chunk_size=1)
+        ingest_records([self.record("3", civility_score="0.5"), self.record("4", civility_score="")], "test2", chunk_size=1)
+        expected = Post.objects.filter(legislator_id=1).aggregate(mean=Avg("civility_score"))["mean"]
+        self.assertAlmostEqual(Legislator.objects.get(legislator_id=1).civility_score_tw, expected)
+        self.assertEqual(Legislator.objects.get(legislator_id=1).total_posts_tw, 4)
+
+    def test_score_means_are_updated_without_rescanning_posts(self):
+        from .ingest import ingest_records
+
+        Legislator.objects.filter(legislator_id=1).update(civility_score_tw=0.5, civility_score_count_tw=2)
+        with CaptureQueriesContext(connection) as queries:
+            ingest_records([self.record("1", civility_score="1.0"), self.record("2")], "test")
+        self.assertFalse([query for query in queries if "AVG(" in query["sql"].upper()])
+        legislator = Legislator.objects.get(legislator_id=1)
+        self.assertAlmostEqual(legislator.civility_score_tw, (0.5 * 2 + 1.0) / 3)
+        self.assertEqual(legislator.civility_score_count_tw, 3)
+
+    def test_committed_chunks_refresh_rollup_and_version(self):
+        from . import rollups
+        from .checkpoints import data_version
+        from .ingest import ingest_records
+        from .models import DailyPostRollup
+
+        def records():
+            yield self.record("1", created_at="2020-01-01T12:00:00Z")
+            yield self.record("2", created_at="2020-01-02T12:00:00Z")
+            raise RuntimeError("crashed")
+
+        day = datetime(2020, 1, 1).date()
+        rollups.rebuild_rollups(day, day)
+        version = data_version()
+        with self.assertRaises(RuntimeError):
+            ingest_records(records(), "test", chunk_size=1)
+        cells = DailyPostRollup.objects.filter(topic=rollups.ALL_TOPICS)
+        self.assertEqual(sorted(cells.values_list("date", "post_count")), [(day, 1), (day + timedelta(days=1), 1)])
+        self.assertEqual(data_version(), version + 2)
+
+
+class TopicMaskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def test_deleting_topics_refreshes_once_on_commit(self):
+        from unittest import mock
+
+        from . import topics
+
+        gun_posts = list(Topic.objects.filter(name="gun").values_list("post_id", flat=True))
+        with mock.patch.object(topics, "refresh_topic_masks", wraps=topics.refresh_topic_masks) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                Topic.objects.filter(name="gun").delete()
+        refresh.assert_called_once_with(sorted(gun_posts))
+        self.assertEqual(Post.objects.filter(post_id__in=gun_posts, topic_mask=0).count(), len(gun_posts))
+
+    def test_cascades_skip_the_refresh(self):
+        from unittest import mock
+
+        from . import topics
+
+        with mock.patch.object(topics, "refresh_topic_masks") as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                Post.objects.filter(legislator_id=1).delete()
+                Legislator.objects.get(legislator_id=2).delete()
+        refresh.assert_not_called()
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class SimilarPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def setUp(self):
+        import numpy as np
+
+        from . import vector_index
+        from .embeddings import EmbeddingStore
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(CIVICWATCH_EMBEDDINGS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        vector_index._store = None
+        self.addCleanup(setattr, vector_index, "_store", None)
+        # Post i points 0.02*i radians away from post 1000, so similarity falls with i.
+        angles = 0.02 * np.arange(60)
+        vectors = np.zeros((60, 8), dtype=np.float32)
+        vectors[:, 0], vectors[:, 1] = np.cos(angles), np.sin(angles)
+        self.store = EmbeddingStore(dim=8)
+        self.store.append([str(1000 + i) for i in range(60)], vectors)
+
+    def test_k_must_be_positive(self):
+        for k in ("0", "-5", "x"):
+            with self.subTest(k=k):
+                self.assertEqual(self.client.get(f"/api/posts/similar/?q=gun&k={k}").status_code, 400)
+
+    def test_filters_beyond_the_first_candidates(self):
+        from .vector_index import build_index
+
+        build_index(self.store, nlist=30)
+        # Only posts 40-59 are in the window, none of them among the first k*10+1 candidates.
+        response = self.client.get("/api/posts/similar/?post_id=1000&k=2&start_date=2020-10-07")
+        self.assertEqual([row["post_id"] for row in response.json()], ["1040", "1041"])
+
+    def test_rebuild_swaps_whole_builds(self):
+        from .vector_index import get_index, build_index, index_dir
+
+        build_index(self.store, nlist=4)
+        first = get_index()
+        build_index(self.store, nlist=6)
+        build_index(self.store, nlist=5)
+        index = get_index()
+        self.assertIsNot(index, first)
+        self.assertEqual((len(index.centroids), len(index.offsets), len(index.ids)), (5, 6, 60))
+        # The current build and the one before it are kept.
+        self.assertEqual(len([name for name in os.listdir(index_dir()) if os.path.isdir(os.path.join(index_dir(), name))]), 2)
+
+
+@unittest.skipUnless(importlib.util.find_spec("sklearn"), "scikit-learn is not installed")
+class TweetSemanticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def setUp(self):
+        from unittest import mock
+
+        from .management.commands import tweet_semantics
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = self.settings(CIVICWATCH_EMBEDDINGS_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.encoded = []
+        patcher = mock.patch.object(tweet_semantics.Command, "encode", lambda command, texts: self.encode(texts))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def encode(self, texts):
+        # Stand-in for the model: "post i ..." spreads along axis 0 with i and
+        # alternates along axis 1, so the first few posts alone would put the
+        # main axis on 1.
+        self.encoded += texts
+        vectors = np.zeros((len(texts), 384), dtype=np.float32)
+        for row, text in enumerate(texts):
+            i = int(re.match(r"post (\d+)", text).group(1))
+            vectors[row, 0], vectors[row, 1], vectors[row, 2] = i / 10, 3 * (i % 2), (i % 3) / 10
+        return vectors
+
+    def run_command(self, *args):
+        from django.core.management import call_command
+
+        call_command("tweet_semantics", *args)
+
+    def coords(self):
+        return {post_id: (x, y) for post_id, x, y in Post.objects.values_list("post_id", "pca_x", "pca_y")}
+
+    def test_stream_fits_pca_on_every_post(self):
+        from .embeddings import Projection
+
+        self.run_command("--stream", "--chunk-size", "16")
+        projection = Projection.load()
+        self.assertEqual((projection.version, projection.fitted_on), (1, 60))
+        self.assertEqual(len(self.encoded), 60)
+        # The main axis follows the post number across all 60 posts.
+        self.assertGreater(abs(projection.components[0][0]), 0.9)
+        self.assertFalse(Post.objects.filter(pca_cell__isnull=True).exists())
+
+    def test_stream_matches_a_single_batch(self):
+        from .embeddings import embeddings_dir
+
+        self.run_command()
+        expected = self.coords()
+        Post.objects.update(pca_x=None, pca_y=None, pca_cell=None)
+        shutil.rmtree(embeddings_dir())
+        self.run_command("--stream", "--chunk-size", "16")
+        for post_id, (x, y) in self.coords().items():
+            self.assertAlmostEqual(abs(x), abs(expected[post_id][0]), places=3)
+            self.assertAlmostEqual(abs(y), abs(expected[post_id][1]), places=3)
+
+    def test_interrupted_stream_resumes_without_reencoding(self):
+        from .checkpoints import load_checkpoint
+        from .management.commands import tweet_semantics
+
+        encode = self.encode
+        calls = []
+
+        def failing(texts):
+            calls.append(texts)
+            if len(calls) == 3:
+                raise RuntimeError("encoder died")
+            return encode(texts)
+
+        self.encode = failing
+        with self.assertRaises(RuntimeError):
+            self.run_command("--stream", "--chunk-size", "16")
+        self.assertEqual(json.loads(load_checkpoint(tweet_semantics.CHECKPOINT_NAME)), {"encoded_through": "1031"})
+
+        self.encode = encode
+        self.run_command("--stream", "--chunk-size", "16")
+        self.assertEqual(len(self.encoded), 60)
+        self.assertEqual(load_checkpoint(tweet_semantics.CHECKPOINT_NAME), "")
+        self.assertFalse(Post.objects.filter(pca_x__isnull=True).exists())
+
+    def test_new_posts_are_projected_into_the_current_frame(self):
+        from .embeddings import EmbeddingStore, Projection
+
+        self.run_command("--stream")
+        before = self.coords()
+        legislator = Legislator.objects.get(legislator_id=1)
+        Post.objects.create(
+            post_id="2000", legislator=legislator, name=legislator.name, text="post 75 about gun",
+            created_at=datetime(2021, 3, 1, tzinfo=timezone.utc), state="CA", chamber="House", party="Democratic",
+        )
+        self.run_command("--stream")
+        self.assertEqual(self.encoded[60:], ["post 75 about gun"])
+        projection = Projection.load()
+        self.assertEqual(projection.version, 1)
+        expected = projection.transform(EmbeddingStore().get(["2000"]))[0]
+        after = self.coords()
+        np.testing.assert_allclose(after.pop("2000"), expected, rtol=1e-5)
+        self.assertEqual(after, before)
+
+        self.run_command("--refit")
+        self.assertEqual(Projection.load().version, 2)
+
+
+@override_settings(CIVICWATCH_API_CACHE=False, CIVICWATCH_ANALYTICS_ENGINE=False)
+class RollupTests(TestCase):
+    # Windows end on days with posts (2020-06-03, 2020-09-30, 2021-02-17):
+    # both paths count the whole end day.
+    URLS = [
+        "/api/trend_data/?start_date=2020-01-01&end_date=2020-06-03&topics=gun,covid",
+        "/api/trend_data/?start_date=2020-01-01&end_date=2021-02-17",
+        "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-30",
+        "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-30&topics=climate",
+        "/api/geo/activity/topics/?metric=posts&start_date=2020-02-01&end_date=2020-09-30&topics=gun",
+        "/api/geo/activity/topics/?metric=engagement&start_date=2020-02-01&end_date=2020-09-30",
+        "/api/geo/activity/topics/?metric=legislators&start_date=2020-02-01&end_date=2020-09-30",
+        "/api/accountability_interface/?start_date=2020-02-01&end_date=2020-09-30",
+        "/api/accountability_interface/?start_date=2020-02-01&end_date=2020-09-30&topics=climate",
+        "/api/flow/bipartite/?start_date=2020-02-01&end_date=2020-09-30",
+        "/api/posts/statistics/?start_date=2020-02-01&end_date=2020-09-30",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        from . import rollups
+
+        create_sample_data()
+        rollups.rebuild_rollups(*rollups.post_date_bounds())
+
+    def get(self, url):
+        data = self.client.get(url).json()
+        return sorted(data, key=repr) if isinstance(data, list) else data
+
+    def assertMatchesPostQueries(self, urls):
+        for url in urls:
+            with self.subTest(url=url):
+                with self.settings(CIVICWATCH_USE_ROLLUPS=False):
+                    expected = self.get(url)
+                with self.settings(CIVICWATCH_USE_ROLLUPS=True):
+                    self.assertEqual(self.get(url), expected)
+
+    def test_matches_post_queries(self):
+        self.assertMatchesPostQueries(self.URLS)
+
+    def test_bipartite_groups_by_post_party(self):
+        from . import rollups
+
+        # The party on the post, as in the rollup, even where the legislator's differs.
+        Post.objects.filter(post_id="1010").update(party="Independent")
+        rollups.rebuild_rollups(*rollups.post_date_bounds())
+        self.assertMatchesPostQueries(["/api/flow/bipartite/?start_date=2020-01-01&end_date=2020-12-31"])
+
+    def test_bipartite_counts_each_legislator_once(self):
+        from . import rollups
+
+        # Legislator 1 already posted about guns on 2020-05-06 (post 1018); add two
+        # more of their posts that day, one filed under another state (its own
+        # rollup cell), and one by legislator 3 of the same party.
+        created_at = datetime(2020, 5, 6, 15, tzinfo=timezone.utc)
+        for post_id, legislator_id, state in [("2000", 1, "CA"), ("2001", 1, "NV"), ("2002", 3, "NY")]:
+            legislator = Legislator.objects.get(legislator_id=legislator_id)
+            post = Post.objects.create(
+                post_id=post_id, legislator=legislator, name=legislator.name, created_at=created_at, text="gun",
+                state=state, chamber="House", party="Democratic", like_count=1, retweet_count=1,
+            )
+            Topic.objects.create(post=post, name="gun")
+        rollups.rebuild_rollups(*rollups.post_date_bounds())
+
+        url = "/api/flow/bipartite/?start_date=2020-05-06&end_date=2020-05-06"
+        for use_rollups in (False, True):
+            with self.subTest(rollups=use_rollups), self.settings(CIVICWATCH_USE_ROLLUPS=use_rollups):
+                [day] = self.client.get(url).json()
+                self.assertEqual(day["gun"]["Democratic"], {"posts": 4, "legislators": 2, "likes": 39, "shares": 21})
+
+    def test_topic_edits_refresh_rollup_cells(self):
+        from .checkpoints import data_version
+
+        urls = [url for url in self.URLS if "topics=" in url or "engagement_metrics" in url or "bipartite" in url]
+        version = data_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.create(post_id="1012", name="climate")
+            Topic.objects.create(post_id="1013", name="gun")
+        self.assertEqual(data_version(), version + 1)
+        self.assertMatchesPostQueries(urls)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.filter(post_id__in=["1012", "1015"], name="gun").delete()
+        self.assertEqual(data_version(), version + 2)
+        self.assertMatchesPostQueries(urls)
+
+    def test_end_day_is_counted(self):
+        url = "/api/accountability_interface/?start_date=2020-09-30&end_date=2020-09-30"
+        for use_rollups in (False, True):
+            with self.subTest(rollups=use_rollups), self.settings(CIVICWATCH_USE_ROLLUPS=use_rollups):
+                by_party = self.client.get(url).json()["by_party"]
+                self.assertEqual(sum(int(row["civil_vs_uncivil"].split("/")[1]) for row in by_party.values()), 1)
+
+    def test_partial_rollup_only_answers_its_days(self):
+        from datetime import date
+        from unittest import mock
+
+        from . import rollups
+        from .checkpoints import clear_checkpoint
+        from .models import DailyPostRollup
+
+        DailyPostRollup.objects.all().delete()
+        clear_checkpoint(rollups.COVERAGE)
+        rollups.rebuild_rollups(date(2020, 3, 1), date(2020, 5, 31))
+        self.assertEqual(rollups.rollup_coverage(), (date(2020, 3, 1), date(2020, 5, 31)))
+
+        self.assertMatchesPostQueries(self.URLS)
+        with mock.patch.object(rollups, "accountability_rows", wraps=rollups.accountability_rows) as rows:
+            self.client.get("/api/accountability_interface/?start_date=2020-03-01&end_date=2020-05-31")
+            self.client.get("/api/accountability_interface/?start_date=2020-02-01&end_date=2020-05-31")
+        self.assertEqual(rows.call_count, 1)
+
+    def test_coverage_grows_with_adjacent_builds(self):
+        from datetime import date
+
+        from . import rollups
+        from .checkpoints import clear_checkpoint
+
+        clear_checkpoint(rollups.COVERAGE)
+        rollups.rebuild_rollups(date(2020, 3, 1), date(2020, 5, 31))
+        rollups.rebuild_rollups(date(2020, 7, 1), date(2020, 7, 31))
+        self.assertEqual(rollups.rollup_coverage(), (date(2020, 3, 1), date(2020, 5, 31)))
+        rollups.rebuild_rollups(date(2020, 6, 1), date(2021, 2, 17))
+        self.assertEqual(rollups.rollup_coverage(), (date(2020, 3, 1), None))
+        rollups.rebuild_rollups(date(2020, 1, 1), date(2020, 2, 29))
+        self.assertEqual(rollups.rollup_coverage(), (None, None))
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class AnalyticsEngineTests(TestCase):
+    URLS = [
+        "/api/trend_data/?start_date=2020-01-01&end_date=2020-06-30&topics=gun,covid",
+        "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-30",
+        "/api/geo/activity/topics/?metric=legislators&start_date=2020-02-01&end_date=2020-09-30",
+        "/api/accountability_interface/?start_date=2020-02-01&end_date=2020-09-30&topics=climate",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        from . import rollups
+
+        create_sample_data()
+        rollups.rebuild_rollups(*rollups.post_date_bounds())
+
+    def setUp(self):
+        analytics.reset()
+        self.addCleanup(analytics.reset)
+
+    def get(self, url):
+        data = self.client.get(url).json()
+        # Row order of list payloads isn't part of the contract.
+        return sorted(data, key=repr) if isinstance(data, list) else data
+
+    def test_first_load_runs_in_the_background(self):
+        from unittest import mock
+
+        with self.settings(CIVICWATCH_ANALYTICS_ENGINE=True), mock.patch.object(analytics.threading, "Thread") as thread:
+            self.assertIsNone(analytics.current_frame())
+            self.assertIsNone(analytics.current_frame())
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
+
+    def test_matches_rollups(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                with self.settings(CIVICWATCH_ANALYTICS_ENGINE=False):
+                    expected = self.get(url)
+                with self.settings(CIVICWATCH_ANALYTICS_ENGINE=True):
+                    analytics.load()
+                    self.assertIsNotNone(analytics.current_frame())
+                    self.assertEqual(self.get(url), expected)
+
+    def extend_reading(self, frame):
+        """``frame.extend()`` and the number of post rows it read."""
+        from unittest import mock
+
+        pages, keyset_pages = [], analytics.keyset_pages
+
+        def recording(*args, **kwargs):
+            for rows in keyset_pages(*args, **kwargs):
+                pages.append(len(rows))
+                yield rows
+
+        with mock.patch.object(analytics, "keyset_pages", recording):
+            return frame.extend(), sum(pages)
+
+    def assertFrameMatchesFullLoad(self, frame):
+        expected = analytics.PostFrame.load()
+        self.assertEqual((frame.version, frame.parties, frame.states, frame.last_key), (expected.version, expected.parties, expected.states, expected.last_key))
+        for name in analytics.COLUMNS:
+            np.testing.assert_array_equal(getattr(frame, name), getattr(expected, name), err_msg=name)
+
+    def test_appended_posts_are_read_alone(self):
+        from .ingest import ingest_records
+
+        frame = analytics.load()
+        ingest_records([{"post_id": "2000", "legislator_id": "2", "created_at": "2021-03-01T12:00:00Z", "text": "climate"}], "test")
+        extended, read = self.extend_reading(frame)
+        self.assertEqual((read, extended.size), (1, frame.size + 1))
+        self.assertFrameMatchesFullLoad(extended)
+
+    def test_other_changes_reload_the_frame(self):
+        from .checkpoints import bump_data_version
+        from .ingest import ingest_records
+
+        frame = analytics.load()
+        # A backfilled post sorts before the frame's last key.
+        ingest_records([{"post_id": "2000", "legislator_id": "2", "created_at": "2019-03-01T12:00:00Z", "text": "climate"}], "test")
+        extended, read = self.extend_reading(frame)
+        self.assertEqual(read, frame.size + 1)
+        self.assertFrameMatchesFullLoad(extended)
+
+        Post.objects.filter(post_id="1000").update(like_count=1000)
+        bump_data_version()
+        extended, read = self.extend_reading(extended)
+        self.assertEqual(read, frame.size + 1)
+        self.assertFrameMatchesFullLoad(extended)
+
+
+@unittest.skipIf(serialization.orjson is None, "orjson is not installed")
+@override_settings(CIVICWATCH_API_CACHE=False)
+class JsonBackendTests(TestCase):
+    URLS = DASHBOARD_QUERIES + [
+        "/api/posts/post_semantic_similarity/?start_date=2020-03-01&end_date=2020-05-31",
+        "/api/posts/post_semantic_similarity/?limit=5&fields=post_id,created_at,pca_x,topics",
+        "/api/chord/chord_interactions/?format=columnar",
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def test_backends_agree(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                with self.settings(CIVICWATCH_JSON_BACKEND="stdlib"):
+                    expected = self.client.get(url).json()
+                with self.settings(CIVICWATCH_JSON_BACKEND="orjson"):
+                    self.assertEqual(self.client.get(url).json(), expected)
+
+    def test_rows_format_matches_objects(self):
+        url = "/api/posts/post_semantic_similarity/?start_date=2020-03-01&end_date=2020-05-31"
+        objects = self.client.get(url).json()
+        payload = self.client.get(url + "&format=rows").json()
+        self.assertEqual([dict(zip(payload["fields"], row)) for row in payload["rows"]], objects)
+
+
+def decode_columnar(payload):
+    """Rows (as dicts) of a format=columnar payload."""
+    columns = {
+        name: [column["dictionary"][i] for i in column["indices"]] if isinstance(column, dict) else column
+        for name, column in payload["columns"].items()
+    }
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class ColumnarFormatTests(TestCase):
+    WINDOW = "start_date=2020-03-01&end_date=2020-09-30"
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def columnar(self, url):
+        payload = self.client.get(url + "&format=columnar").json()
+        rows = decode_columnar(payload)
+        self.assertEqual(len(rows), payload["length"])
+        return payload, rows
+
+    def test_monthly_counts(self):
+        for path in ("/api/legislators/posts-by-month/", "/api/legislators/legislator_posts_by_month_top_50/"):
+            with self.subTest(path=path):
+                url = f"{path}?{self.WINDOW}"
+                expected = [
+                    {"legislator_id": legislator["legislator_id"], "name": legislator["name"], "party": legislator["party"],
+                     "month": month, "post_count": count}
+                    for legislator in self.client.get(url).json()["legislators"]
+                    for month, count in legislator["monthly_post_counts"].items()
+                ]
+                self.assertEqual(self.columnar(url)[1], expected)
+
+    def test_trend_data(self):
+        url = f"/api/trend_data/?{self.WINDOW}&topics=gun,covid"
+        expected = self.client.get(url).json()
+        rows = self.columnar(url)[1]
+        self.assertEqual(sum(len(parties) for parties in expected.values()), len(rows))
+        for row in rows:
+            self.assertEqual(expected[row["date"]][row["party"]], {"avgEngagementPerPost": row["avgEngagementPerPost"]})
+
+    def test_semantic_similarity(self):
+        url = f"/api/posts/post_semantic_similarity/?{self.WINDOW}"
+        self.assertEqual(self.columnar(url)[1], self.client.get(url).json())
+
+        url += "&limit=4&fields=post_id,party,topics"
+        expected = self.client.get(url).json()
+        payload, rows = self.columnar(url)
+        self.assertEqual(rows, expected["results"])
+        self.assertEqual(payload["next_cursor"], expected["next_cursor"])
+
+    @unittest.skipUnless(exports.arrow_available(), "pyarrow is not installed")
+    def test_arrow_stream(self):
+        import pyarrow as pa
+
+        url = f"/api/legislators/posts-by-month/?{self.WINDOW}"
+        response = self.client.get(url + "&format=arrow")
+        self.assertEqual(response["Content-Type"], serialization.ARROW_STREAM)
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertTrue(pa.types.is_dictionary(table.schema.field("name").type))
+        self.assertEqual(table.to_pylist(), self.columnar(url)[1])
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class ChordInteractionTests(TestCase):
+    URL = "/api/chord/chord_interactions/?start_date=2020-03-01&end_date=2020-09-30"
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+        # A second interaction type on an existing pair, and a post with two topics.
+        for interaction in LegislatorInteraction.objects.filter(post_id__in=["1012", "1018"]):
+            LegislatorInteraction.objects.create(
+                date=interaction.date, post_id=interaction.post_id, source_legislator_id=interaction.source_legislator_id,
+                target_legislator_id=interaction.target_legislator_id, interaction_type="retweet",
+            )
+        Topic.objects.create(post_id="1012", name="climate")
+
+    def per_interaction(self):
+        """Edges summed from one row per interaction, as the endpoint built them before grouping."""
+        edges = {}
+        interactions = LegislatorInteraction.objects.filter(
+            date__gte=datetime(2020, 3, 1, tzinfo=timezone.utc), date__lt=datetime(2020, 10, 1, tzinfo=timezone.utc),
+        ).select_related("source_legislator", "target_legislator").prefetch_related("post__topics")
+        for interaction in interactions:
+            key = (interaction.source_legislator_id, interaction.target_legislator_id, interaction.interaction_type)
+            edge = edges.setdefault(key, {
+                "source_legislator_id": key[0], "target_legislator_id": key[1], "interaction_type": key[2], "count": 0,
+                **{f"{end}_{name}": getattr(getattr(interaction, f"{end}_legislator"), field)
+                   for end in ("source", "target")
+                   for name, field in [("name", "name"), ("state", "state"), ("party", "party"), ("civility", "civility_score_tw"),
+                                       ("misinfo_count", "total_misinfo_count_tw"), ("interaction_score", "interaction_score_tw")]},
+                "topic_counts": {},
+            })
+            edge["count"] += 1
+            for topic in interaction.post.topics.all():
+                edge["topic_counts"][topic.name] = edge["topic_counts"].get(topic.name, 0) + 1
+        for edge in edges.values():
+            edge["topics"] = sorted(edge["topic_counts"])
+        return [edges[key] for key in sorted(edges)]
+
+    def test_grouped_edges_match_per_interaction_rows(self):
+        with self.assertNumQueries(2):
+            rows = self.client.get(self.URL).json()
+        expected = self.per_interaction()
+        self.assertEqual(rows, expected)
+        self.assertEqual(sum(row["count"] for row in rows), LegislatorInteraction.objects.filter(
+            date__gte=datetime(2020, 3, 1, tzinfo=timezone.utc), date__lt=datetime(2020, 10, 1, tzinfo=timezone.utc),
+        ).count())
+        # Edges really are summed, per interaction type, with multi-topic posts counted under each topic.
+        self.assertIn(("retweet", 2, {"climate": 1, "gun": 2}), [(row["interaction_type"], row["count"], row["topic_counts"]) for row in rows])
+        self.assertTrue(all(row["count"] > 1 for row in rows))
+
+    def test_columnar_matches_rows(self):
+        rows = self.client.get(self.URL).json()
+        with self.assertNumQueries(2):
+            payload = self.client.get(self.URL + "&format=columnar").json()
+        nodes, edges = payload["nodes"], payload["edges"]
+        decoded = []
+        for i, source in enumerate(edges["source"]):
+            target = edges["target"][i]
+            counts = dict(zip(payload["topics"], edges["topic_counts"][i]))
+            decoded.append({
+                "source_legislator_id": nodes["legislator_id"][source],
+                "target_legislator_id": nodes["legislator_id"][target],
+                "interaction_type": edges["interaction_type"][i],
+                "count": edges["count"][i],
+                **{f"source_{key}": nodes[key][source] for key in nodes if key != "legislator_id"},
+                **{f"target_{key}": nodes[key][target] for key in nodes if key != "legislator_id"},
+                "topics": [name for name, n in counts.items() if n],
+                "topic_counts": {name: n for name, n in counts.items() if n},
+            })
+        self.assertEqual(decoded, rows)
+
+
+@unittest.skipUnless(exports.arrow_available(), "pyarrow is not installed")
+class DatasetImportTests(TestCase):
+    def setUp(self):
+        from . import datasets
+
+        create_sample_data()
+        Legislator.objects.update(total_posts_tw=10, total_likes_tw=20)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        datasets.export_dataset(self.directory)
+        self.interactions = sorted(LegislatorInteraction.objects.values_list("post_id", "source_legislator_id", "target_legislator_id"))
+        self.first_interaction_id = LegislatorInteraction.objects.order_by("id").values_list("id", flat=True)[0]
+        LegislatorInteraction.objects.all().delete()
+        Post.objects.all().delete()
+        Legislator.objects.all().delete()
+
+    def test_rerun_after_interruption_keeps_totals(self):
+        from .datasets import import_dataset
+
+        # The first run stops after the legislators.
+        import_dataset(self.directory, ["legislators"])
+        import_dataset(self.directory)
+        results = import_dataset(self.directory)
+
+        self.assertEqual(set(Legislator.objects.values_list("total_posts_tw", "total_likes_tw")), {(10, 20)})
+        self.assertEqual(results["posts"].duplicates, 60)
+        self.assertEqual(results["interactions"].duplicates, 60)
+
+    def test_interactions_match_on_content_not_id(self):
+        from .datasets import import_dataset
+
+        legislator = Legislator.objects.create(legislator_id=99, name="Local", state="CA", chamber="House", party="Democratic")
+        post = Post.objects.create(
+            post_id="local", legislator=legislator, name="Local", created_at=datetime(2021, 1, 1, tzinfo=timezone.utc),
+            text="", state="CA", chamber="House", party="Democratic",
+        )
+        # Same id as an exported row, unrelated otherwise.
+        local = LegislatorInteraction.objects.create(
+            id=self.first_interaction_id, date=post.created_at, post=post, source_legislator=legislator, target_legislator=legislator, interaction_type="mention",
+        )
+
+        import_dataset(self.directory)
+        imported = LegislatorInteraction.objects.exclude(pk=local.pk)
+        self.assertEqual(sorted(imported.values_list("post_id", "source_legislator_id", "target_legislator_id")), self.interactions)
+
+
+@override_settings(CIVICWATCH_API_CACHE=False, CIVICWATCH_ANALYTICS_ENGINE=False)
+class ParallelQueryTests(TransactionTestCase):
+    # Pool threads can't share Django's in-memory SQLite test database
+    # (run_parallel falls back to running in turn, and in-memory connections
+    # never close), so this class moves the connection onto a file copy of it.
+    # TransactionTestCase commits the fixture, so pool threads see it and
+    # run_parallel takes the threaded path.
+    URLS = [
+        "/api/geo/activity/topics/?metric=posts&start_date=2020-02-01&end_date=2020-09-30&topics=gun",
+        "/api/geo/activity/topics/?metric=engagement&start_date=2020-02-01&end_date=2020-09-30",
+        "/api/geo/activity/topics/?metric=legislators&start_date=2020-02-01&end_date=2020-09-30",
+        "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-30&topics=gun,covid",
+        "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-30",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        import sqlite3
+
+        cls.tmpdir = tempfile.mkdtemp()
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            connection.ensure_connection()
+            path = os.path.join(cls.tmpdir, "test.sqlite3")
+            copy = sqlite3.connect(path)
+            connection.connection.backup(copy)
+            copy.close()
+            # Every thread's connection is built from this settings dict; the
+            # in-memory one is kept open so it survives until tearDownClass.
+            cls.in_memory = (connection.settings_dict["NAME"], connection.connection)
+            connection.connection = None
+            connection.settings_dict["NAME"] = path
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if hasattr(cls, "in_memory"):
+            connection.close()
+            connection.settings_dict["NAME"], connection.connection = cls.in_memory
+        shutil.rmtree(cls.tmpdir)
+
+    def setUp(self):
+        create_sample_data()
+
+    def test_parallel_matches_sequential(self):
+        from django.db.backends.signals import connection_created
+
+        from . import rollups
+
+        threads = []
+
+        def opened(sender, connection, **kwargs):
+            threads.append(threading.current_thread().name)
+
+        connection_created.connect(opened)
+        self.addCleanup(connection_created.disconnect, opened)
+        for use_rollups in (False, True):
+            if use_rollups:
+                rollups.rebuild_rollups(*rollups.post_date_bounds())
+            for url in self.URLS:
+                with self.subTest(url=url, rollups=use_rollups), self.settings(CIVICWATCH_USE_ROLLUPS=use_rollups):
+                    with self.settings(CIVICWATCH_QUERY_WORKERS=1):
+                        expected = self.client.get(url).json()
+                    with self.settings(CIVICWATCH_QUERY_WORKERS=4):
+                        self.assertEqual(self.client.get(url).json(), expected)
+        self.assertTrue(any(name.startswith("civicwatch-query") for name in threads))
+
+    @override_settings(CIVICWATCH_QUERY_WORKERS=4)
+    def test_pool_threads_close_their_connections(self):
+        from django.db import connections
+
+        from . import fanout
+
+        self.client.get(self.URLS[0])
+        # One task per worker, held at a barrier so that each lands on its own thread.
+        barrier = threading.Barrier(4)
+
+        def connection_state():
+            barrier.wait(timeout=5)
+            return connections["default"].connection
+
+        executor = fanout._executor(4)
+        states = [future.result() for future in [executor.submit(connection_state) for _ in range(4)]]
+        self.assertEqual(states, [None] * 4)
+
+
+@override_settings(CIVICWATCH_API_CACHE=True, CIVICWATCH_DATA_VERSION_TTL=0)
+class ResponseCacheTests(TestCase):
+    URL = "/api/legislators/"
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches["api"].clear()
+
+    def test_repeat_get_is_a_hit(self):
+        url = "/api/engagement_metrics/?start_date=2020-02-01&end_date=2020-09-29&topics=gun"
+        first = self.client.get(url)
+        second = self.client.get(url.replace("topics=gun", "topics=gun,"))
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.json(), first.json())
+
+    def test_version_bump_misses_once_the_ttl_has_passed(self):
+        from unittest import mock
+
+        from . import response_cache
+        from .checkpoints import bump_data_version
+
+        url = "/api/overview_metrics/"
+        with self.settings(CIVICWATCH_DATA_VERSION_TTL=60):
+            now = time.monotonic()
+            with mock.patch.object(response_cache.time, "monotonic", return_value=now):
+                response_cache._version["value"] = None
+                self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+                bump_data_version()
+                self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+            with mock.patch.object(response_cache.time, "monotonic", return_value=now + 61):
+                self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+    def test_errors_and_streams_are_not_stored(self):
+        from django.http import StreamingHttpResponse
+        from django.test import RequestFactory
+
+        from .response_cache import cached_api_view
+
+        url = "/api/posts/statistics/?start_date=2000-01-01&end_date=2020-01-01"
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+        @cached_api_view
+        def stream(request):
+            return StreamingHttpResponse(iter([b"a", b"b"]))
+
+        request = RequestFactory().get("/stream/")
+        stream(request)
+        second = stream(request)
+        self.assertTrue(second.streaming)
+        self.assertEqual(second["X-Cache"], "MISS")
+
+    async def test_async_view_miss_then_hit(self):
+        first = await self.async_client.get(self.URL)
+        second = await self.async_client.get(self.URL)
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.json(), first.json())
+
+    async def test_async_view_misses_after_version_bump(self):
+        from asgiref.sync import sync_to_async
+
+        from .checkpoints import bump_data_version
+
+        await self.async_client.get(self.URL)
+        await sync_to_async(bump_data_version)()
+        self.assertEqual((await self.async_client.get(self.URL))["X-Cache"], "MISS")
+
+
+@override_settings(CIVICWATCH_API_CACHE=False)
+class BuildDefaultsTests(TestCase):
+    WINDOW = "start_date=2020-01-01&end_date=2021-12-31"
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    def build(self):
+        from unittest import mock
+
+        from django.core.management import call_command
+
+        from .management.commands import build_defaults
+
+        files_at_bump = []
+
+        def bump():
+            files_at_bump.extend(sorted(os.listdir(self.output_dir)))
+            return 7
+
+        with mock.patch.object(build_defaults, "bump_data_version", side_effect=bump):
+            call_command("build_defaults", output_dir=self.output_dir)
+        return files_at_bump
+
+    def read(self, filename):
+        with open(os.path.join(self.output_dir, filename)) as f:
+            return json.load(f)
+
+    def test_payloads_match_the_views(self):
+        self.build()
+        for filename, url in [
+            ("defaultOverviewTab.json", f"/api/overview_metrics/?{self.WINDOW}"),
+            ("defaultOverviewTrendline.json", f"/api/trend_data/?{self.WINDOW}"),
+            ("defaultEngagementTab.json", f"/api/engagement_metrics/?{self.WINDOW}"),
+            ("defaultAccountability.json", f"/api/posts/statistics/?{self.WINDOW}"),
+        ]:
+            with self.subTest(filename=filename):
+                self.assertEqual(self.read(filename), self.client.get(url).json())
+        bipartite = self.read("defaultBipartite.json")
+        self.assertEqual((bipartite[0]["date"], bipartite[-1]["date"], len(bipartite)), ("2020-01-01", "2021-12-31", 731))
+        self.assertEqual(sum(day["gun"]["D"]["posts"] + day["gun"]["R"]["posts"] for day in bipartite), 20)
+        self.assertEqual(sum(state["total"] for state in self.read("defaultChoroplethPosts.json")), 60)
+        self.assertEqual(sum(link["value"] for link in self.read("defaultInteractionNetwork.json")["links"]), 60)
+
+    def test_version_is_bumped_after_the_files_are_in_place(self):
+        from .management.commands.build_defaults import MANIFEST_FILE
+
+        files_at_bump = self.build()
+        manifest = self.read(MANIFEST_FILE)
+        self.assertEqual(files_at_bump, manifest["files"])
+        self.assertEqual(
+            (manifest["start_date"], manifest["end_date"], manifest["data_version"]), ("2020-01-01", "2021-12-31", 7)
+        )
+
+    def test_rollup_is_left_alone(self):
+        from . import rollups
+
+        self.build()
+        self.assertIsNone(rollups.rollup_coverage())
+
+
+@override_settings(CIVICWATCH_API_CACHE=True)
+class StaticPayloadTests(TestCase):
+    URL = "/api/geo/activity/topics/?metric=posts&start_date=2020-01-01&end_date=2021-12-31"
+
+    def setUp(self):
+        from django.core.cache import caches
+
+        caches["api"].clear()
+
+    def test_encoding_follows_q_values(self):
+        for header, encoding in [
+            ("gzip, deflate", "gzip"),
+            ("gzip;q=0", None),
+            ("gzip;q=0.0, deflate", None),
+            ("*", "gzip"),
+            ("*;q=0.5, gzip;q=0", None),
+            ("", None),
+        ]:
+            with self.subTest(header=header):
+                response = self.client.get(self.URL, HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_etag_revalidates_per_encoding(self):
+        plain = self.client.get(self.URL)
+        gzipped = self.client.get(self.URL, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotEqual(plain["ETag"], gzipped["ETag"])
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=plain["ETag"]).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.URL, HTTP_IF_NONE_MATCH=gzipped["ETag"], HTTP_ACCEPT_ENCODING="gzip").status_code, 304
+        )
+        # The gzip ETag doesn't match the identity representation.
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=gzipped["ETag"]).status_code, 200)
+
+    def test_compressed_payload_is_not_cached_for_other_clients(self):
+        import gzip
+
+        gzipped = self.client.get(self.URL, HTTP_ACCEPT_ENCODING="gzip")
+        plain = self.client.get(self.URL)
+        self.assertEqual(plain.get("Content-Encoding"), None)
+        self.assertEqual(json.loads(plain.content), json.loads(gzip.decompress(gzipped.content)))
+
+
+class ExportStreamTests(TestCase):
+    # Smaller than the fixture and than the run of posts sharing a timestamp,
+    # so page boundaries fall inside the ties.
+    BATCH_SIZE = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data()
+        tied = datetime(2020, 3, 1, 12, tzinfo=timezone.utc)
+        Post.objects.filter(post_id__lt="1030").update(created_at=tied)
+
+    def expected_ids(self):
+        return list(Post.objects.order_by("created_at", "post_id").values_list("post_id", flat=True))
+
+    def test_pages_cover_every_row_once(self):
+        pages = list(exports.keyset_pages(Post.objects.all(), ["post_id", "created_at"], ("created_at", "post_id"), self.BATCH_SIZE))
+        self.assertGreater(len(pages), 60 // self.BATCH_SIZE)
+        self.assertEqual([post_id for page in pages for post_id, _ in page], self.expected_ids())
+
+    def test_paged_csv_matches_single_page(self):
+        import csv
+
+        paged = "".join(exports.csv_stream(Post.objects.all(), batch_size=self.BATCH_SIZE))
+        self.assertEqual(paged, "".join(exports.csv_stream(Post.objects.all(), batch_size=1000)))
+        self.assertEqual([row[0] for row in list(csv.reader(paged.splitlines()))[1:]], self.expected_ids())
+
+    def test_gzip_decodes_to_the_csv(self):
+        import gzip
+
+        chunks = exports.gzip_stream(exports.csv_stream(Post.objects.all(), batch_size=self.BATCH_SIZE))
+        self.assertEqual(gzip.decompress(b"".join(chunks)).decode(), "".join(exports.csv_stream(Post.objects.all())))
+
+    @unittest.skipUnless(exports.arrow_available(), "pyarrow is not installed")
+    def test_parquet_decodes_to_the_rows(self):
+        import io
+
+        data = b"".join(exports.parquet_stream(Post.objects.all(), batch_size=self.BATCH_SIZE))
+        table = exports.pq.read_table(io.BytesIO(data))
+        rows = list(Post.objects.order_by("created_at", "post_id").values_list(*exports.EXPORT_FIELDS))
+        self.assertEqual([tuple(row[field] for field in exports.EXPORT_FIELDS) for row in table.to_pylist()], rows)
+        self.assertGreater(exports.pq.ParquetFile(io.BytesIO(data)).num_row_groups, 1)
+
+    def test_stream_for_keeps_sync_iterators_under_wsgi(self):
+        from django.test import RequestFactory
+
+        chunks = iter(["a", "b"])
+        self.assertIs(exports.stream_for(RequestFactory().get("/"), chunks), chunks)
+
+    async def test_csv_streams_from_an_async_generator_under_asgi(self):
+        from asgiref.sync import sync_to_async
+
+        response = await self.async_client.get("/api/export-posts-csv/")
+        self.assertTrue(response.is_async)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        expected = await sync_to_async(lambda: "".join(exports.csv_stream(Post.objects.all())))()
+        self.assertEqual(body.decode(), expected)
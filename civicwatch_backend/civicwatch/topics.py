@@ -0,0 +1,150 @@
+import threading
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.lookups import Exact, GreaterThan
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.timezone import localdate
+
+from .models import Post, Topic, TopicLabel
+
+# Each topic name owns one bit (TopicLabel.bit) and Post.topic_mask ORs the
+# bits of the post's topics. Topic filters and per-topic aggregates then read
+# one integer column of the post row instead of joining Topic, which repeats a
+# post once per topic and forced DISTINCT onto every multi-topic query.
+# Bit 63 would make the signed 64-bit column negative, so 63 topics fit.
+MAX_TOPIC_BITS = 63
+
+
+def topic_bits():
+    """``{name: bit}`` for every known topic."""
+    return dict(TopicLabel.objects.values_list("name", "bit"))
+
+
+def mask_for(names, bits=None, create=False):
+    """
+    Bitmask for a list of topic names. Unknown names are ignored unless
+    ``create`` is set, in which case they're given the next free bit.
+    """
+    bits = topic_bits() if bits is None else bits
+    if create:
+        for name in dict.fromkeys(names):
+            if name not in bits:
+                bits[name] = _create_label(name)
+    mask = 0
+    for name in names:
+        if name in bits:
+            mask |= 1 << bits[name]
+    return mask
+
+
+def _create_label(name):
+    used = set(TopicLabel.objects.values_list("bit", flat=True))
+    free = next((bit for bit in range(MAX_TOPIC_BITS) if bit not in used), None)
+    if free is None:
+        raise ValueError(f"No topic bit left for {name!r}; at most {MAX_TOPIC_BITS} topics are supported")
+    label, _ = TopicLabel.objects.get_or_create(name=name, defaults={"bit": free})
+    return label.bit
+
+
+def has_any_topic(names, bits=None, field="topic_mask"):
+    """
+    Filter condition for posts tagged with at least one of ``names``; ``field``
+    reaches the mask through a relation (e.g. ``post__topic_mask``).
+    """
+    return GreaterThan(F(field).bitand(mask_for(names, bits)), 0)
+
+
+def per_topic_rows(queryset, group_by, aggregates, topics=None):
+    """
+    Equivalent of ``queryset.values(*group_by, "topics__name").annotate(**aggregates)``
+    computed in one grouped query with a conditional aggregate per topic.
+    ``aggregates`` maps output names to aggregate classes and fields, e.g.
+    ``{"total_likes": (Sum, "like_count")}``. Untagged posts come back under
+    ``None`` unless ``topics`` restricts the result to those topics.
+    """
+    bits = topic_bits()
+    names = [name for name in (topics or sorted(bits)) if name in bits]
+    conditions = [(name, has_any_topic([name], bits)) for name in names]
+    if not topics:
+        conditions.append((None, Exact(F("topic_mask"), 0)))
+
+    annotations = {}
+    for i, (_, condition) in enumerate(conditions):
+        annotations[f"n_{i}"] = Count("pk", filter=Q(condition))
+        for output, (aggregate, field) in aggregates.items():
+            annotations[f"{output}_{i}"] = aggregate(field, filter=Q(condition))
+
+    rows = []
+    for group in queryset.values(*group_by).annotate(**annotations).order_by(*group_by):
+        for i, (name, _) in enumerate(conditions):
+            if not group[f"n_{i}"]:
+                continue
+            row = {key: group[key] for key in group_by}
+            row["topics__name"] = name
+            row.update({output: group[f"{output}_{i}"] for output in aggregates})
+            rows.append(row)
+    return rows
+
+
+def refresh_topic_masks(post_ids=None):
+    """Recompute Post.topic_mask from the Topic rows (all posts, or just ``post_ids``)."""
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(post_id__in=post_ids)
+    topics = Topic.objects.all() if post_ids is None else Topic.objects.filter(post_id__in=post_ids)
+    names = list(topics.values_list("name", flat=True).distinct())
+    bits = topic_bits()
+    mask_for(names, bits, create=True)
+
+    posts.update(topic_mask=0)
+    for name in names:
+        posts.filter(post_id__in=topics.filter(name=name).values("post_id")).update(
+            topic_mask=F("topic_mask").bitor(1 << bits[name])
+        )
+
+
+# Bulk loads set topic_mask themselves; these keep one-off edits (admin,
+# shell, fixtures) in sync. The rollup cells of the edited posts' days are
+# keyed by topic_mask too, so they're rebuilt (and the data version bumped)
+# once per transaction, when it commits.
+_edited = threading.local()
+
+
+def _edited_posts(name):
+    if not hasattr(_edited, name):
+        setattr(_edited, name, set())
+    return getattr(_edited, name)
+
+
+def _refresh_edited():
+    from .ingest import refresh_derived
+
+    deleted, _edited.deleted = _edited_posts("deleted"), set()
+    saved, _edited.saved = _edited_posts("saved"), set()
+    post_ids = deleted | saved
+    if not post_ids:
+        return
+    with transaction.atomic():
+        if deleted:
+            refresh_topic_masks(sorted(deleted))
+        days = Post.objects.filter(post_id__in=post_ids).values_list("created_at", flat=True)
+        refresh_derived({localdate(created_at) for created_at in days})
+
+
+@receiver(post_save, sender=Topic)
+def _sync_topic_mask(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        refresh_topic_masks([instance.post_id])
+        _edited_posts("saved").add(instance.post_id)
+        transaction.on_commit(_refresh_edited)
+
+
+@receiver(post_delete, sender=Topic)
+def _sync_deleted_topic_mask(sender, instance, origin=None, **kwargs):
+    # Deletes cascading from a Post or Legislator take the post with them.
+    # Direct deletes (one topic or a queryset) refresh each post once, when
+    # the transaction commits.
+    if instance.post_id is None or getattr(origin, "model", type(origin)) is not Topic:
+        return
+    _edited_posts("deleted").add(instance.post_id)
+    transaction.on_commit(_refresh_edited)
@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+from .embeddings import MODEL_NAME, EmbeddingStore, embeddings_dir
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = "ivf"
+
+
+def index_dir():
+    return os.path.join(embeddings_dir(), INDEX_DIRNAME)
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _kmeans(sample, nlist, iterations=20, seed=0):
+    """Spherical k-means; good enough for a coarse quantizer."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = sample[rng.choice(len(sample), empty.sum())]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def build_index(store=None, nlist=None, sample_size=100000, chunk_size=50000, path=None):
+    """
+    Build an inverted-file (IVF) index over the embedding store: vectors are
+    clustered around ``nlist`` centroids and stored contiguously per cluster, so
+    a query only scans the few clusters closest to it.
+    """
+    store = store or EmbeddingStore()
+    path = path or index_dir()
+    count = len(store)
+    if count == 0:
+        return 0
+    nlist = nlist or max(1, min(4 * int(np.sqrt(count)), count))
+
+    rng = np.random.default_rng(0)
+    sample_rows = np.sort(rng.choice(count, min(sample_size, count), replace=False))
+    centroids = _kmeans(_normalize(store.vectors[sample_rows]), min(nlist, len(sample_rows)))
+    nlist = len(centroids)
+
+    assignments = np.empty(count, dtype=np.int32)
+    for start in range(0, count, chunk_size):
+        chunk = _normalize(store.vectors[start:start + chunk_size])
+        assignments[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+
+    order = np.argsort(assignments, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+
+    # Each build goes to a directory of its own; meta.json, replaced last,
+    # names the build readers load, so they never see a mix of two builds.
+    os.makedirs(path, exist_ok=True)
+    previous = _read_meta(path).get("build")
+    build = uuid.uuid4().hex[:12]
+    build_path = os.path.join(path, build)
+    os.makedirs(build_path)
+
+    vectors = np.lib.format.open_memmap(os.path.join(build_path, "vectors.npy"), mode="w+", dtype=np.float16, shape=(count, store.dim))
+    for start in range(0, count, chunk_size):
+        rows = order[start:start + chunk_size]
+        vectors[start:start + len(rows)] = _normalize(store.vectors[np.sort(rows)])[np.argsort(np.argsort(rows))]
+    vectors.flush()
+    del vectors
+
+    ids = np.asarray(store.ids, dtype=object)[order]
+    with open(os.path.join(build_path, "post_ids.txt"), "w") as f:
+        f.writelines(f"{post_id}\n" for post_id in ids)
+    np.save(os.path.join(build_path, "centroids.npy"), centroids)
+    np.save(os.path.join(build_path, "offsets.npy"), offsets)
+
+    with open(os.path.join(path, "meta.json.tmp"), "w") as f:
+        json.dump({"count": count, "nlist": nlist, "dim": store.dim, "build": build}, f)
+    os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+
+    # The previous build stays for readers that read its meta.json just before the swap.
+    for name in os.listdir(path):
+        if name not in (build, previous) and os.path.isdir(os.path.join(path, name)):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    return count
+
+
+def _read_meta(path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class VectorIndex:
+    def __init__(self, path=None):
+        self.path = path or index_dir()
+        self.mtime = os.path.getmtime(os.path.join(self.path, "meta.json"))
+        self.meta = _read_meta(self.path)
+        # Indexes built before builds had their own directory keep their files beside meta.json.
+        files = os.path.join(self.path, self.meta["build"]) if "build" in self.meta else self.path
+        self.centroids = np.load(os.path.join(files, "centroids.npy"))
+        self.offsets = np.load(os.path.join(files, "offsets.npy"))
+        self.vectors = np.load(os.path.join(files, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(files, "post_ids.txt")) as f:
+            self.ids = [line.rstrip("\n") for line in f]
+
+    def search(self, query, k=10, nprobe=8):
+        """Return ``[(post_id, cosine_similarity), ...]`` for the ``k`` nearest posts."""
+        query = _normalize(query).reshape(-1)
+        nprobe = min(nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.concatenate([np.arange(self.offsets[i], self.offsets[i + 1]) for i in lists])
+        if not len(rows):
+            return []
+        scores = np.asarray(self.vectors[rows], dtype=np.float32) @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], float(scores[i])) for i in top]
+
+
+_loaded = {}
+
+
+def get_index():
+    """Process-wide index, reloaded when a rebuild replaces it on disk."""
+    path = index_dir()
+    try:
+        mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+    except FileNotFoundError:
+        return None
+    index = _loaded.get(path)
+    if index is None or index.mtime != mtime:
+        index = _loaded[path] = VectorIndex(path)
+    return index
+
+
+_store = None
+_encoder = None
+
+
+def query_vector_for_post(post_id):
+    """Stored embedding of a post, or None if it hasn't been embedded."""
+    global _store
+    if _store is None or len(_store) != EmbeddingStore(_store.path).count:
+        _store = EmbeddingStore()
+    if post_id not in _store:
+        return None
+    return _store.get([post_id])[0]
+
+
+def query_vector_for_text(text):
+    global _encoder
+    if _encoder is None:
+        from sentence_transformers import SentenceTransformer
+        _encoder = SentenceTransformer(MODEL_NAME)
+    return _encoder.encode([text])[0]
@@ -1,19 +1,45 @@
 from django.shortcuts import render
 
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Sum, Avg, Q, Case, When, IntegerField, F
 from .models import Legislator, Post, LegislatorInteraction, Topic
-from datetime import datetime, timedelta, date
+from datetime import datetime, time, timedelta, date
+from django.utils.timezone import make_aware
 from django.utils.dateparse import parse_date
 from django.db.models import Avg, DateField, Count
 from django.db.models.functions import TruncDate, TruncWeek, TruncDay, TruncMonth
 from .models import Post
+import base64
+import binascii
 import json
 import os
 import csv
 from django.conf import settings
 from collections import defaultdict
+from . import analytics, rollups
+from .ingest import TOPIC_KEYWORDS
+from .fanout import run_parallel
+from .response_cache import cached_api_view
+from .search import text_contains
+from .serialization import JsonResponse, columnar_response, columns_from_rows, rows_payload
+from .static_payloads import astatic_json_response, get_payload, static_json_response
+from .topics import has_any_topic, per_topic_rows, topic_bits
+
+def date_window(start_date=None, end_date=None, field="created_at"):
+    """
+    Q for ``field`` falling on the days start_date..end_date, both inclusive:
+    the whole end day counts, as in the rollups and the analytics frame.
+    Bounds may be dates or YYYY-MM-DD strings; empty ones are open.
+    """
+    window = Q()
+    start = parse_date(start_date) if isinstance(start_date, str) else start_date
+    end = parse_date(end_date) if isinstance(end_date, str) else end_date
+    if start:
+        window &= Q(**{f"{field}__gte": make_aware(datetime.combine(start, time.min))})
+    if end:
+        window &= Q(**{f"{field}__lt": make_aware(datetime.combine(end + timedelta(days=1), time.min))})
+    return window
 
 def filter_posts(request):
     start_date = request.GET.get('start_date')
@@ -25,30 +51,45 @@ def filter_posts(request):
     legislator_name = request.GET.get('legislator', '')
     print("legislator_name", legislator_name)
 
-    posts_filter = Q()
-    if start_date:
-        posts_filter &= Q(created_at__gte=parse_date(start_date))
-    if end_date:
-        posts_filter &= Q(created_at__lte=parse_date(end_date))
+    posts_filter = date_window(start_date, end_date)
     if topic_list:
-        posts_filter &= Q(topics__name__in=topic_list)
+        posts_filter &= has_any_topic(topic_list)
     if keyword:
-        posts_filter &= Q(text__icontains=keyword)
+        posts_filter &= text_contains(keyword)
     if legislator_name:
         posts_filter &= Q(legislator__name__iexact=legislator_name)
 
-    return Post.objects.filter(posts_filter).distinct()
+    # No multi-valued joins, so each post appears once without DISTINCT.
+    return Post.objects.filter(posts_filter)
 
-def all_legislators(request):
+@cached_api_view
+async def all_legislators(request):
     try:
-        print("Fetching legislators")
-        legislators = Legislator.objects.values("legislator_id", "name", "state", "party").order_by("state", "name")
-        print("Legislators fetched:", legislators)
-        return JsonResponse(list(legislators), safe=False)
+        legislators = [
+            legislator
+            async for legislator in Legislator.objects.values("legislator_id", "name", "state", "party").order_by("state", "name")
+        ]
+        return JsonResponse(legislators, safe=False)
     except Exception as e:
-        print("Error fetching legislators:", e)
         return JsonResponse({"error": str(e)}, status=500)
 
+COLUMNAR_FORMATS = ("columnar", "arrow")
+MONTHLY_COLUMNS = ("legislator_id", "name", "party", "month", "post_count")
+
+
+def _monthly_counts_response(request, result):
+    if request.GET.get('format') not in COLUMNAR_FORMATS:
+        return JsonResponse({'legislators': list(result.values())})
+    # One row per (legislator, month), legislator order kept.
+    rows = [
+        (legislator['legislator_id'], legislator['name'], legislator['party'], month, count)
+        for legislator in result.values()
+        for month, count in legislator['monthly_post_counts'].items()
+    ]
+    return columnar_response(request, columns_from_rows(MONTHLY_COLUMNS, rows), dictionary={"name", "party", "month"})
+
+
+@cached_api_view
 def legislator_posts_by_month(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -56,20 +97,15 @@ def legislator_posts_by_month(request):
 
     posts_query = Post.objects.all()
 
-    tweet_filters = {}
-
     #apply date filter
-    if start_date:
-        tweet_filters['created_at__gte'] = start_date
-    if end_date:
-        tweet_filters['created_at__lte'] = end_date
+    tweet_filters = date_window(start_date, end_date)
 
     if legislator_id:
         posts_query = posts_query.filter(legislator_id=legislator_id)
     
     legislators_data = (
         posts_query
-        .filter(**tweet_filters)
+        .filter(tweet_filters)
         .annotate(month=TruncMonth('created_at'))
         .values('legislator_id', 'legislator__name', 'month', 'party')
         .annotate(post_count=Count('post_id'))
@@ -94,14 +130,15 @@ def legislator_posts_by_month(request):
         if month:
             result[legislator_id]['monthly_post_counts'][month] = count
 
-    return JsonResponse({'legislators' : list(result.values())})
+    return _monthly_counts_response(request, result)
 
-from django.http import JsonResponse
+from .serialization import JsonResponse
 from django.db.models import Count
 from django.db.models.functions import TruncMonth
 # Ensure your models are imported
 from .models import Post, Legislator
 
+@cached_api_view
 def legislator_posts_by_month_top_50(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -112,15 +149,7 @@ def legislator_posts_by_month_top_50(request):
     posts_query = Post.objects.select_related('legislator').all() 
 
     
-    date_filters = {}
-    if start_date:
-        date_filters['created_at__gte'] = start_date
-    if end_date:
-        date_filters['created_at__lte'] = end_date
-
-    
-    if date_filters:
-        posts_query = posts_query.filter(**date_filters)
+    posts_query = posts_query.filter(date_window(start_date, end_date))
 
   
     if specific_legislator_id:
@@ -164,7 +193,7 @@ def legislator_posts_by_month_top_50(request):
                 party_counts[party] = current_party_count + 1
 
         if not legislator_ids_to_include:
-            return JsonResponse({'legislators': []})
+            return _monthly_counts_response(request, {})
 
         
         monthly_data = (
@@ -219,11 +248,12 @@ def legislator_posts_by_month_top_50(request):
             month_str = month_obj.strftime('%Y-%m')
             result[l_id]['monthly_post_counts'][month_str] = count
 
-    return JsonResponse({'legislators': list(result.values())})
+    return _monthly_counts_response(request, result)
 
 
 
 
+@cached_api_view
 def legislator_posts_line_chart(request):
     name = request.GET.get("name") 
     start_date = request.GET.get("start_date")
@@ -236,11 +266,7 @@ def legislator_posts_line_chart(request):
     if not legislator:
         return JsonResponse({"error": "Legislator not found"}, status=404)
 
-    post_filter = Q(legislator=legislator)
-    if start_date:
-        post_filter &= Q(created_at__gte=parse_date(start_date))
-    if end_date:
-        post_filter &= Q(created_at__lte=parse_date(end_date))
+    post_filter = Q(legislator=legislator) & date_window(start_date, end_date)
 
    
     grouped_data = (
@@ -274,14 +300,25 @@ def all_topics(request):
 
 
 # 🔹 Chord Diagram APIs
+NODE_FIELDS = {
+    "name": "name",
+    "state": "state",
+    "party": "party",
+    "civility": "civility_score_tw",
+    "misinfo_count": "total_misinfo_count_tw",
+    "interaction_score": "interaction_score_tw",
+}
+
+@cached_api_view
 def chord_interactions_novel(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     legislator = request.GET.get('legislator')
     interaction_type = request.GET.get('interaction_type')
 
-    interactions = LegislatorInteraction.objects.filter(date__range=[start_date, end_date])
-
+    interactions = LegislatorInteraction.objects.all()
+    if start_date and end_date:
+        interactions = interactions.filter(date_window(start_date, end_date, field="date"))
     if interaction_type:
         interactions = interactions.filter(interaction_type=interaction_type)
     if legislator:
@@ -289,51 +326,84 @@ def chord_interactions_novel(request):
             Q(source_legislator_id=legislator) | Q(target_legislator_id=legislator)
         )
 
-    # Include post and its topics
-    interactions = interactions.select_related("post").prefetch_related("post__topics")
+    # One grouped query: an edge per (source, target, type) with its count and a
+    # per-topic count from the posts' topic masks. Both legislators' attributes
+    # are grouped along, since they're fixed per id, so the node table needs no
+    # further queries.
+    bits = topic_bits()
+    topic_names = sorted(bits)
+    node_columns = [f"{end}_legislator__{field}" for end in ("source", "target") for field in NODE_FIELDS.values()]
+    edges = interactions.values(
+        "source_legislator_id", "target_legislator_id", "interaction_type", *node_columns
+    ).annotate(
+        count=Count("id"),
+        **{f"topic_{i}": Count("id", filter=Q(has_any_topic([name], bits, field="post__topic_mask")))
+           for i, name in enumerate(topic_names)},
+    ).order_by("source_legislator_id", "target_legislator_id", "interaction_type")
+
+    nodes = {}
+    edge_rows = []
+    for edge in edges:
+        for end in ("source", "target"):
+            nodes.setdefault(edge[f"{end}_legislator_id"], {
+                key: edge[f"{end}_legislator__{field}"] for key, field in NODE_FIELDS.items()
+            })
+        edge_rows.append((
+            edge["source_legislator_id"], edge["target_legislator_id"], edge["interaction_type"], edge["count"],
+            [edge[f"topic_{i}"] for i in range(len(topic_names))],
+        ))
+
+    if request.GET.get("format") == "columnar":
+        # Legislators once in a node table; edges refer to them by row index.
+        node_ids = sorted(nodes)
+        index = {legislator_id: i for i, legislator_id in enumerate(node_ids)}
+        return JsonResponse({
+            "nodes": {
+                "legislator_id": node_ids,
+                **{key: [nodes[legislator_id][key] for legislator_id in node_ids] for key in NODE_FIELDS},
+            },
+            "topics": topic_names,
+            "edges": {
+                "source": [index[row[0]] for row in edge_rows],
+                "target": [index[row[1]] for row in edge_rows],
+                "interaction_type": [row[2] for row in edge_rows],
+                "count": [row[3] for row in edge_rows],
+                "topic_counts": [row[4] for row in edge_rows],
+            },
+        })
 
+    # Row layout read by the chord and geography components.
     interaction_counts = []
-
-    for interaction in interactions:
-        topics = [topic.name for topic in interaction.post.topics.all()]
+    for source_id, target_id, kind, count, topic_counts in edge_rows:
+        source, target = nodes[source_id], nodes[target_id]
         interaction_counts.append({
-            "source_legislator_id": interaction.source_legislator_id,
-            "target_legislator_id": interaction.target_legislator_id,
-            "count": 1,  # or aggregate counts manually if needed
-            "source_name": interaction.source_legislator.name,
-            "target_name": interaction.target_legislator.name,
-            "source_state": interaction.source_legislator.state,
-            "target_state": interaction.target_legislator.state,
-            "source_party": interaction.source_legislator.party,
-            "target_party": interaction.target_legislator.party,
-            "source_civility": interaction.source_legislator.civility_score_tw,
-            "target_civility": interaction.target_legislator.civility_score_tw,
-            "source_misinfo_count": interaction.source_legislator.total_misinfo_count_tw,
-            "target_misinfo_count": interaction.target_legislator.total_misinfo_count_tw,
-            "source_interaction_score": interaction.source_legislator.interaction_score_tw,
-            "target_interaction_score": interaction.target_legislator.interaction_score_tw,
-            "topics": topics  # ← added here
+            "source_legislator_id": source_id,
+            "target_legislator_id": target_id,
+            "interaction_type": kind,
+            "count": count,
+            **{f"source_{key}": source[key] for key in NODE_FIELDS},
+            **{f"target_{key}": target[key] for key in NODE_FIELDS},
+            "topics": [name for name, n in zip(topic_names, topic_counts) if n],
+            "topic_counts": {name: n for name, n in zip(topic_names, topic_counts) if n},
         })
 
     return JsonResponse(interaction_counts, safe=False)
 
-def chord_top_legislators_novel(request):
+@cached_api_view
+async def chord_top_legislators_novel(request):
     interactions = LegislatorInteraction.objects.values("source_legislator_id").annotate(total_interactions=Count("post_id"))
-    return JsonResponse(list(interactions), safe=False)
+    return JsonResponse([row async for row in interactions], safe=False)
 
 
-def chord_interactions(request):
-    file_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'defaultInteractionNetwork.json')
-    
+async def chord_interactions(request):
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'defaultInteractionNetwork.json')
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
 
 # 🔹 Geographic Data API
+@cached_api_view
 def geo_activity(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -357,6 +427,7 @@ METRIC_FILE_MAP = {
 }
 DATA_DIR = os.path.join(settings.BASE_DIR, "static", "data")
 
+@cached_api_view
 def geo_activity_topics(request):
     metric     = request.GET.get("metric", "posts")
     start_date = request.GET.get("start_date")
@@ -372,13 +443,14 @@ def geo_activity_topics(request):
     )
 
     if use_static:
-        data_file = os.path.join(DATA_DIR, METRIC_FILE_MAP[metric])
         try:
-            with open(data_file, "r") as f:
-                all_states = json.load(f)
+            if not topics:
+                # If no topic-filtering, send the file as stored
+                return static_json_response(request, METRIC_FILE_MAP[metric])
+            all_states = get_payload(METRIC_FILE_MAP[metric]).data
         except FileNotFoundError:
             return JsonResponse({"error": "Precomputed data not found."}, status=404)
-    
+
 
         if topics:
             filtered_states = []
@@ -404,31 +476,40 @@ def geo_activity_topics(request):
 
             return JsonResponse(filtered_states, safe=False)
 
-        # If no topic-filtering, send everything
-        return JsonResponse(all_states, safe=False)
+    return geo_activity_from_db(metric, start_date, end_date, topics)
 
 
-    from civicwatch.models import Post
+def geo_activity_from_db(metric, start_date, end_date, topics):
+    """geo_activity_topics computed from the database, bypassing the static files."""
+    frame = analytics.current_frame()
+    if frame is not None:
+        base_data, topic_data = frame.geo_rows(metric, start_date, end_date, topics)
+        return _geo_response(metric, base_data, topic_data)
+    if rollups.rollups_enabled(None, start_date, end_date):
+        base_data, topic_data = rollups.geo_rows(metric, start_date, end_date, topics)
+        return _geo_response(metric, base_data, topic_data)
 
-    posts_qs = Post.objects.all()
+    from civicwatch.models import Post
 
-    if start_date:
-        posts_qs = posts_qs.filter(created_at__gte=start_date)
-    if end_date:
-        posts_qs = posts_qs.filter(created_at__lte=end_date)
+    posts_qs = Post.objects.filter(date_window(start_date, end_date))
 
     if topics:
-        posts_qs = posts_qs.filter(topics__name__in=topics).distinct()
-
-    state_party_data = {}
+        posts_qs = posts_qs.filter(has_any_topic(topics))
 
     if metric == "posts":
-        base_data  = posts_qs.values("state", "party").annotate(total=Count("post_id"))
-        topic_data = posts_qs.values("state", "party", "topics__name").annotate(total=Count("post_id"))
+        base_data, topic_data = run_parallel(
+            lambda: list(posts_qs.values("state", "party").annotate(total=Count("post_id"))),
+            lambda: per_topic_rows(posts_qs, ["state", "party"], {"total": (Count, "post_id")}, topics=topics),
+        )
 
     elif metric == "legislators":
 
-        base_legislators = posts_qs.values("state", "party", "legislator_id").distinct()
+        # Topic‐wise unique legislators
+        topic_posts = posts_qs.filter(topics__name__in=topics) if topics else posts_qs
+        base_legislators, topic_legislators = run_parallel(
+            lambda: list(posts_qs.values("state", "party", "legislator_id").distinct()),
+            lambda: list(topic_posts.values("state", "party", "topics__name", "legislator_id").distinct()),
+        )
         base_data_list = []
         tmp_dict = {}
         for entry in base_legislators:
@@ -439,8 +520,6 @@ def geo_activity_topics(request):
             for ((s, p), legislators) in tmp_dict.items()
         ]
 
-        # Topic‐wise unique legislators
-        topic_legislators = posts_qs.values("state", "party", "topics__name", "legislator_id").distinct()
         tmp_topic = {}
         for entry in topic_legislators:
             key = (entry["state"], entry["party"], entry["topics__name"])
@@ -454,15 +533,23 @@ def geo_activity_topics(request):
         # Sum of like_count + retweet_count per (state, party) and per (state, party, topic)
         filtered_posts = posts_qs 
 
-        base_data = filtered_posts.values("state", "party").annotate(
-            total=Sum(F("like_count") + F("retweet_count"))
-        )
-        topic_data = filtered_posts.values("state", "party", "topics__name").annotate(
-            total=Sum(F("like_count") + F("retweet_count"))
+        base_data, topic_data = run_parallel(
+            lambda: list(filtered_posts.values("state", "party").annotate(
+                total=Sum(F("like_count") + F("retweet_count"))
+            )),
+            lambda: per_topic_rows(
+                filtered_posts, ["state", "party"], {"total": (Sum, F("like_count") + F("retweet_count"))}, topics=topics
+            ),
         )
     else:
         return JsonResponse({"error": "Unsupported metric."}, status=400)
 
+    return _geo_response(metric, base_data, topic_data)
+
+
+def _geo_response(metric, base_data, topic_data):
+    state_party_data = {}
+
     for entry in base_data:
         state = entry["state"]
         party = entry["party"]
@@ -520,16 +607,186 @@ def geo_activity_topics(request):
 
 
 
+@cached_api_view
+def similar_posts(request):
+    from . import vector_index
+
+    post_id = request.GET.get("post_id")
+    query = request.GET.get("q")
+    try:
+        k = min(int(request.GET.get("k", 20)), 200)
+    except ValueError:
+        return JsonResponse({"error": "k must be an integer."}, status=400)
+    if k < 1:
+        return JsonResponse({"error": "k must be at least 1."}, status=400)
+
+    index = vector_index.get_index()
+    if index is None:
+        return JsonResponse({"error": "Vector index not built. Run manage.py build_vector_index."}, status=503)
+
+    if post_id:
+        vector = vector_index.query_vector_for_post(post_id)
+        if vector is None:
+            return JsonResponse({"error": "Post has no stored embedding."}, status=404)
+    elif query:
+        try:
+            vector = vector_index.query_vector_for_text(query)
+        except ImportError:
+            return JsonResponse({"error": "Text queries need sentence-transformers installed."}, status=501)
+    else:
+        return JsonResponse({"error": "Provide either 'post_id' or 'q'."}, status=400)
+
+    start_date = request.GET.get("start_date")
+    end_date = request.GET.get("end_date")
+    party = request.GET.get("party")
+    topics_param = request.GET.get("topics", "")
+    topic_list = [topic.strip() for topic in topics_param.split(",")] if topics_param else []
+
+    posts_filter = date_window(start_date, end_date)
+    if party:
+        posts_filter &= Q(party=party)
+    if topic_list:
+        posts_filter &= has_any_topic(topic_list)
+
+    # Filters are applied to the nearest candidates; widen the search (more
+    # clusters and more candidates) until enough of them survive or every
+    # indexed post has been considered.
+    fields = ("post_id", "name", "party", "state", "text", "created_at", "like_count", "retweet_count",
+              "civility_score", "count_misinfo", "pca_x", "pca_y")
+    nprobe, candidates = 8, k * 10 + 1
+    while True:
+        hits = [(pid, score) for pid, score in index.search(vector, candidates, nprobe) if pid != post_id]
+        posts = {p["post_id"]: p for p in Post.objects.filter(posts_filter, post_id__in=[pid for pid, _ in hits]).values(*fields)}
+        matches = [dict(posts[pid], similarity=score) for pid, score in hits if pid in posts][:k]
+        if len(matches) >= k or (nprobe >= len(index.centroids) and candidates >= len(index.ids)):
+            break
+        nprobe *= 4
+        candidates *= 4
+
+    return JsonResponse(matches, safe=False)
+
+
+SEMANTIC_FIELDS = [
+    "post_id", "name", "party", "text", "created_at", "like_count", "retweet_count",
+    "civility_score", "count_misinfo", "pca_x", "pca_y", "topics",
+]
+SEMANTIC_PAGE_SIZE = 1000
+SEMANTIC_MAX_PAGE_SIZE = 10000
+
+
+def _encode_cursor(created_at, post_id):
+    payload = json.dumps([created_at.isoformat(), post_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    created_at = datetime.fromisoformat(created_at)
+    if not isinstance(post_id, str):
+        raise ValueError("post_id must be a string")
+    return created_at, post_id
+
+
+@cached_api_view
 def post_semantic_similarity(request):
     posts_query = filter_posts(request)
-    posts_list = posts_query.values("post_id", "topics__name", "name", "party", "text", "created_at", "like_count", "retweet_count", "civility_score", "count_misinfo", "pca_x", "pca_y")
-    return JsonResponse(list(posts_list), safe=False)
+    paginated = any(param in request.GET for param in ("limit", "cursor", "fields", "post_ids"))
+    if not paginated:
+        # Original flat layout: one row per (post, topic).
+        columns = ("post_id", "topics__name", "name", "party", "text", "created_at", "like_count", "retweet_count", "civility_score", "count_misinfo", "pca_x", "pca_y")
+        if request.GET.get('format') == 'rows':
+            # Same rows as arrays under one field list, encoded from the query's tuples.
+            return JsonResponse(rows_payload(columns, posts_query.values_list(*columns)))
+        if request.GET.get('format') in COLUMNAR_FORMATS:
+            return columnar_response(
+                request, columns_from_rows(columns, posts_query.values_list(*columns)),
+                dictionary={"topics__name", "name", "party"},
+            )
+        return JsonResponse(list(posts_query.values(*columns)), safe=False)
+
+    # Paged layout: one row per post with its topics as a list, only the
+    # requested fields, and a keyset cursor on (created_at, post_id). The scatter
+    # asks for fields=post_id,pca_x,pca_y,party,topics and fetches text for
+    # hovered points with post_ids=...&fields=post_id,text.
+    fields = [field for field in request.GET.get('fields', ','.join(SEMANTIC_FIELDS)).split(',') if field]
+    unknown = [field for field in fields if field not in SEMANTIC_FIELDS]
+    if unknown:
+        return JsonResponse({"error": f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(SEMANTIC_FIELDS)}."}, status=400)
+    try:
+        limit = min(int(request.GET.get('limit', SEMANTIC_PAGE_SIZE)), SEMANTIC_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "limit must be a positive integer."}, status=400)
+
+    from .exports import after_keys, post_topics
+
+    keys = ("created_at", "post_id")
+    if request.GET.get('post_ids'):
+        posts_query = posts_query.filter(post_id__in=request.GET['post_ids'].split(','))
+    if request.GET.get('cursor'):
+        try:
+            last = _decode_cursor(request.GET['cursor'])
+        except (ValueError, TypeError, binascii.Error):
+            return JsonResponse({"error": "Invalid cursor."}, status=400)
+        posts_query = posts_query.filter(after_keys(keys, last))
+
+    columns = list(dict.fromkeys([*keys, *(field for field in fields if field != "topics")]))
+    rows = list(posts_query.order_by(*keys).values(*columns)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["post_id"])
+
+    topics = post_topics([row["post_id"] for row in rows]) if "topics" in fields else {}
+    if request.GET.get('format') in COLUMNAR_FORMATS:
+        columns = {
+            field: [topics.get(row["post_id"], []) for row in rows] if field == "topics" else [row[field] for row in rows]
+            for field in fields
+        }
+        return columnar_response(request, columns, dictionary={"name", "party"}, next_cursor=next_cursor)
+
+    results = []
+    for row in rows:
+        if "topics" in fields:
+            row["topics"] = topics.get(row["post_id"], [])
+        results.append({field: row[field] for field in fields})
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
 
 
-from django.http import JsonResponse
+@cached_api_view
+def semantic_viewport(request):
+    """
+    Scatter contents for a PCA bounding box (x0, x1, y0, y1) at a zoom level:
+    per-party counts on a tile grid while the box holds many posts, the posts
+    themselves once it holds few. Accepts the usual post filters.
+    """
+    import math
+
+    from . import spatial
+
+    extent = spatial.pca_extent()
+    try:
+        bbox = tuple(float(request.GET.get(name, default)) for name, default in zip(("x0", "x1", "y0", "y1"), extent))
+        zoom = int(request.GET.get('zoom', 0))
+        limit = min(int(request.GET.get('limit', spatial.POINT_LIMIT)), spatial.POINT_LIMIT)
+    except ValueError:
+        return JsonResponse({"error": "x0, x1, y0, y1 must be numbers and zoom, limit integers."}, status=400)
+    if not all(math.isfinite(value) for value in bbox):
+        return JsonResponse({"error": "x0, x1, y0, y1 must be finite numbers."}, status=400)
+    if bbox[0] > bbox[1] or bbox[2] > bbox[3]:
+        return JsonResponse({"error": "Bounding box needs x0 <= x1 and y0 <= y1."}, status=400)
+    if not 0 <= zoom <= spatial.MAX_LEVEL:
+        return JsonResponse({"error": f"zoom must be between 0 and {spatial.MAX_LEVEL}."}, status=400)
+
+    return JsonResponse(spatial.viewport(filter_posts(request), bbox, zoom, max(limit, 0)))
+
+
+from .serialization import JsonResponse
 from .models import Post  # Adjust to your actual model
 
-def default_semantic_similarity_data(request):
+@cached_api_view
+async def default_semantic_similarity_data(request):
  
     republican_posts = Post.objects.filter(party="Republican").values(
         "post_id", "topics__name", "name", "party", "text",
@@ -545,45 +802,34 @@ def default_semantic_similarity_data(request):
     ).order_by("-like_count")[:100]
 
 
-    combined_posts = list(republican_posts) + list(democrat_posts)
-
-    print(str(combined_posts))
+    combined_posts = [post async for post in republican_posts] + [post async for post in democrat_posts]
 
     return JsonResponse(combined_posts, safe=False)
 
 
 
+@cached_api_view
 def legislators_scatter_data(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
 
-    posts_filter = Q()
-    if start_date:
-        start_date = parse_date(start_date)
-        posts_filter &= Q(tweets__created_at__gte=start_date)
-    if end_date:
-        end_date = parse_date(end_date)
-        posts_filter &= Q(tweets__created_at__lte=end_date)
+    posts_filter = date_window(start_date, end_date, field="tweets__created_at")
 
-    topic_keywords = ["abortion", "blacklivesmatter", "capitol", "climate", "covid", "gun", "immigra", "rights"]
+    topic_keywords = TOPIC_KEYWORDS
 
-    # Build dynamic Case/When expressions for topic counts
-    topic_annotations = {
-        f"{topic}_count": Count(
-            Case(
-                When(tweets__text__icontains=topic, then=1),
-                output_field=IntegerField()
-            )
-        )
-        for topic in topic_keywords
-    }
+    # Per-topic post counts per legislator, each answered from the keyword index
+    date_filter = date_window(start_date, end_date)
+    topic_counts = defaultdict(dict)
+    for topic in topic_keywords:
+        counts = Post.objects.filter(date_filter).filter(text_contains(topic)).values("legislator_id").annotate(n=Count("post_id"))
+        for row in counts:
+            topic_counts[row["legislator_id"]][topic] = row["n"]
 
     legislators = Legislator.objects.annotate(
         total_posts_tw_count=Count("tweets", filter=posts_filter, distinct=True),
         total_likes_tw_count=Sum("tweets__like_count", filter=posts_filter),
         total_retweets_tw_count=Sum("tweets__retweet_count", filter=posts_filter),
         total_misinfo_count_tw_count=Sum("tweets__count_misinfo", filter=posts_filter),
-        **topic_annotations
     ).filter(posts_filter).distinct()
 
     data = []
@@ -602,12 +848,13 @@ def legislators_scatter_data(request):
             "interaction_score_tw": leg.interaction_score_tw,
             "overperforming_score_tw": leg.overperforming_score_tw,
             "civility_score_tw": leg.civility_score_tw,
-            **{topic: getattr(leg, f"{topic}_count", 0) for topic in topic_keywords}
+            **{topic: topic_counts[leg.legislator_id].get(topic, 0) for topic in topic_keywords}
         })
 
     return JsonResponse(data, safe=False)
 
 
+@cached_api_view
 def bipartite_flow_data(request):
     print("Starting bipartite_flow_data function")
     
@@ -615,70 +862,45 @@ def bipartite_flow_data(request):
     end_date = request.GET.get('end_date')
 
     # Build the filter condition
-    posts_filter = Q()
     if start_date and end_date:
         start_date = parse_date(start_date)
         end_date = parse_date(end_date)
-        posts_filter = Q(created_at__range=(start_date, end_date))
         print(f"Received date range: {start_date} to {end_date}")
     else:
+        start_date = end_date = None
         print("No date range provided, querying all posts")
+    posts_filter = date_window(start_date, end_date)
 
     print(f"Built posts filter: {posts_filter}")
 
-    # Query posts and group by date, topic, and party
+    if rollups.rollups_enabled(None, start_date, end_date):
+        cells = rollups.bipartite_rows(start_date, end_date)
+        response_data = {}
+        for (date, topic, party), cell in cells.items():
+            response_data.setdefault(date, {}).setdefault(topic, {})[party] = cell
+        response_list = [{'date': date, **topics} for date, topics in response_data.items()]
+        return JsonResponse(response_list, safe=False)
+
+    # Query posts and group by date, topic, and party; distinct legislators
+    # are counted in the same grouped query.
     print("Querying posts data...")
-    posts = Post.objects.filter(posts_filter).values('created_at__date', 'topics__name', 'legislator__party').annotate(
+    posts = Post.objects.filter(posts_filter).values('created_at__date', 'topics__name', 'party').annotate(
         post_count=Count('post_id'),
+        legislator_count=Count('legislator_id', distinct=True),
         total_likes=Sum('like_count'),
         total_shares=Sum('retweet_count')
-    )
-    print(f"Found {len(posts)} post records")
+    ).order_by()
 
     # Prepare the response data
     print("Building response data structure...")
     response_data = {}
-    # Insert empty data for January 1st, 2020
-    # empty_date = "2020-01-01"
-    # response_data[empty_date] = {}
-    # for topic in ['abortion', 'blacklivesmatter', 'climate', 'gun', 'immigra', 'rights']:
-    #     response_data[empty_date][topic] = {
-    #         'D': {'posts': 0, 'legislators': set(), 'likes': 0, 'shares': 0},
-    #         'R': {'posts': 0, 'legislators': set(), 'likes': 0, 'shares': 0}
-    #     }
     for post in posts:
-        date = post['created_at__date']
-        topic = post['topics__name']
-        party = post['legislator__party']
-        if date not in response_data:
-            response_data[date] = {}
-        if topic not in response_data[date]:
-            response_data[date][topic] = {}
-        if party not in response_data[date][topic]:
-            response_data[date][topic][party] = {
-                'posts': 0,
-                'legislators': set(),
-                'likes': 0,
-                'shares': 0
-            }
-        response_data[date][topic][party]['posts'] += post['post_count']
-        response_data[date][topic][party]['likes'] += post['total_likes']
-        response_data[date][topic][party]['shares'] += post['total_shares']
-
-    # Query legislators and add to the response data
-    print("Querying legislator data...")
-    for post in Post.objects.filter(posts_filter).select_related('legislator').values('created_at__date', 'topics__name', 'legislator_id', 'legislator__party'):
-        date = post['created_at__date']
-        topic = post['topics__name']
-        party = post['legislator__party']
-        if date in response_data and topic in response_data[date] and party in response_data[date][topic]:
-            response_data[date][topic][party]['legislators'].add(post['legislator_id'])
-
-    # Convert sets to counts
-    for date in response_data:
-        for topic in response_data[date]:
-            for party in response_data[date][topic]:
-                response_data[date][topic][party]['legislators'] = len(response_data[date][topic][party]['legislators'])
+        response_data.setdefault(post['created_at__date'], {}).setdefault(post['topics__name'], {})[post['party']] = {
+            'posts': post['post_count'],
+            'legislators': post['legislator_count'],
+            'likes': post['total_likes'],
+            'shares': post['total_shares'],
+        }
 
     # Convert response_data to a list of dictionaries
     print("Converting response data to list format...")
@@ -689,7 +911,8 @@ def bipartite_flow_data(request):
     return JsonResponse(response_list, safe=False)
 
 # 🔹 Testing/Debug APIs
-def topic_post_counts(request):
+@cached_api_view
+async def topic_post_counts(request):
     # Get all topics and count their associated posts
     topic_counts = Topic.objects.values('name').annotate(
         post_count=Count('post')
@@ -697,137 +920,135 @@ def topic_post_counts(request):
     
     # Format the results
     results = {
-        'total_topics': Topic.objects.count(),
-        'total_posts': Post.objects.count(),
-        'topic_counts': list(topic_counts)
+        'total_topics': await Topic.objects.acount(),
+        'total_posts': await Post.objects.acount(),
+        'topic_counts': [row async for row in topic_counts]
     }
     
     return JsonResponse(results, safe=False)
 
+STATISTICS_START = date(2020, 1, 1)
+STATISTICS_END = date(2021, 12, 31)
+# The response holds a cell per day x party x topic, so the span is bounded.
+STATISTICS_MAX_DAYS = 3 * 366
+
+@cached_api_view
 def post_statistics(request):
-    # Step 1: Get all relevant topics and parties from existing posts
-    topic_names = Topic.objects.exclude(name__isnull=True).values_list('name', flat=True).distinct()
-    party_values = Post.objects.exclude(party__isnull=True).values_list('party', flat=True).distinct()
-
-    # Step 2: Build the full date range
-    start_date = date(2020, 1, 1)
-    end_date = date(2021, 12, 31)
-    all_dates = []
-    current = start_date
-    while current <= end_date:
-        all_dates.append(current.strftime('%Y-%m-%d'))
-        current += timedelta(days=1)
+    import numpy as np
+
+    # Step 1: The date range comes from the request (2020-2021 by default)
+    start_date = parse_date(request.GET.get('start_date', '')) or STATISTICS_START
+    end_date = parse_date(request.GET.get('end_date', '')) or STATISTICS_END
+    if end_date < start_date:
+        return JsonResponse({"error": "end_date is before start_date."}, status=400)
+    if (end_date - start_date).days + 1 > STATISTICS_MAX_DAYS:
+        return JsonResponse({"error": f"The date range can span at most {STATISTICS_MAX_DAYS} days."}, status=400)
+
+    # Step 2: Get all relevant topics and parties from existing posts
+    topic_names = sorted(Topic.objects.exclude(name__isnull=True).values_list('name', flat=True).distinct())
+    party_values = list(Post.objects.exclude(party__isnull=True).values_list('party', flat=True).distinct())
 
     # Step 3: Fetch post stats (only actual data)
-    posts = (
-        Post.objects
-        .filter(topics__isnull=False)
-        .annotate(date=TruncDate('created_at'))
-        .values('date', 'party', 'topics__name')
-        .annotate(
-            avg_misinfo=Avg('count_misinfo'),
-            avg_civility=Avg('civility_score'),
+    if rollups.rollups_enabled(None, start_date, end_date):
+        posts = rollups.post_statistics_rows(start_date, end_date)
+    else:
+        posts = (
+            Post.objects
+            .filter(date_window(start_date, end_date), topics__isnull=False)
+            .annotate(date=TruncDate('created_at'))
+            .values('date', 'party', 'topics__name')
+            .annotate(
+                avg_misinfo=Avg('count_misinfo'),
+                avg_civility=Avg('civility_score'),
+            )
         )
-    )
 
-    # Step 4: Restructure aggregated data
-    data_map = {}
-    for entry in posts:
-        key = (
-            entry['date'].strftime('%Y-%m-%d'),
-            entry['party'],
-            entry['topics__name']
+    # Step 4: Scatter the rows into dense days x parties x topics arrays;
+    # cells without posts stay zero and are left out of the "all" average
+    days = (end_date - start_date).days + 1
+    shape = (days, len(party_values), len(topic_names))
+    misinfo = np.zeros(shape)
+    civility = np.zeros(shape)
+    present = np.zeros(shape, dtype=bool)
+
+    party_index = {party: i for i, party in enumerate(party_values)}
+    topic_index = {topic: i for i, topic in enumerate(topic_names)}
+    rows = [
+        (
+            (entry['date'] - start_date).days, party_index[entry['party']], topic_index[entry['topics__name']],
+            entry['avg_misinfo'] or 0, entry['avg_civility'] or 0,
         )
-        avg_misinfo = -entry['avg_misinfo'] if entry['party'] in ['R', 'Republican'] else entry['avg_misinfo']
-        data_map[key] = {
-            'avg_misinfo': avg_misinfo,
-            'avg_civility': entry['avg_civility'],
+        for entry in posts
+        if entry['party'] in party_index and entry['topics__name'] in topic_index
+    ]
+    # Republican misinformation is plotted below the axis
+    sign = np.array([-1.0 if party in ['R', 'Republican'] else 1.0 for party in party_values])
+    if rows:
+        d, p, t, row_misinfo, row_civility = (np.array(column) for column in zip(*rows))
+        misinfo[d, p, t] = row_misinfo * sign[p]
+        civility[d, p, t] = row_civility
+        present[d, p, t] = True
+
+    # Step 5: Averages for the "all" topic, over the topics with data
+    topic_count = present.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        all_misinfo = np.where(topic_count > 0, misinfo.sum(axis=2) / topic_count, 0.0)
+        all_civility = np.where(topic_count > 0, civility.sum(axis=2) / topic_count, 0.0)
+
+    # Step 6: Serialize straight from the arrays
+    day_labels = np.datetime_as_string(np.datetime64(start_date) + np.arange(days)).tolist()
+    misinfo, civility = misinfo.tolist(), civility.tolist()
+    all_misinfo, all_civility = all_misinfo.tolist(), all_civility.tolist()
+    response_data = {
+        day: {
+            party: {
+                **{
+                    topic: {'avg_misinfo': misinfo[d][p][t], 'avg_civility': civility[d][p][t]}
+                    for t, topic in enumerate(topic_names)
+                },
+                'all': {'avg_misinfo': all_misinfo[d][p], 'avg_civility': all_civility[d][p]},
+            }
+            for p, party in enumerate(party_values)
         }
-
-    # Step 5: Build full response with empty defaults where needed
-    response_data = {}
-    for day in all_dates:
-        response_data[day] = {}
-        for party in party_values:
-            response_data[day][party] = {}
-            all_metrics = {'avg_misinfo': 0, 'avg_civility': 0}
-            topic_count = 0
-            for topic in topic_names:
-                key = (day, party, topic)
-                if key in data_map:
-                    response_data[day][party][topic] = data_map[key]
-                    all_metrics['avg_misinfo'] += data_map[key]['avg_misinfo']
-                    all_metrics['avg_civility'] += data_map[key]['avg_civility']
-                    topic_count += 1
-                else:
-                    response_data[day][party][topic] = {
-                        'avg_misinfo': 0,
-                        'avg_civility': 0,
-                    }
-            # Calculate averages for the "all" topic
-            if topic_count > 0:
-                response_data[day][party]['all'] = {
-                    'avg_misinfo': all_metrics['avg_misinfo'] / topic_count,
-                    'avg_civility': all_metrics['avg_civility'] / topic_count,
-                }
-            else:
-                response_data[day][party]['all'] = {
-                    'avg_misinfo': 0,
-                    'avg_civility': 0,
-                }
+        for d, day in enumerate(day_labels)
+    }
 
     return JsonResponse(response_data, safe=False)
 
+@cached_api_view
 def overview_metrics(request):
-    # Use the filter_posts function to get the filtered posts
-    filtered_posts = filter_posts(request).select_related('legislator').distinct()
-
-    # Calculate basic summary metrics by party
-    summary_metrics = filtered_posts.values('party').annotate(
+    # One grouped pass over the filtered posts, one row per legislator (a few
+    # hundred rows); party totals, distinct legislators and the most active
+    # state are folded together from those rows.
+    rows = filter_posts(request).values('party', 'state', 'legislator_id').annotate(
         total_posts=Count('post_id'),
-        avg_interaction_score=Avg('interaction_score'),
+        interaction_sum=Sum('interaction_score'),
+        interaction_count=Count('interaction_score'),
         total_likes=Sum('like_count'),
-        total_retweets=Sum('retweet_count')
-    ).order_by('party')
+        total_retweets=Sum('retweet_count'),
+        uncivil_posts=Count('post_id', filter=Q(civility_score__lt=1)),
+        misinfo_posts=Count('post_id', filter=Q(count_misinfo__gt=0)),
+    ).order_by()
+
+    totals = {}
+    for row in rows:
+        party = totals.setdefault(row['party'], {
+            'posts': 0, 'interaction_sum': 0, 'interaction_count': 0, 'likes': 0, 'retweets': 0,
+            'uncivil': 0, 'misinfo': 0, 'legislators': set(), 'states': {},
+        })
+        party['posts'] += row['total_posts']
+        party['interaction_sum'] += row['interaction_sum'] or 0
+        party['interaction_count'] += row['interaction_count']
+        party['likes'] += row['total_likes'] or 0
+        party['retweets'] += row['total_retweets'] or 0
+        party['uncivil'] += row['uncivil_posts']
+        party['misinfo'] += row['misinfo_posts']
+        party['legislators'].add(row['legislator_id'])
+        party['states'][row['state']] = party['states'].get(row['state'], 0) + row['total_posts']
 
-    # Structure basic summary metrics in a dictionary keyed by party
     summary_metrics_dict = {}
-    for item in summary_metrics:
-        if item['party'] in ['Democratic', 'Republican']:
-            summary_metrics_dict[item['party']] = {
-                "totalPosts": item['total_posts'],
-                "avgInteractionScore": item['avg_interaction_score'],
-                "totalLikes": item['total_likes'],
-                "totalRetweets": item['total_retweets']
-            }
-
-    # Compute extended metrics for each party
     for party in ['Democratic', 'Republican']:
-        # Filter posts further by party
-        party_posts = filtered_posts.filter(party=party)
-
-        # 1. Number of Legislators: distinct legislator_id
-        num_legislators = party_posts.values('legislator__legislator_id').distinct().count()
-
-        # 2. Number of Uncivil Posts: assume uncivil if civility_score < 1 (adjust threshold if needed)
-        num_uncivil_posts = party_posts.filter(civility_score__lt=1).count()
-
-        # 3. Number of Misinformative Posts: assume misinformative if count_misinfo > 0
-        num_misinfo_posts = party_posts.filter(count_misinfo__gt=0).count()
-
-        # 4. Most Active State: group by state, then pick the one with the largest post count
-        most_active_state_obj = party_posts.values('state').annotate(post_count=Count('post_id')).order_by('-post_count').first()
-        most_active_state = most_active_state_obj['state'] if most_active_state_obj else None
-
-        # Add these to the summary for the party
-        if party in summary_metrics_dict:
-            summary_metrics_dict[party].update({
-                "numberLegislators": num_legislators,
-                "numUncivilPosts": num_uncivil_posts,
-                "numMisinfoPosts": num_misinfo_posts,
-                "mostActiveState": most_active_state
-            })
-        else:
+        if party not in totals:
             # In case there are no posts for a given party, add default values
             summary_metrics_dict[party] = {
                 "totalPosts": 0,
@@ -839,6 +1060,20 @@ def overview_metrics(request):
                 "numMisinfoPosts": 0,
                 "mostActiveState": None
             }
+            continue
+
+        t = totals[party]
+        summary_metrics_dict[party] = {
+            "totalPosts": t['posts'],
+            "avgInteractionScore": t['interaction_sum'] / t['interaction_count'] if t['interaction_count'] else None,
+            "totalLikes": t['likes'],
+            "totalRetweets": t['retweets'],
+            "numberLegislators": len(t['legislators']),
+            # uncivil if civility_score < 1, misinformative if count_misinfo > 0
+            "numUncivilPosts": t['uncivil'],
+            "numMisinfoPosts": t['misinfo'],
+            "mostActiveState": max(t['states'], key=t['states'].get),
+        }
 
     # Compile the final response data
     response_data = {
@@ -847,48 +1082,42 @@ def overview_metrics(request):
 
     return JsonResponse(response_data)
 
-def bipartite_data(request):
-    file_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'defaultBipartite.json')
-    
+async def bipartite_data(request):
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'defaultBipartite.json')
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
-def accountability_data(request):
-    file_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'defaultAccountability.json')
-    
+async def accountability_data(request):
     try:
-        with open(file_path, 'r') as f:
-            raw_data = json.load(f)
-        return JsonResponse(raw_data, safe=False)
+        return await astatic_json_response(request, 'defaultAccountability.json')
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+@cached_api_view
 def accountability_interface(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     topics_param = request.GET.get('topics', '')
     topic_list = [topic.strip() for topic in topics_param.split(',')] if topics_param else []
 
-    posts = Post.objects.all()
-
-    if start_date:
-        posts = posts.filter(created_at__gte=start_date)
-    if end_date:
-        posts = posts.filter(created_at__lte=end_date)
-    if topic_list:
-        posts = posts.filter(topics__name__in=topic_list).distinct()
-
-    # Group by party and calculate counts
-    party_data = posts.values('party').annotate(
-        civil_count=Count('post_id', filter=Q(civility_score=1)),
-        uncivil_count=Count('post_id', filter=~Q(civility_score=1)),
-        misinformative_count=Count('post_id', filter=~Q(count_misinfo=0)),
-        informative_count=Count('post_id', filter=Q(count_misinfo=0))
-    )
+    frame = analytics.current_frame()
+    if frame is not None:
+        party_data = frame.accountability_rows(start_date, end_date, topic_list)
+    elif rollups.rollups_enabled(None, start_date, end_date):
+        party_data = rollups.accountability_rows(start_date, end_date, topic_list)
+    else:
+        posts = Post.objects.filter(date_window(start_date, end_date))
+        if topic_list:
+            posts = posts.filter(has_any_topic(topic_list))
+
+        # Group by party and calculate counts
+        party_data = posts.values('party').annotate(
+            civil_count=Count('post_id', filter=Q(civility_score=1)),
+            uncivil_count=Count('post_id', filter=~Q(civility_score=1)),
+            misinformative_count=Count('post_id', filter=~Q(count_misinfo=0)),
+            informative_count=Count('post_id', filter=Q(count_misinfo=0))
+        )
 
     # Prepare data for response
     data = {
@@ -907,6 +1136,7 @@ def accountability_interface(request):
 
     return JsonResponse(data)
 
+@cached_api_view
 def trend_data(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -918,29 +1148,41 @@ def trend_data(request):
     if start_date and end_date:
         start_date_obj = parse_date(start_date)
         end_date_obj = parse_date(end_date)
-        filters &= Q(created_at__range=[start_date_obj, end_date_obj])
+        filters &= date_window(start_date_obj, end_date_obj)
     
     if topics:
-        filters &= Q(topics__name__in=topics)
-    
-    filtered_posts = Post.objects.filter(filters).select_related('legislator').distinct()
+        filters &= has_any_topic(topics)
     
     # Determine binning by week or day
     date_diff = (end_date_obj - start_date_obj).days
-    if date_diff > 365:
-        date_trunc = TruncWeek('created_at')
+
+    frame = analytics.current_frame()
+    if frame is not None:
+        trend_data = frame.trend_rows(start_date_obj, end_date_obj, topics, weekly=date_diff > 365)
+    elif rollups.rollups_enabled(None, start_date_obj, end_date_obj):
+        trend_data = rollups.trend_rows(start_date_obj, end_date_obj, topics, weekly=date_diff > 365)
     else:
-        date_trunc = TruncDay('created_at')
-    
-    trend_data = filtered_posts.annotate(date=date_trunc).values('date', 'party').annotate(
-        total_posts=Count('post_id'),
-        avg_engagement_per_post=Case(
-            When(total_posts=0, then=0),
-            default=(Sum('like_count') + Sum('retweet_count')) / Count('post_id'),
-            output_field=IntegerField()
-        )
-    ).order_by('date', 'party')
+        filtered_posts = Post.objects.filter(filters)
+
+        if date_diff > 365:
+            date_trunc = TruncWeek('created_at')
+        else:
+            date_trunc = TruncDay('created_at')
+
+        trend_data = filtered_posts.annotate(date=date_trunc).values('date', 'party').annotate(
+            total_posts=Count('post_id'),
+            avg_engagement_per_post=Case(
+                When(total_posts=0, then=0),
+                default=(Sum('like_count') + Sum('retweet_count')) / Count('post_id'),
+                output_field=IntegerField()
+            )
+        ).order_by('date', 'party')
     
+    if request.GET.get('format') in COLUMNAR_FORMATS:
+        rows = [(item['date'].strftime('%Y-%m-%d'), item['party'], item['avg_engagement_per_post']) for item in trend_data]
+        columns = columns_from_rows(("date", "party", "avgEngagementPerPost"), rows)
+        return columnar_response(request, columns, dictionary={"date", "party"})
+
     trend_data_dict = {}
     for item in trend_data:
         date_str = item['date'].strftime('%Y-%m-%d')
@@ -952,6 +1194,7 @@ def trend_data(request):
     
     return JsonResponse(trend_data_dict, safe=False)
 
+@cached_api_view
 def engagement_metrics(request):
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
@@ -963,23 +1206,38 @@ def engagement_metrics(request):
     if start_date and end_date:
         start_date_obj = parse_date(start_date)
         end_date_obj = parse_date(end_date)
-        filters &= Q(created_at__range=[start_date_obj, end_date_obj])
+        filters &= date_window(start_date_obj, end_date_obj)
 
     if topics:
-        filters &= Q(topics__name__in=topics)
-
-    filtered_posts = Post.objects.filter(filters).select_related('legislator').distinct()
-
-    # Calculate engagement metrics
-    engagement_data = filtered_posts.values('party', 'topics__name').annotate(
-        total_engagement=Sum('like_count') + Sum('retweet_count'),
-        total_likes=Sum('like_count'),
-        total_retweets=Sum('retweet_count')
-    ).order_by('party', 'topics__name')
+        filters &= has_any_topic(topics)
+
+    start_date_obj = parse_date(start_date) if start_date and end_date else None
+    end_date_obj = parse_date(end_date) if start_date and end_date else None
+    frame = analytics.current_frame()
+    if frame is not None or rollups.rollups_enabled(None, start_date_obj, end_date_obj):
+        source = frame if frame is not None else rollups
+        engagement_data, total_engagement = run_parallel(
+            lambda: list(source.engagement_rows(start_date_obj, end_date_obj, topics)),
+            lambda: source.engagement_total(start_date_obj, end_date_obj, topics),
+        )
+    else:
+        filtered_posts = Post.objects.filter(filters)
+
+        # Calculate engagement metrics, one row per (party, topic), alongside the overall total
+        engagement_data, total_engagement = run_parallel(
+            lambda: per_topic_rows(
+                filtered_posts, ['party'],
+                {'total_likes': (Sum, 'like_count'), 'total_retweets': (Sum, 'retweet_count')},
+                topics=topics,
+            ),
+            lambda: filtered_posts.aggregate(total=Sum('like_count') + Sum('retweet_count'))['total'],
+        )
+        for item in engagement_data:
+            item['total_engagement'] = item['total_likes'] + item['total_retweets']
 
     # Structure the response
     response_data = {
-        "total_engagement": filtered_posts.aggregate(total=Sum('like_count') + Sum('retweet_count'))['total'],
+        "total_engagement": total_engagement,
         "by_party": {}
     }
 
@@ -1001,94 +1259,84 @@ def engagement_metrics(request):
 
     return JsonResponse(response_data)
 
-def default_engagement_data(request):
-    # Path to the JSON file
-    json_file_path = os.path.join(os.path.dirname(__file__), '../static/data/defaultEngagementTab.json')
-    
+async def default_engagement_data(request):
     try:
-        with open(json_file_path, 'r') as json_file:
-            data = json.load(json_file)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'defaultEngagementTab.json')
     except FileNotFoundError:
         return HttpResponse(status=404, content="Default engagement data not found.")
     
-def default_overview_data(request):
-    # Path to the JSON file
-    json_file_path = os.path.join(os.path.dirname(__file__), '../static/data/defaultOverviewTab.json')
-    
+async def default_overview_data(request):
     try:
-        with open(json_file_path, 'r') as json_file:
-            data = json.load(json_file)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'defaultOverviewTab.json')
     except FileNotFoundError:
         return HttpResponse(status=404, content="Default overview data not found.")
 
-def default_trendline_data(request):
-    # Path to the JSON file
-    json_file_path = os.path.join(os.path.dirname(__file__), '../static/data/defaultOverviewTrendline.json')
-    
+async def default_trendline_data(request):
     try:
-        with open(json_file_path, 'r') as json_file:
-            data = json.load(json_file)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'defaultOverviewTrendline.json')
     except FileNotFoundError:
         return HttpResponse(status=404, content="Default trendline data not found.")
 
-def us_states_data(request):
-    file_path = os.path.join(settings.BASE_DIR, 'static', 'data', 'us-states.json')
-    
+async def us_states_data(request):
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        return JsonResponse(data, safe=False)
+        return await astatic_json_response(request, 'us-states.json')
     except FileNotFoundError:
         return HttpResponse(status=404, content="US states data not found.")
 
 
+EXPORT_FORMATS = {
+    # format: (content type, file extension, stream factory name)
+    "csv": ("text/csv", "csv", "csv_stream"),
+    "parquet": ("application/vnd.apache.parquet", "parquet", "parquet_stream"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow", "arrow_stream"),
+}
+
 def export_posts_csv(request):
-    
+    from django.http import StreamingHttpResponse
+    from django.utils.cache import patch_vary_headers
+    from . import exports
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"Unsupported format. Use one of: {', '.join(EXPORT_FORMATS)}."}, status=400)
+    if export_format != 'csv' and not exports.arrow_available():
+        return JsonResponse({"error": f"{export_format} export needs the pyarrow package."}, status=501)
+    content_type, extension, stream = EXPORT_FORMATS[export_format]
+
     filtered_posts = filter_posts(request)
-    
-   
-    response = HttpResponse(content_type='text/csv')
+
+    # Rows are produced page by page while the response is sent, so neither
+    # the full export nor the full result set is ever held in memory.
+    chunks = getattr(exports, stream)(filtered_posts)
+    # Parquet is already compressed internally.
+    compress = export_format != 'parquet' and 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if compress:
+        chunks = exports.gzip_stream(chunks)
+
+    response = StreamingHttpResponse(exports.stream_for(request, chunks), content_type=content_type)
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
     current_date = datetime.now().strftime('%Y-%m-%d')
-    response['Content-Disposition'] = f'attachment; filename="civicwatch_posts_export_{current_date}.csv"'
-    
- 
-    writer = csv.writer(response)
-    
- 
-    writer.writerow([
-        'Post ID', 'Legislator Name', 'Created At', 'Text', 
-        'State', 'Chamber', 'Party', 'Retweet Count', 'Like Count', 
-        'Misinfo Count', 'Civility Score', 'Interaction Score', 'Overperforming Score',
-        'Topics'
-    ])
-    
-    filtered_posts = filtered_posts.select_related('legislator').prefetch_related('topics')
-    
-    batch_size = 500
-    for i in range(0, filtered_posts.count(), batch_size):
-        batch = filtered_posts[i:i+batch_size]
-        for post in batch:
-           
-            topics = ', '.join([topic.name for topic in post.topics.all()])
-            
-            writer.writerow([
-                post.post_id,
-                post.name,
-                post.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                post.text,
-                post.state,
-                post.chamber,
-                post.party,
-                post.retweet_count,
-                post.like_count,
-                post.count_misinfo,
-                post.civility_score,
-                post.interaction_score,
-                post.overperforming_score,
-                topics
-            ])
-    
-    return response
\ No newline at end of file
+    response['Content-Disposition'] = f'attachment; filename="civicwatch_posts_export_{current_date}.{extension}"'
+    return response
+
+
+def export_dataset_parquet(request):
+    """Zip of month-partitioned Parquet files, laid out like ``manage.py export_parquet``."""
+    from django.http import StreamingHttpResponse
+    from . import datasets, exports
+
+    if not exports.arrow_available():
+        return JsonResponse({"error": "Parquet export needs the pyarrow package."}, status=501)
+    tables = [table for table in request.GET.get('tables', ','.join(datasets.TABLES)).split(',') if table]
+    unknown = [table for table in tables if table not in datasets.TABLES]
+    if unknown:
+        return JsonResponse({"error": f"Unknown tables: {', '.join(unknown)}. Use any of: {', '.join(datasets.TABLES)}."}, status=400)
+    start_date = parse_date(request.GET['start_date']) if request.GET.get('start_date') else None
+    end_date = parse_date(request.GET['end_date']) if request.GET.get('end_date') else None
+
+    response = StreamingHttpResponse(exports.stream_for(request, datasets.zip_stream(tables, start_date, end_date)), content_type='application/zip')
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    response['Content-Disposition'] = f'attachment; filename="civicwatch_dataset_{current_date}.zip"'
+    return response
@@ -85,6 +85,30 @@ DATABASES = {
     }
 }
 
+# Caches
+# The "api" cache holds serialized dashboard responses (civicwatch.response_cache).
+# LocMemCache evicts least-recently-used entries past MAX_ENTRIES; for several
+# workers point it at a shared backend instead, e.g.
+#   "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/var/tmp/civicwatch_api"
+#   "BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://127.0.0.1:6379"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "api": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "civicwatch-api",
+        "TIMEOUT": 24 * 60 * 60,
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+}
+
+CIVICWATCH_API_CACHE = True
+CIVICWATCH_API_CACHE_MAX_BYTES = 20 * 1024 * 1024
+# Seconds a worker trusts its last read of the data version.
+CIVICWATCH_DATA_VERSION_TTL = 2
+
 # Add this to allow all origins during development
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -140,3 +164,33 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Answer aggregate dashboard endpoints from DailyPostRollup once it has been
+# built with `manage.py build_rollups`.
+CIVICWATCH_USE_ROLLUPS = True
+
+# Answer trend, engagement, geo and accountability aggregates from an
+# in-process NumPy copy of the post metrics (civicwatch.analytics). Each
+# worker process holds its own copy, roughly 50 bytes per post.
+CIVICWATCH_ANALYTICS_ENGINE = False
+
+# Threads used to run an endpoint's independent queries concurrently
+# (civicwatch.fanout); 1 runs them one after another.
+CIVICWATCH_QUERY_WORKERS = 4
+
+# JSON encoder for API responses (civicwatch.serialization): "orjson",
+# "stdlib", "auto" (orjson when the package is installed) or the dotted path
+# of a dumps(data) -> bytes callable. `manage.py benchmark_json` compares them.
+CIVICWATCH_JSON_BACKEND = "auto"
+
+# Post embeddings (memory-mapped) and the fitted PCA versions written by
+# `manage.py tweet_semantics`.
+CIVICWATCH_EMBEDDINGS_DIR = BASE_DIR / "data" / "embeddings"
+
+# (x0, x1, y0, y1) of the PCA plane covered by the scatter's quadtree tiles.
+# Run `manage.py build_pca_cells` after changing it.
+CIVICWATCH_PCA_EXTENT = (-1.0, 1.0, -1.0, 1.0)
+
+# Serve keyword filters from the SQLite FTS5 trigram index (migration 0004)
+# instead of LIKE '%keyword%' scans.
+CIVICWATCH_FULLTEXT = True
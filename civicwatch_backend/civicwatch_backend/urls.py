@@ -23,6 +23,7 @@ urlpatterns = [
 
     # CSV Export endpoint
     path("api/export-posts-csv/", views.export_posts_csv, name="export_posts_csv"),
+    path("api/export/parquet/", views.export_dataset_parquet, name="export_dataset_parquet"),
 
     # New Overview Metrics Endpoint
     path("api/overview_metrics/", views.overview_metrics, name="overview_metrics"),
@@ -57,5 +58,7 @@ urlpatterns = [
     path('api/posts/post_semantic_similarity/', views.post_semantic_similarity, name="semantic_similarity"),
     path('api/chord/chord_interactions/', views.chord_interactions_novel, name="chord interactions"),
     path('api/chord/chord_top_legislators/', views.chord_top_legislators_novel, name="top legislators"),
-    path('api/posts/default_post_semantic_similarity/', views.default_semantic_similarity_data, name="default semantic" )
+    path('api/posts/default_post_semantic_similarity/', views.default_semantic_similarity_data, name="default semantic" ),
+    path('api/posts/similar/', views.similar_posts, name="similar_posts"),
+    path('api/posts/semantic_viewport/', views.semantic_viewport, name="semantic_viewport"),
 ]